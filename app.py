@@ -1,15 +1,49 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 from datetime import date
 import os
-import tempfile
-from jinja2 import Environment, FileSystemLoader
-import traceback
+import re
+import uuid
 from utils import process_bill, generate_pdf, combine_pdfs
+from app_cache import (
+    get_job_store, get_workspace_manager, get_state_store, get_bill_history, get_search_index, get_bsr_schedule,
+    get_metrics_server, file_digest, bill_inputs_key, load_workbook, load_bill, load_preview, load_job_downloads
+)
+from bill_history import bill_number_name, workbook_identity, next_bill_inputs
+from job_queue import submit_bill_job, DONE, FAILED
+from workspace import QuotaExceededError
+from preview import PREVIEW_DEBOUNCE_SECONDS, debounce
+from output_plan import ARTIFACTS, DEFAULT_OUTPUTS
+from stage_timing import STAGE_METRICS
+from diagnostics import configure_logging
 
-# Initialize form state at the very top
-if 'form_state' not in st.session_state:
-    st.session_state.form_state = {
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".json": "application/json"
+}
+
+PREVIEW_HEIGHT = 800
+JOB_POLL_SECONDS = 1.0
+
+# Session state lives in the shared state store, keyed by a session id kept in the
+# URL, so any replica can serve the session
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SESSION_TTL_SECONDS = 6 * 60 * 60
+FORM_STATE_NAMESPACE = "form_state"
+UPLOAD_NAMESPACE = "uploads"
+
+# The session workspace keeps a local copy of the uploaded workbook
+UPLOAD_FILE_NAME = "upload.xlsx"
+
+BILL_NUMBERS = [bill_number_name(serial) for serial in range(1, 11)]
+
+configure_logging()
+SEARCH_PAGE_SIZE = 10
+
+def default_form_state():
+    return {
         'uploaded_file': None,
         'premium_percent': 0.0,
         'premium_type': 'Above',
@@ -21,194 +55,346 @@ if 'form_state' not in st.session_state:
         'work_order_amount': 0,
         'processing': False,
         'error': None,
-        'bill_number': 'First'
+        'bill_number': 'First',
+        'outputs': list(DEFAULT_OUTPUTS)
     }
 
-# Initialize Jinja2 environment
-env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")))
+def session_id():
+    """
+    Id of this browser session; kept in the URL query string.
+    """
+    sid = st.query_params.get("session")
+    if not sid or not SESSION_ID_PATTERN.match(sid):
+        sid = uuid.uuid4().hex
+        st.query_params["session"] = sid
+    return sid
+
+def session_workspace(sid):
+    """
+    Local workspace of this browser session.
+    """
+    manager = get_workspace_manager()
+    return manager.get(f"session-{sid}") or manager.create("session", token=sid)
+
+state_store = get_state_store()
+# Load signals for the autoscaler: /metrics, /healthz and /readyz on their own port
+get_metrics_server()
+sid = session_id()
+
+# Initialize form state at the very top, restoring it if another replica saved it
+if 'form_state' not in st.session_state:
+    st.session_state.form_state = state_store.get_json(FORM_STATE_NAMESPACE, sid) or default_form_state()
 
 # Title and description
 st.title("Contractor Bill Generator")
 st.markdown("""
 1. Upload Excel file containing Work Order, Bill Quantity, and Extra Items sheets
 2. Fill in the required fields
-3. Click Process Bill to generate the PDF
+3. Check the preview, then click Generate Downloads to produce the PDF
 """)
 
 # File upload
 uploaded_file = st.file_uploader("Upload Bill Input File", type=['xlsx'])
 
+workspace = session_workspace(sid)
+workbook = None
 if uploaded_file:
     st.write(f"Uploaded file: {uploaded_file.name}")
+    workbook = uploaded_file.getvalue()
+    digest = file_digest(workbook)
+    if st.session_state.get("saved_upload") != digest:
+        try:
+            workspace.write(UPLOAD_FILE_NAME, workbook)
+            state_store.put(UPLOAD_NAMESPACE, sid, workbook, ttl=SESSION_TTL_SECONDS)
+            st.session_state.saved_upload = digest
+        except QuotaExceededError as e:
+            st.warning(f"The workbook could not be kept for this session: {e}")
+elif os.path.exists(workspace.path_for(UPLOAD_FILE_NAME)):
+    workbook = workspace.read(UPLOAD_FILE_NAME)
+    st.write("Using the workbook uploaded earlier in this session")
+else:
+    # Uploaded through another replica
+    workbook = state_store.get(UPLOAD_NAMESPACE, sid)
+    if workbook is not None:
+        try:
+            workspace.write(UPLOAD_FILE_NAME, workbook)
+        except QuotaExceededError:
+            pass
+        st.write("Using the workbook uploaded earlier in this session")
 
-# Main content
-with st.form("bill_form", clear_on_submit=False):
-    # Get form data
-    st.session_state.form_state["start_date"] = st.date_input(
-        "Start Date *",
-        st.session_state.form_state.get("start_date", date.today()),
-        help="Start date of the work"
-    )
-    
-    st.session_state.form_state["completion_date"] = st.date_input(
-        "Completion Date *",
-        st.session_state.form_state.get("completion_date", date.today()),
-        help="Expected completion date"
-    )
+# Carry the previous bill of the agreement forward, once per workbook
+if workbook is not None and st.session_state.get("history_prefill") != file_digest(workbook):
+    st.session_state.history_prefill = file_digest(workbook)
+    try:
+        identity = workbook_identity(load_workbook(file_digest(workbook), workbook)[0])
+    except Exception:
+        # Reported by the preview
+        identity = {}
+    if identity.get("agreement_no"):
+        st.session_state.form_state.update(identity)
+        previous = get_bill_history().previous_bill(identity["agreement_no"])
+        if previous is not None:
+            st.session_state.form_state.update(next_bill_inputs(previous))
+            st.session_state.history_notice = (
+                f"Agreement {identity['agreement_no']}: continuing from the {previous['bill_number']} bill "
+                f"dated {previous['bill_date']} (payable Rs. {previous['payable_amount']})"
+            )
+if st.session_state.get("history_notice"):
+    st.info(st.session_state.history_notice)
 
-    st.session_state.form_state["bill_type"] = st.radio(
-        "Bill Type",
-        ["Running Bill", "Final Bill"],
-        index=0 if st.session_state.form_state.get("bill_type") == "Running Bill" else 1,
-        help="Select whether this is a running bill or the final bill"
-    )
+with st.sidebar.expander("Workspace disk usage"):
+    metrics = get_workspace_manager().metrics()
+    st.write(f"This session: {workspace.usage() / 1e6:.1f} MB of {metrics['quota_bytes'] / 1e6:.0f} MB")
+    st.write(f"All sessions: {metrics['workspace_bytes'] / 1e6:.1f} MB in {metrics['workspaces']} workspaces")
+    st.write(f"Disk free: {metrics['disk_free_bytes'] / 1e9:.1f} GB of {metrics['disk_total_bytes'] / 1e9:.1f} GB")
 
-    st.session_state.form_state["bill_number"] = st.selectbox(
-        "Bill Number",
-        ["First", "Second"],
-        index=0 if st.session_state.form_state.get("bill_number") == "First" else 1,
-        help="Select the bill number"
-    )
+with st.sidebar.expander("Pipeline timings"):
+    stages = STAGE_METRICS.snapshot()
+    if stages:
+        st.dataframe(pd.DataFrame([
+            {"stage": name, "runs": totals["count"], "errors": totals["errors"],
+             "mean_seconds": round(totals["seconds"] / totals["count"], 3)}
+            for name, totals in stages.items()
+        ]), hide_index=True)
+    else:
+        st.write("No bills generated yet.")
 
-    st.session_state.form_state["work_order_amount"] = st.number_input(
-        "Work Order Amount *",
-        min_value=0,
-        value=st.session_state.form_state.get("work_order_amount", 0),
-        help="Total work order amount"
-    )
+with st.sidebar.expander("Search past bills"):
+    query = st.text_input("Agreement, contractor, work or item", key="bill_search_query")
+    if query.strip():
+        page = st.number_input("Page", min_value=1, value=1, step=1, key="bill_search_page")
+        response = get_search_index().search(query, page=page, per_page=SEARCH_PAGE_SIZE)
+        st.caption(f"{response['total']} bills in {response['pages']} pages")
+        for result in response["results"]:
+            st.markdown(
+                f"**{result['agreement_no']}** {result['bill_number']} {result['bill_type']}, "
+                f"{result['bill_date']}: {result['contractor']}"
+            )
+            st.text(result["snippet"])
 
-    # Premium settings
-    st.session_state.form_state["premium_percent"] = st.number_input(
-        "Premium Percentage",
-        min_value=0.0,
-        max_value=100.0,
-        step=0.1,
-        value=st.session_state.form_state.get("premium_percent", 0.0)
-    )
+# Bill inputs; every change refreshes the preview below
+st.session_state.form_state["start_date"] = st.date_input(
+    "Start Date *",
+    st.session_state.form_state.get("start_date", date.today()),
+    help="Start date of the work"
+)
 
-    st.session_state.form_state["premium_type"] = st.selectbox(
-        "Premium Type",
-        ["Above", "Below"],
-        index=0 if st.session_state.form_state.get("premium_type") == "Above" else 1
-    )
+st.session_state.form_state["completion_date"] = st.date_input(
+    "Completion Date *",
+    st.session_state.form_state.get("completion_date", date.today()),
+    help="Expected completion date"
+)
 
-    st.session_state.form_state["premium_position"] = st.selectbox(
-        "Premium Position",
-        ["Percentage", "Fixed"],
-        index=0 if st.session_state.form_state.get("premium_position") == "Percentage" else 1
-    )
+st.session_state.form_state["bill_type"] = st.radio(
+    "Bill Type",
+    ["Running Bill", "Final Bill"],
+    index=0 if st.session_state.form_state.get("bill_type") == "Running Bill" else 1,
+    help="Select whether this is a running bill or the final bill"
+)
 
-    # Amount paid in last bill
-    st.session_state.form_state["amount_paid_last_bill"] = st.number_input(
-        "Amount Paid in Last Bill",
-        min_value=0,
-        value=st.session_state.form_state.get("amount_paid_last_bill", 0)
+st.session_state.form_state["bill_number"] = st.selectbox(
+    "Bill Number",
+    BILL_NUMBERS,
+    index=BILL_NUMBERS.index(st.session_state.form_state.get("bill_number", "First"))
+    if st.session_state.form_state.get("bill_number") in BILL_NUMBERS else 0,
+    help="Select the bill number"
+)
+
+st.session_state.form_state["work_order_amount"] = st.number_input(
+    "Work Order Amount *",
+    min_value=0,
+    value=st.session_state.form_state.get("work_order_amount", 0),
+    help="Total work order amount"
+)
+
+# Premium settings
+st.session_state.form_state["premium_percent"] = st.number_input(
+    "Premium Percentage",
+    min_value=0.0,
+    max_value=100.0,
+    step=0.1,
+    value=st.session_state.form_state.get("premium_percent", 0.0)
+)
+
+st.session_state.form_state["premium_type"] = st.selectbox(
+    "Premium Type",
+    ["Above", "Below"],
+    index=0 if st.session_state.form_state.get("premium_type") == "Above" else 1
+)
+
+st.session_state.form_state["premium_position"] = st.selectbox(
+    "Premium Position",
+    ["Percentage", "Fixed"],
+    index=0 if st.session_state.form_state.get("premium_position") == "Percentage" else 1
+)
+
+# Amount paid in last bill
+st.session_state.form_state["amount_paid_last_bill"] = st.number_input(
+    "Amount Paid in Last Bill",
+    min_value=0,
+    value=st.session_state.form_state.get("amount_paid_last_bill", 0)
+)
+
+# BSR rate checks run only when a schedule is configured (BILL_BSR_SCHEDULE)
+if get_bsr_schedule() is not None:
+    st.session_state.form_state["fill_bsr_descriptions"] = st.checkbox(
+        "Fill missing item descriptions from the BSR schedule",
+        value=st.session_state.form_state.get("fill_bsr_descriptions", False)
     )
 
-    # Submit button
-    submitted = st.form_submit_button("Process Bill")
+# Requested outputs; stages for anything not selected are skipped
+st.session_state.form_state["outputs"] = st.multiselect(
+    "Outputs",
+    list(ARTIFACTS),
+    default=st.session_state.form_state.get("outputs", list(DEFAULT_OUTPUTS)),
+    format_func=ARTIFACTS.get,
+    help="Only the selected files are generated"
+)
+
+# Share the form state with other replicas whenever it changes
+if st.session_state.get("saved_form_state") != st.session_state.form_state:
+    state_store.put_json(FORM_STATE_NAMESPACE, sid, st.session_state.form_state, ttl=SESSION_TTL_SECONDS)
+    st.session_state.saved_form_state = dict(st.session_state.form_state)
 
-    if submitted and uploaded_file is not None:
+@st.fragment(run_every=PREVIEW_DEBOUNCE_SECONDS)
+def show_preview(digest, data):
+    """
+    Live HTML preview of the bill, refreshed once the inputs settle.
+
+    Re-checks on a timer so a burst of edits renders only the final values;
+    the bill is loaded again only when the inputs changed since the last
+    render. The PDF renderer is never started here.
+    """
+    inputs = bill_inputs_key(st.session_state.form_state)
+    settled = debounce(st.session_state, "preview_inputs", (digest, inputs))
+    if settled and st.session_state.get("preview_key") != (digest, inputs):
+        # Recorded on failure too, so a bad workbook is not retried every tick
+        st.session_state.preview_key = (digest, inputs)
         try:
-            # Read the uploaded file
-            with pd.ExcelFile(uploaded_file) as xls:
-                ws_wo = pd.read_excel(xls, "Work Order", header=None)
-                ws_bq = pd.read_excel(xls, "Bill Quantity", header=None)
-                ws_extra = pd.read_excel(xls, "Extra Items", header=None)
-
-            # Prepare user inputs
-            user_inputs = {
-                "work_order_amount": st.session_state.form_state["work_order_amount"],
-                "premium_percent": st.session_state.form_state["premium_percent"],
-                "premium_type": st.session_state.form_state["premium_type"],
-                "amount_paid_last_bill": st.session_state.form_state["amount_paid_last_bill"],
-                "start_date": st.session_state.form_state["start_date"],
-                "completion_date": st.session_state.form_state["completion_date"],
-                "bill_type": st.session_state.form_state["bill_type"],
-                "is_first_bill": st.session_state.form_state["bill_type"] == "Running Bill" and st.session_state.form_state["bill_number"] == "First",
-                "premium_position": st.session_state.form_state["premium_position"]
-            }
-
-            # Process the bill
-            first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data = process_bill(
-                ws_wo, ws_bq, ws_extra,
-                premium_percent=st.session_state.form_state["premium_percent"],
-                premium_type=st.session_state.form_state["premium_type"],
-                amount_paid_last_bill=st.session_state.form_state["amount_paid_last_bill"],
-                is_first_bill=user_inputs["is_first_bill"],
-                user_inputs=user_inputs
+            st.session_state.preview = load_preview(digest, inputs, data)
+            first_page = dict(load_bill(digest, inputs, data))["First Page"]
+            st.session_state.bsr_validation = first_page.get("bsr_validation")
+            st.session_state.alignment = first_page.get("alignment")
+            st.session_state.preview_error = None
+        except Exception as e:
+            st.session_state.preview_error = str(e)
+    elif not settled and "preview" in st.session_state:
+        st.caption("Updating preview...")
+
+    if st.session_state.get("preview_error"):
+        st.error(f"Error processing file: {st.session_state.preview_error}")
+    elif st.session_state.get("preview"):
+        tabs = st.tabs(list(st.session_state.preview))
+        for tab, html in zip(tabs, st.session_state.preview.values()):
+            with tab:
+                components.html(html, height=PREVIEW_HEIGHT, scrolling=True)
+
+    alignment = st.session_state.get("alignment")
+    if alignment and (alignment["unmatched_work_order"] or alignment["unmatched_bill_quantity"] or alignment["invalid"]):
+        with st.expander("Work Order and Bill Quantity rows that could not be matched", expanded=True):
+            st.warning(
+                f"{len(alignment['unmatched_work_order'])} Work Order rows have no Bill Quantity row, "
+                f"{len(alignment['unmatched_bill_quantity'])} Bill Quantity rows match no Work Order item "
+                f"(not billed) and {len(alignment['invalid'])} cells are not numbers (rows skipped)."
             )
+            for title, rows in (("Work Order", alignment["unmatched_work_order"]),
+                                ("Bill Quantity", alignment["unmatched_bill_quantity"]),
+                                ("Invalid cells", alignment["invalid"])):
+                if rows:
+                    st.caption(title)
+                    st.dataframe(pd.DataFrame(rows), hide_index=True)
 
-            # Create a temporary directory
-            temp_dir = tempfile.mkdtemp()
-            
-            # Generate PDFs for each page
-            pdf_paths = []
-            for sheet_name, data in {
-                "First Page": first_page_data,
-                "Last Page": last_page_data,
-                "Deviation Statement": deviation_data,
-                "Extra Items": extra_items_data,
-                "Note Sheet": note_sheet_data
-            }.items():
-                if data is None:
-                    continue
-                    
-                # Prepare template data
-                template_data = data.copy()
-                template_data.update({
-                    "premium_percent": st.session_state.form_state["premium_percent"],
-                    "premium_type": st.session_state.form_state["premium_type"],
-                    "amount_paid_last_bill": st.session_state.form_state["amount_paid_last_bill"],
-                    "premium_position": st.session_state.form_state["premium_position"]
-                })
-                
-                # Get template and render HTML
-                template = env.get_template(f"{sheet_name.lower().replace(' ', '_')}.html")
-                html_content = template.render(**template_data)
-                
-                # Generate PDF
-                pdf_path = os.path.join(temp_dir, f"{sheet_name.lower().replace(' ', '_')}.pdf")
-                generate_pdf(html_content, output_path=pdf_path)
-                pdf_paths.append(pdf_path)
-            
-            # Combine all PDFs into one
-            combined_pdf_path = os.path.join(temp_dir, "combined_bill.pdf")
-            combine_pdfs(pdf_paths, combined_pdf_path)
-            
-            # Display success message and download link
-            st.success("Bill processed successfully!")
-            
-            # Create download button
-            with open(combined_pdf_path, "rb") as f:
-                pdf_bytes = f.read()
+    validation = st.session_state.get("bsr_validation")
+    if validation:
+        deviations = validation["deviations"]
+        label = f"BSR rate check: {len(deviations)} deviations in {validation['checked']} items"
+        with st.expander(label, expanded=bool(deviations)):
+            if deviations:
+                st.dataframe(pd.DataFrame(deviations).drop(columns="position"), hide_index=True)
+            else:
+                st.write("All rates and units match the BSR schedule.")
+            if validation["filled_descriptions"]:
+                st.caption(f"{validation['filled_descriptions']} descriptions filled from the schedule")
+
+if workbook is not None:
+    st.subheader("Preview")
+    show_preview(file_digest(workbook), workbook)
+
+# PDFs and other downloads are only generated on request
+submitted = st.button("Generate Downloads")
+
+if submitted and workbook is not None:
+    # Generation runs in a background worker; the job id survives reruns and page refreshes
+    job_id = submit_bill_job(
+        get_job_store(), workbook,
+        dict(bill_inputs_key(st.session_state.form_state)), st.session_state.form_state["outputs"]
+    )
+    st.query_params["job"] = job_id
+
+def show_job(job_id):
+    """
+    Show a bill generation job: its files once it is done, its error once it
+    failed, and a polling status line while it is queued or running.
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        st.warning("This bill job is no longer available. Please generate it again.")
+    elif job["status"] == DONE:
+        artifacts, archive = load_job_downloads(job_id)
+
+        # Display success message and download links
+        st.success("Bill processed successfully!")
+
+        for file_name, file_bytes in artifacts.items():
             st.download_button(
-                label="Download Bill",
-                data=pdf_bytes,
-                file_name="contractor_bill.pdf",
-                mime="application/pdf"
+                label=f"Download {file_name}",
+                data=file_bytes,
+                file_name=file_name,
+                mime=MIME_TYPES[os.path.splitext(file_name)[1]],
+                key=file_name
             )
 
-        except Exception as e:
-            st.error(f"Error processing file: {str(e)}")
-            st.error(traceback.format_exc())
+        if archive is not None:
+            st.download_button(
+                label="Download all (.zip)",
+                data=archive,
+                file_name="contractor_bill.zip",
+                mime="application/zip",
+                key="contractor_bill.zip"
+            )
+
+        timing = get_job_store().timing(job_id)
+        if timing:
+            with st.expander(f"Timing: {timing['total_seconds']:.2f} s"):
+                st.dataframe(pd.DataFrame(timing["stages"]), hide_index=True)
+    elif job["status"] == FAILED:
+        st.error(f"Error processing file: {job['error']}")
+    else:
+        poll_job(job_id)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_job(job_id):
+    """
+    Status line of a queued or running job, refreshed every JOB_POLL_SECONDS.
+    Once the job is done or failed the whole page reruns, and show_job
+    renders the result without this fragment, which stops the polling.
+    """
+    job = get_job_store().get(job_id)
+    if job is None or job["status"] in (DONE, FAILED):
+        st.rerun()
+    retry = f" (retry {job['attempts']} of {job['max_attempts']})" if job["error"] else ""
+    st.info(f"Generating bill... {job['status']}{retry}")
+
+if "job" in st.query_params:
+    show_job(st.query_params["job"])
 
 # Add clear form button
 if st.button("Clear Form"):
-    st.session_state.form_state = {
-        'uploaded_file': None,
-        'premium_percent': 0.0,
-        'premium_type': 'Above',
-        'premium_position': 'Percentage',
-        'amount_paid_last_bill': 0,
-        'start_date': date.today(),
-        'completion_date': date.today(),
-        'bill_type': 'Running Bill',
-        'work_order_amount': 0,
-        'processing': False,
-        'error': None,
-        'bill_number': 'First'
-    }
+    st.session_state.form_state = default_form_state()
+    st.session_state.pop("history_prefill", None)
+    st.session_state.pop("history_notice", None)
+    state_store.delete(FORM_STATE_NAMESPACE, sid)
+    st.query_params.pop("job", None)
     st.experimental_rerun()
 
 def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, premium_position, amount_paid_last_bill, is_first_bill, user_inputs):
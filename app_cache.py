@@ -0,0 +1,263 @@
+import functools
+import os
+import streamlit as st
+from bill_pipeline import create_environment, read_workbook, compute_bill, build_user_inputs
+from pdf_pipeline import find_wkhtmltopdf
+from reproducible import content_digest
+from state_store import open_state_store, dump_params, DEFAULT_STATE_DIR
+from preview import render_preview
+from job_queue import JobStore, WorkerPool, bill_job_handler, DEFAULT_STALE_TIMEOUT
+from workspace import WorkspaceManager
+from bill_history import BillHistory
+from bill_archive import BillArchive
+from bill_search import BillSearchIndex
+from bsr_schedule import default_schedule
+from metrics import MetricsServer, COUNTERS, CACHE_REQUESTS, CACHE_MISSES, DEFAULT_METRICS_HOST, DEFAULT_METRICS_PORT
+from zip_packager import build_zip
+from stage_timing import stage
+from diagnostics import get_logger
+
+log = get_logger("bill.app")
+
+# Bounds for the per-upload caches; each entry holds parsed DataFrames or bill data
+CACHE_TTL_SECONDS = 60 * 60
+CACHE_MAX_ENTRIES = 16
+
+# Computed bills shared between replicas through the state store
+BILL_CACHE_NAMESPACE = "bills"
+
+# Job database; kept next to the state store so replicas sharing BILL_STATE_DIR share jobs too
+JOB_DB = os.environ.get("BILL_JOB_DB", os.path.join(DEFAULT_STATE_DIR, "jobs.sqlite3"))
+
+# Port of the /metrics, /healthz and /readyz endpoints next to the app; 0 disables them
+METRICS_PORT = DEFAULT_METRICS_PORT
+
+# Form fields that do not change the computed bill
+NON_BILL_FIELDS = {"uploaded_file", "processing", "error", "outputs"}
+
+@st.cache_resource
+def get_environment():
+    """
+    Jinja2 environment shared by every session; compiled templates stay cached in it.
+    """
+    return create_environment()
+
+@st.cache_resource
+def get_wkhtmltopdf_path():
+    """
+    Path of the PDF renderer, looked up once per server process.
+    """
+    return find_wkhtmltopdf()
+
+@st.cache_resource
+def get_state_store():
+    """
+    State store shared by every replica (see state_store.open_state_store).
+
+    Expired entries are purged now and then by the job workers (see get_job_store).
+    """
+    store = open_state_store()
+    store.purge_expired()
+    return store
+
+@st.cache_resource
+def get_workspace_manager():
+    """
+    Workspace manager shared by every session; expired workspaces from
+    earlier runs are removed on startup.
+    """
+    manager = WorkspaceManager()
+    manager.cleanup_expired()
+    return manager
+
+@st.cache_resource
+def get_bill_history():
+    """
+    Archive of generated bills, shared by every session and the job workers.
+    """
+    return BillHistory()
+
+@st.cache_resource
+def get_bill_archive():
+    """
+    Columnar line-item archive for reports, shared by the job workers.
+    """
+    return BillArchive()
+
+@st.cache_resource
+def get_search_index():
+    """
+    Full-text index of generated bills, shared by every session and the job workers.
+    """
+    return BillSearchIndex()
+
+@st.cache_resource
+def get_bsr_schedule():
+    """
+    BSR rate schedule named by BILL_BSR_SCHEDULE, loaded once per server
+    process; None when no schedule is configured.
+    """
+    return default_schedule()
+
+@st.cache_resource
+def get_job_store():
+    """
+    Job store with its worker pool, started once per server process.
+
+    Jobs left running by a previous process are put back in the queue.
+    Finished bills are archived in the bill history and the line-item archive,
+    and added to the search index. Finished jobs and their files are purged
+    after BILL_JOB_RETENTION seconds (a day by default); idle workers also
+    remove expired workspaces and state store entries.
+    """
+    store = JobStore(JOB_DB)
+    store.requeue_stale(DEFAULT_STALE_TIMEOUT)
+    handler = bill_job_handler(
+        get_environment(), get_wkhtmltopdf_path(), history=get_bill_history(), archive=get_bill_archive(),
+        search_index=get_search_index(), schedule=get_bsr_schedule()
+    )
+    WorkerPool(store, handler, workspaces=get_workspace_manager(), state_store=get_state_store()).start()
+    return store
+
+@st.cache_resource
+def get_metrics_server():
+    """
+    Metrics and health endpoints for this server process (see metrics), or
+    None when disabled or when the port is taken by another process.
+    """
+    if not METRICS_PORT:
+        return None
+    try:
+        return MetricsServer(
+            DEFAULT_METRICS_HOST, METRICS_PORT, job_store=get_job_store(), workspaces=get_workspace_manager(),
+            wkhtmltopdf_path=get_wkhtmltopdf_path()
+        ).start()
+    except OSError as e:
+        log.warning("metrics_server_not_started", port=METRICS_PORT, error=str(e))
+        return None
+
+def counted_cache_data(cache, **options):
+    """
+    st.cache_data that also counts lookups and misses as the cache label of
+    the bill_cache_* metrics.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            COUNTERS.inc(CACHE_MISSES, cache=cache)
+            return func(*args, **kwargs)
+
+        cached = st.cache_data(**options)(compute)
+
+        @functools.wraps(func)
+        def lookup(*args, **kwargs):
+            COUNTERS.inc(CACHE_REQUESTS, cache=cache)
+            return cached(*args, **kwargs)
+
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
+
+def file_digest(data):
+    """
+    Cache key for an uploaded workbook.
+
+    Args:
+        data: Uploaded file content as bytes
+
+    Returns:
+        SHA-256 hex digest of the content
+    """
+    return content_digest(data)
+
+def bill_inputs_key(form):
+    """
+    Hashable cache key for the form values that affect the computed bill.
+
+    Args:
+        form: Dictionary with the bill form fields
+
+    Returns:
+        Tuple of (field, value) pairs sorted by field name
+    """
+    user_inputs = build_user_inputs(form)
+    return tuple(sorted((key, value) for key, value in user_inputs.items() if key not in NON_BILL_FIELDS))
+
+@counted_cache_data("workbook", ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def load_workbook(digest, _data):
+    """
+    Parse an uploaded workbook once per distinct content.
+
+    Args:
+        digest: file_digest of the content; the cache key
+        _data: Workbook content as bytes (not hashed by Streamlit)
+
+    Returns:
+        Tuple of (ws_wo, ws_bq, ws_extra) DataFrames
+    """
+    return read_workbook(_data)
+
+@counted_cache_data("bill", ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner="Computing bill...")
+def load_bill(digest, inputs, _data):
+    """
+    Compute the bill once per distinct workbook and form inputs.
+
+    Results are also kept in the shared state store, so another replica
+    serving the same session does not compute the bill again.
+
+    Args:
+        digest: file_digest of the workbook content
+        inputs: bill_inputs_key of the form
+        _data: Workbook content as bytes (not hashed by Streamlit)
+
+    Returns:
+        List of (sheet_name, template_data) pairs from compute_bill
+    """
+    state = get_state_store()
+    key = f"{digest}:{content_digest(dump_params(inputs).encode('utf-8'))}"
+    sheets = state.get_object(BILL_CACHE_NAMESPACE, key)
+    COUNTERS.inc(CACHE_REQUESTS, cache="shared_bill")
+    if sheets is None:
+        COUNTERS.inc(CACHE_MISSES, cache="shared_bill")
+        ws_wo, ws_bq, ws_extra = load_workbook(digest, _data)
+        sheets = compute_bill(ws_wo, ws_bq, ws_extra, dict(inputs), schedule=get_bsr_schedule())
+        state.put_object(BILL_CACHE_NAMESPACE, key, sheets, ttl=CACHE_TTL_SECONDS)
+    return sheets
+
+@counted_cache_data("preview", ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def load_preview(digest, inputs, _data):
+    """
+    Render the HTML preview once per distinct workbook and form inputs.
+
+    Args:
+        digest: file_digest of the workbook content
+        inputs: bill_inputs_key of the form
+        _data: Workbook content as bytes (not hashed by Streamlit)
+
+    Returns:
+        Dictionary of sheet name to HTML
+    """
+    return render_preview(get_environment(), load_bill(digest, inputs, _data))
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def load_job_downloads(job_id):
+    """
+    Files of a finished job, read and zipped once per job.
+
+    The results of a done job never change, so reruns of the page do not
+    read the result BLOBs or build the zip again. Only call this for jobs
+    in the DONE state.
+
+    Args:
+        job_id: Id of a DONE job
+
+    Returns:
+        Tuple of (dictionary of file name to bytes, zip of all files as bytes
+        or None when there is a single file)
+    """
+    artifacts = get_job_store().results(job_id)
+    archive = None
+    if len(artifacts) > 1:
+        with stage("zip"):
+            archive = build_zip(artifacts.items())
+    return artifacts, archive
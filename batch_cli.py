@@ -0,0 +1,380 @@
+"""
+Generate bills in bulk from a manifest, without the Streamlit UI.
+
+Usage:
+    python batch_cli.py MANIFEST --out-dir DIR [--jobs N] [--outputs combined_pdf,json]
+                        [--deterministic] [--zip PATH] [--summary PATH] [--history DB]
+                        [--archive DIR] [--search-index DB] [--bsr-schedule PATH]
+
+The manifest is a JSON or CSV file with one entry per bill. Each entry names
+a workbook (relative paths are resolved against the manifest's directory) and
+the bill inputs:
+
+    {"defaults": {"bill_type": "Running Bill", "outputs": "combined_pdf,json"},
+     "bills": [{"workbook": "bills/0001.xlsx", "name": "bill_0001",
+                "premium_percent": 4.5, "premium_type": "Above",
+                "amount_paid_last_bill": 0, "start_date": "2025-01-01",
+                "completion_date": "2025-06-30"}]}
+
+A plain JSON list of entries is accepted too. CSV manifests use the same
+field names as column headers. A JSON summary of every bill is printed to
+stdout; progress goes to stderr. The exit code is 1 if any bill failed.
+
+With --history, entries without amount_paid_last_bill, bill_number or
+last_bill take them from the previous bill of the same agreement in the bill
+history database, and every generated bill is archived there. The bills of
+one agreement are then generated one after another in manifest order, and
+different agreements in parallel. With
+--archive, the line items of every generated bill are appended to the
+columnar archive in that directory (see bill_archive). With --search-index,
+every generated bill is added to that full-text index (see bill_search).
+With --bsr-schedule, item rates and units are checked against the schedule
+(see bsr_schedule) and each summary record lists the deviations.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from functools import lru_cache
+import pandas as pd
+from bill_pipeline import create_environment, read_workbook, compute_bill, generate_outputs
+from bill_history import BillHistory, with_identity, workbook_identity
+from bill_archive import BillArchive
+from bill_search import BillSearchIndex
+from bsr_schedule import load_schedule
+from output_plan import parse_outputs
+from zip_packager import write_zip
+from stage_timing import StageTimer
+from diagnostics import configure_logging
+from sheet_alignment import DATA_START_ROW
+
+# Manifest fields that are not bill inputs
+ENTRY_FIELDS = {"workbook", "name", "outputs"}
+
+FLOAT_FIELDS = {"premium_percent", "work_order_amount"}
+INT_FIELDS = {"amount_paid_last_bill"}
+DATE_FIELDS = {"start_date", "completion_date", "actual_completion_date", "measurement_date", "order_date"}
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+BOOL_FIELDS = {"fill_bsr_descriptions"}
+BOOL_VALUES = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+def parse_date(value):
+    """
+    Parse a manifest date in ISO (2025-01-31) or Indian (31-01-2025, 31/01/2025) order.
+    """
+    if isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD or DD-MM-YYYY)")
+
+def parse_bool(value):
+    """
+    Parse a manifest flag: true/false, yes/no or 1/0, in any case.
+    """
+    if isinstance(value, bool):
+        return value
+    try:
+        return BOOL_VALUES[str(value).strip().lower()]
+    except KeyError:
+        raise ValueError(f"Invalid boolean: {value!r} (expected true/false, yes/no or 1/0)") from None
+
+def coerce_inputs(entry):
+    """
+    Convert manifest values (CSV cells are all strings) into bill form values.
+
+    Args:
+        entry: Dictionary of manifest fields for one bill
+
+    Returns:
+        Dictionary of bill inputs for bill_pipeline.build_user_inputs
+
+    Raises:
+        ValueError: If a number, date or flag cannot be parsed
+    """
+    form = {}
+    for key, value in entry.items():
+        if key in ENTRY_FIELDS or value is None or value == "":
+            continue
+        if key in FLOAT_FIELDS:
+            value = float(value)
+        elif key in INT_FIELDS:
+            value = int(float(value))
+        elif key in DATE_FIELDS:
+            value = parse_date(value)
+        elif key in BOOL_FIELDS:
+            value = parse_bool(value)
+        form[key] = value
+    return form
+
+def load_manifest(path, default_outputs=None):
+    """
+    Read a JSON or CSV manifest.
+
+    Args:
+        path: Manifest file path (.json or .csv)
+        default_outputs: Outputs for entries that do not list their own
+
+    Returns:
+        List of entry dictionaries with workbook (absolute path), name,
+        outputs (tuple of artifact names) and form (bill inputs)
+
+    Raises:
+        ValueError: If the manifest is malformed or two entries share a name
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = {}
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            defaults = data.get("defaults", {})
+            data = data.get("bills")
+        if not isinstance(data, list):
+            raise ValueError("JSON manifest must be a list of bills or an object with a 'bills' list")
+        rows = data
+
+    entries, names = [], set()
+    for index, row in enumerate(rows, start=1):
+        row = {**defaults, **{key: value for key, value in row.items() if value not in (None, "")}}
+        if not row.get("workbook"):
+            raise ValueError(f"Manifest entry {index} has no workbook")
+        workbook = os.path.join(base_dir, row["workbook"])
+        name = row.get("name") or f"{os.path.splitext(os.path.basename(workbook))[0]}_{index}"
+        if name in names:
+            raise ValueError(f"Duplicate bill name in manifest: {name}")
+        names.add(name)
+        entries.append({
+            "workbook": workbook,
+            "name": name,
+            "outputs": parse_outputs(row.get("outputs") or default_outputs),
+            "form": coerce_inputs(row)
+        })
+    return entries
+
+@lru_cache(maxsize=1)
+def _environment():
+    # One template environment per worker process
+    return create_environment()
+
+@lru_cache(maxsize=1)
+def _schedule(path):
+    # One schedule index per worker process
+    return load_schedule(path)
+
+def run_entry(entry, out_dir, deterministic=False, render_workers=None, history_db=None, archive_dir=None,
+              search_db=None, schedule_path=None):
+    """
+    Generate one manifest entry and write its files to out_dir.
+
+    Runs in a worker process, so it never raises; failures are reported in
+    the returned record.
+
+    Args:
+        entry: Entry from load_manifest
+        out_dir: Directory the files are written to
+        deterministic: Produce byte-identical PDFs for identical inputs
+        render_workers: Concurrent renderer processes
+        history_db: Optional bill history database path (see bill_history)
+        archive_dir: Optional line-item archive directory (see bill_archive)
+        search_db: Optional search index database path (see bill_search)
+        schedule_path: Optional BSR schedule file (see bsr_schedule)
+
+    Returns:
+        Summary record with name, workbook, status ("ok" or "error"),
+        files, seconds, stages (see StageTimer.record) and error, plus
+        bsr_deviations with a schedule
+    """
+    timer = StageTimer()
+    record = {"name": entry["name"], "workbook": entry["workbook"], "status": "ok", "files": [], "error": None}
+    try:
+        ws_wo, ws_bq, ws_extra = read_workbook(entry["workbook"], timer=timer)
+        form = entry["form"]
+        if archive_dir or search_db:
+            # Stored bills are filed under the agreement in the workbook header
+            form = with_identity(form, ws_wo)
+        history = BillHistory(history_db) if history_db else None
+        schedule = _schedule(schedule_path) if schedule_path else None
+        sheets = compute_bill(ws_wo, ws_bq, ws_extra, form, history=history, schedule=schedule, timer=timer)
+        if schedule is not None:
+            record["bsr_deviations"] = dict(sheets)["First Page"]["bsr_validation"]["deviations"]
+        artifacts = generate_outputs(
+            sheets, entry["outputs"], env=_environment(), name=entry["name"],
+            deterministic=deterministic, max_workers=render_workers, timer=timer
+        )
+        if history is not None:
+            history.record_bill(sheets)
+        if archive_dir:
+            BillArchive(archive_dir).append(sheets)
+        if search_db:
+            BillSearchIndex(search_db).index_bill(sheets)
+        for file_name, data in artifacts.items():
+            with open(os.path.join(out_dir, file_name), "wb") as f:
+                f.write(data)
+            record["files"].append(file_name)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    timing = timer.finish(name=entry["name"], status=record["status"])
+    record["seconds"] = round(timing["total_seconds"], 3)
+    record["stages"] = timing["stages"]
+    return record
+
+def run_manifest(entries, out_dir, jobs=1, deterministic=False, render_workers=None, progress=None, history_db=None,
+                 archive_dir=None, search_db=None, schedule_path=None):
+    """
+    Generate every manifest entry, in parallel worker processes when jobs > 1.
+
+    Args:
+        entries: Entries from load_manifest
+        out_dir: Directory the files are written to (created if missing)
+        jobs: Number of worker processes
+        deterministic: Produce byte-identical PDFs for identical inputs
+        render_workers: Concurrent renderer processes per bill
+        progress: Optional callable receiving each record as it finishes
+        history_db: Optional bill history database path. Bills of the same
+            agreement depend on each other, so they are then generated one
+            after another in manifest order (see group_by_agreement)
+        archive_dir: Optional line-item archive directory
+        search_db: Optional search index database path
+        schedule_path: Optional BSR schedule file
+
+    Returns:
+        List of summary records in manifest order
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    records = {}
+    args = (out_dir, deterministic, render_workers, history_db, archive_dir, search_db, schedule_path)
+    groups = group_by_agreement(entries) if history_db and jobs > 1 else [[entry] for entry in entries]
+    if jobs <= 1 or len(groups) <= 1:
+        for entry in entries:
+            records[entry["name"]] = run_entry(entry, *args)
+            if progress:
+                progress(records[entry["name"]])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(run_group, group, *args) for group in groups]
+            for future in as_completed(futures):
+                for record in future.result():
+                    records[record["name"]] = record
+                    if progress:
+                        progress(record)
+    return [records[entry["name"]] for entry in entries]
+
+def agreement_of(entry):
+    """
+    Agreement an entry's bill is filed under in the bill history: the form's
+    agreement_no, else the one in the Work Order header.
+
+    Returns:
+        Agreement number, or None when the entry has none or its workbook
+        cannot be read (its run reports the error)
+    """
+    agreement = str(entry["form"].get("agreement_no") or "").strip()
+    if agreement:
+        return agreement
+    try:
+        header = pd.read_excel(entry["workbook"], "Work Order", header=None, nrows=DATA_START_ROW)
+    except Exception:
+        return None
+    return workbook_identity(header)["agreement_no"] or None
+
+def group_by_agreement(entries):
+    """
+    Split entries into groups that share no agreement.
+
+    Returns:
+        List of entry lists, each in manifest order; entries without an
+        agreement get a group of their own
+    """
+    groups = {}
+    for index, entry in enumerate(entries):
+        agreement = agreement_of(entry)
+        groups.setdefault(index if agreement is None else agreement, []).append(entry)
+    return list(groups.values())
+
+def run_group(entries, *args):
+    """
+    Generate entries one after another with run_entry (same arguments after
+    the entry) and return their records.
+    """
+    return [run_entry(entry, *args) for entry in entries]
+
+def build_summary(records, seconds):
+    """
+    Machine-readable summary of a batch run.
+    """
+    failed = sum(1 for record in records if record["status"] != "ok")
+    return {
+        "total": len(records),
+        "succeeded": len(records) - failed,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "bills": records
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("manifest", help="JSON or CSV manifest of bills")
+    parser.add_argument("--out-dir", required=True, help="Directory for the generated files")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Bills generated in parallel")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="Concurrent renderer processes per bill")
+    parser.add_argument("--outputs", help="Default outputs for entries that do not set their own, e.g. combined_pdf,json")
+    parser.add_argument("--deterministic", action="store_true", help="Byte-identical PDFs for identical inputs")
+    parser.add_argument("--zip", help="Also package every generated file into this zip archive")
+    parser.add_argument("--summary", help="Write the JSON summary to this file as well as stdout")
+    parser.add_argument("--history", help="Bill history database to read previous bills from and archive bills in")
+    parser.add_argument("--archive", help="Directory of the columnar line-item archive to append bills to")
+    parser.add_argument("--search-index", help="Full-text search index database to add bills to")
+    parser.add_argument("--bsr-schedule", help="BSR rate schedule (CSV or Excel) to validate item rates against")
+    args = parser.parse_args(argv)
+
+    try:
+        entries = load_manifest(args.manifest, args.outputs)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    # Per-bill timing lines are INFO; the progress lines below already cover them
+    configure_logging(os.environ.get("BILL_LOG_LEVEL") or "WARNING")
+
+    def report(record):
+        status = "ok" if record["status"] == "ok" else f"FAILED ({record['error']})"
+        print(f"{record['name']}: {status} in {record['seconds']}s", file=sys.stderr)
+
+    start = time.perf_counter()
+    records = run_manifest(
+        entries, args.out_dir, args.jobs, args.deterministic, args.render_workers, report, args.history, args.archive,
+        args.search_index, args.bsr_schedule
+    )
+
+    if args.zip:
+        members = [(file_name, os.path.join(args.out_dir, file_name)) for record in records for file_name in record["files"]]
+
+        def read_members():
+            for file_name, path in members:
+                with open(path, "rb") as f:
+                    yield file_name, f.read()
+
+        write_zip(read_members(), args.zip, parallel=True)
+
+    summary = build_summary(records, time.perf_counter() - start)
+    output = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Benchmark every bill pipeline stage on synthetic workbooks of increasing size.
+
+Each scenario generates a Work Order / Bill Quantity / Extra Items workbook
+(see synthetic_workbook) and runs parse, compute, render (templates to
+HTML), pdf (wkhtmltopdf), merge, word, json and zip on it, recording wall
+time and peak RSS per stage. Scenarios run in a fresh process each, so one
+scenario's memory does not count towards the next. The pdf and merge stages
+are reported as skipped when wkhtmltopdf is not installed. A stage that
+raises is reported as failed and the stages that need its result as
+skipped; the other stages still run.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py [--sizes 100 10000 100000] [--repeat 3] [--output results.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from jinja2 import TemplateError
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import create_environment, read_workbook, compute_bill
+from pagination import paginate_sheet
+from pdf_pipeline import find_wkhtmltopdf, render_pdf_bytes, render_sheet_html, merge_pdf_bytes, DEFAULT_RENDER_WORKERS
+from synthetic_workbook import write_workbook
+from utils import create_word_doc
+from zip_packager import build_zip
+
+STAGES = ("parse", "compute", "render", "pdf", "merge", "word", "json", "zip")
+
+DEFAULT_SIZES = (100, 10000, 100000)
+
+# Form of every scenario (the app's default: first running bill)
+FORM = {
+    "bill_type": "Running Bill",
+    "bill_number": "First",
+    "premium_percent": 4.0,
+    "premium_type": "Above",
+    "work_order_amount": 854678,
+    "agreement_no": "48/2024-25",
+    "work_name": "Benchmark work",
+    "contractor_name": "Benchmark contractor"
+}
+
+# Fixed timestamps so the archive and PDF bytes do not vary between runs
+ZIP_DATE_TIME = (2025, 1, 1, 0, 0, 0)
+
+def _status_kib(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise OSError(f"{field} not in /proc/self/status")
+
+def reset_peak_rss():
+    """
+    Reset the process's peak RSS (Linux: VmHWM, via /proc/self/clear_refs).
+
+    Returns:
+        True if the peak was reset; otherwise peak_rss() is the peak since
+        the process started
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss():
+    """
+    Peak resident set size in bytes since the last reset_peak_rss().
+    """
+    try:
+        return _status_kib("VmHWM")
+    except OSError:
+        # ru_maxrss is in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def current_rss():
+    try:
+        return _status_kib("VmRSS")
+    except OSError:
+        return peak_rss()
+
+class StageRecorder:
+    """
+    Wall time and peak RSS of each stage of one scenario run.
+    """
+
+    def __init__(self):
+        self.stages = []
+        # Stages that failed or were skipped, with their status
+        self.unavailable = {}
+
+    def run(self, name, function, *args):
+        """
+        Run function(*args) as stage name.
+
+        Returns:
+            The function's result, or None if it raised (the stage is then
+            recorded as failed)
+        """
+        exact = reset_peak_rss()
+        start_rss = current_rss()
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        except Exception as e:
+            self.stages.append({"stage": name, "status": "failed", "error": f"{type(e).__name__}: {e}"})
+            self.unavailable[name] = "failed"
+            return None
+        seconds = time.perf_counter() - start
+        peak = peak_rss()
+        self.stages.append({
+            "stage": name,
+            "status": "ok",
+            "seconds": round(seconds, 6),
+            "peak_rss_bytes": peak,
+            "rss_growth_bytes": max(peak - start_rss, 0),
+            "exact_peak": exact
+        })
+        return result
+
+    def skip(self, name, reason):
+        self.stages.append({"stage": name, "status": "skipped", "reason": reason})
+        self.unavailable[name] = "skipped"
+
+    def ready(self, name, *needs):
+        """
+        Whether stage name can run; if a stage it needs failed or was
+        skipped, it is recorded as skipped too.
+        """
+        for need in needs:
+            if need in self.unavailable:
+                self.skip(name, f"{need} {self.unavailable[need]}")
+                return False
+        return True
+
+def render_html(env, sheets):
+    """Rendered page chunks, and the sheets whose template failed (skipped, as in preview)."""
+    pages, failed = [], []
+    for sheet_name, data in sheets:
+        try:
+            pages.extend(render_sheet_html(env, sheet_name, chunk) for chunk in paginate_sheet(sheet_name, data))
+        except TemplateError as e:
+            failed.append(f"{sheet_name}: {e}")
+    return pages, failed
+
+def render_pdfs(pages, wkhtmltopdf_path):
+    with ThreadPoolExecutor(max_workers=DEFAULT_RENDER_WORKERS) as executor:
+        return list(executor.map(lambda html: render_pdf_bytes(html, wkhtmltopdf_path=wkhtmltopdf_path), pages))
+
+def word_document(sheets):
+    buffer = io.BytesIO()
+    first_page = dict(sheets).get("First Page", {})
+    create_word_doc("first_page", first_page, buffer, header_data=first_page.get("header"))
+    return buffer.getvalue()
+
+def bill_json(sheets):
+    return json.dumps({sheet_name: data for sheet_name, data in sheets}, indent=2, default=str).encode("utf-8")
+
+def run_scenario(workbook_path, stages=STAGES, wkhtmltopdf_path=None):
+    """
+    Run the requested stages on one workbook, in this process.
+
+    Args:
+        workbook_path: Workbook to run on
+        stages: Names from STAGES to measure; stages that a measured stage
+            needs (parse, compute, render for pdf, pdf for merge) always run
+        wkhtmltopdf_path: Renderer for the pdf stage (looked up when omitted)
+
+    Returns:
+        List of stage result dictionaries in STAGES order
+    """
+    recorder = StageRecorder()
+    wkhtmltopdf_path = wkhtmltopdf_path or find_wkhtmltopdf()
+    wanted = set(stages)
+    if "merge" in wanted:
+        wanted.add("pdf")
+    if "pdf" in wanted:
+        wanted.add("render")
+
+    workbook = recorder.run("parse", read_workbook, workbook_path)
+    sheets = recorder.run("compute", compute_bill, *workbook, FORM) if recorder.ready("compute", "parse") else None
+    artifacts = []
+    if "render" in wanted and recorder.ready("render", "compute"):
+        rendered = recorder.run("render", render_html, create_environment(), sheets)
+        if rendered is not None:
+            pages, failed = rendered
+            if failed:
+                recorder.stages[-1]["template_errors"] = failed
+    if "pdf" in wanted:
+        if not wkhtmltopdf_path:
+            recorder.skip("pdf", "wkhtmltopdf not found")
+        elif recorder.ready("pdf", "render"):
+            pdfs = recorder.run("pdf", render_pdfs, pages, wkhtmltopdf_path)
+    if "merge" in wanted and recorder.ready("merge", "pdf"):
+        combined = recorder.run("merge", merge_pdf_bytes, pdfs, True)
+        if combined is not None:
+            artifacts.append(("bill.pdf", combined))
+    for name, file_name, function in (("word", "bill.docx", word_document), ("json", "bill.json", bill_json)):
+        if name in wanted and recorder.ready(name, "compute"):
+            data = recorder.run(name, function, sheets)
+            if data is not None:
+                artifacts.append((file_name, data))
+    if "zip" in wanted and recorder.ready("zip", "compute"):
+        recorder.run("zip", build_zip, artifacts, ZIP_DATE_TIME)
+    return [stage for stage in recorder.stages if stage["stage"] in stages]
+
+def _best(runs):
+    """Per stage, the fastest time and the lowest peak of the repeated runs; a run that did not measure it wins."""
+    best = []
+    for results in zip(*runs):
+        stage = dict(next((result for result in results if result["status"] != "ok"), results[0]))
+        measured = [result for result in results if result["status"] == "ok"]
+        if measured and len(measured) == len(results):
+            for key in ("seconds", "peak_rss_bytes", "rss_growth_bytes"):
+                stage[key] = min(result[key] for result in measured)
+        best.append(stage)
+    return best
+
+def ensure_workbook(directory, items, extra_items=None, seed=0):
+    """
+    Path of the synthetic workbook for a scenario, generated on first use.
+    """
+    suffix = "" if extra_items is None else f"_extra{extra_items}"
+    path = os.path.join(directory, f"synthetic_{items}{suffix}_seed{seed}.xlsx")
+    if not os.path.exists(path):
+        partial = path[:-len(".xlsx")] + ".partial.xlsx"
+        write_workbook(partial, items, extra_items, seed)
+        os.replace(partial, path)
+    return path
+
+def run_benchmark(sizes=DEFAULT_SIZES, stages=STAGES, repeat=1, workbook_dir=None, extra_items=None, seed=0,
+                  wkhtmltopdf_path=None, report=None):
+    """
+    Benchmark the pipeline on synthetic workbooks.
+
+    Args:
+        sizes: Item counts, one scenario each
+        stages: Stage names from STAGES to measure
+        repeat: Runs per scenario, each in a fresh process; the fastest
+            time and lowest peak of each stage are kept
+        workbook_dir: Directory the generated workbooks are kept in and
+            reused from (a temporary directory when omitted)
+        extra_items: Extra Items rows per workbook (defaults to one per 20 items)
+        seed: Random seed of the workbooks
+        wkhtmltopdf_path: Renderer for the pdf stage
+        report: Optional callable given each scenario result as it finishes
+
+    Returns:
+        Results dictionary: environment details and a list of scenarios with
+        their stage results
+    """
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}. Valid stages: {', '.join(STAGES)}")
+    wkhtmltopdf_path = wkhtmltopdf_path or find_wkhtmltopdf()
+    scenarios = []
+    with tempfile.TemporaryDirectory(prefix="bill-benchmark-") as temp_dir:
+        directory = workbook_dir or temp_dir
+        os.makedirs(directory, exist_ok=True)
+        for items in sizes:
+            path = ensure_workbook(directory, items, extra_items, seed)
+            runs = []
+            start = time.perf_counter()
+            for _ in range(max(repeat, 1)):
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    runs.append(executor.submit(run_scenario, path, tuple(stages), wkhtmltopdf_path).result())
+            scenario = {
+                "name": f"items_{items}",
+                "items": items,
+                "workbook_bytes": os.path.getsize(path),
+                "repeat": max(repeat, 1),
+                "wall_seconds": round(time.perf_counter() - start, 3),
+                "stages": _best(runs)
+            }
+            scenarios.append(scenario)
+            if report:
+                report(scenario)
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "wkhtmltopdf": wkhtmltopdf_path,
+        "seed": seed,
+        "scenarios": scenarios
+    }
+
+def format_scenario(scenario):
+    lines = [f"{scenario['name']} ({scenario['workbook_bytes'] / 1e6:.1f} MB workbook)"]
+    for stage in scenario["stages"]:
+        if stage["status"] == "ok":
+            lines.append(
+                f"  {stage['stage']:<8} {stage['seconds']:9.3f}s  peak RSS {stage['peak_rss_bytes'] / 2 ** 20:8.1f} MiB"
+                f"  (+{stage['rss_growth_bytes'] / 2 ** 20:.1f} MiB)"
+            )
+        else:
+            lines.append(f"  {stage['stage']:<8} {stage['status']}: {stage.get('reason') or stage.get('error')}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Items per workbook")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; the best of them is kept")
+    parser.add_argument("--extra-items", type=int, help="Extra Items rows (default: one per 20 items)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workbook-dir", help="Keep generated workbooks here and reuse them on later runs")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.sizes, args.stages, args.repeat, args.workbook_dir, args.extra_items, args.seed,
+        report=lambda scenario: print(format_scenario(scenario), file=sys.stderr)
+    )
+    print(f"CPU cores: {os.cpu_count()}, wkhtmltopdf: {results['wkhtmltopdf'] or 'not found'}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Fail when a pipeline stage got slower or bigger than the committed baseline.
+
+Runs the scenarios of the baseline file with pipeline_benchmark (or reads
+results from --results) and compares each stage's wall time and peak RSS
+with the baseline. A stage regresses when it exceeds the baseline by more
+than its relative tolerance and by more than the absolute noise floor.
+A stage that failed, was skipped (e.g. pdf without wkhtmltopdf) or hit
+template errors counts as a regression too, in the results and in the
+baseline, so a gap in coverage cannot pass unnoticed. Prints a diff report
+and exits 1 on a regression, 0 otherwise.
+
+Timings depend on the machine: record the baseline on the machine that runs
+the gate, with wkhtmltopdf installed, using --update, and commit it. --update
+refuses to record stages that did not run cleanly.
+
+Usage:
+    python benchmarks/regression_gate.py [--baseline benchmarks/baseline.json] [--results results.json]
+        [--time-tolerance 0.25] [--memory-tolerance 0.15] [--update]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline_benchmark import STAGES, run_benchmark
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Relative tolerances and absolute noise floors; a baseline file can override
+# them, for all stages or per stage ("stages": {"parse": {"seconds": 0.5}})
+DEFAULT_TOLERANCES = {
+    "seconds": 0.25,
+    "peak_rss": 0.15,
+    "min_seconds": 0.05,
+    "min_rss_bytes": 16 * 2 ** 20
+}
+
+# Scenarios recorded by --update when neither the baseline nor the command line names any
+DEFAULT_GATE_SIZES = (100, 10000)
+DEFAULT_GATE_REPEAT = 3
+
+# Comparison outcomes
+OK = "ok"
+IMPROVED = "improved"
+REGRESSED = "regressed"
+NOT_COMPARED = "not compared"
+
+def stage_problem(stage):
+    """
+    Why a stage result cannot serve as a measurement, or None if it can.
+    """
+    if stage["status"] != "ok":
+        return f"{stage['status']}: {stage.get('reason') or stage.get('error')}"
+    if stage.get("template_errors"):
+        return "template errors: " + "; ".join(stage["template_errors"])
+    return None
+
+def unclean_stages(results):
+    """
+    Stages of a results dictionary that did not run cleanly.
+
+    Returns:
+        List of "scenario stage: problem" strings
+    """
+    return [
+        f"{scenario['name']} {stage['stage']}: {stage_problem(stage)}"
+        for scenario in results.get("scenarios", [])
+        for stage in scenario["stages"]
+        if stage_problem(stage)
+    ]
+
+def stage_tolerances(tolerances, stage):
+    """
+    Tolerances of one stage: DEFAULT_TOLERANCES, then the file's global
+    values, then its per-stage values.
+    """
+    merged = dict(DEFAULT_TOLERANCES)
+    merged.update({key: value for key, value in tolerances.items() if key != "stages"})
+    merged.update(tolerances.get("stages", {}).get(stage, {}))
+    return merged
+
+def _check(metric, before, after, relative, floor):
+    limit = before * (1 + relative)
+    if after > limit and after - before > floor:
+        status = REGRESSED
+    elif after < before / (1 + relative) and before - after > floor:
+        status = IMPROVED
+    else:
+        status = OK
+    return {
+        "metric": metric,
+        "baseline": before,
+        "current": after,
+        "change": (after - before) / before if before else 0.0,
+        "tolerance": relative,
+        "status": status
+    }
+
+def compare(baseline, results, tolerances=None):
+    """
+    Compare benchmark results with a baseline.
+
+    Args:
+        baseline: Baseline dictionary (pipeline_benchmark results, optionally
+            with "tolerances")
+        results: Current pipeline_benchmark results
+        tolerances: Tolerances overriding the baseline's
+
+    Returns:
+        List of comparison dictionaries with scenario, stage, metric,
+        baseline, current, change (relative), tolerance, status and, for
+        stages that could not be compared, reason. Stages that did not
+        run cleanly in the baseline or the results regress; stages that
+        were not run at all are not compared
+    """
+    tolerances = dict(baseline.get("tolerances", {}), **(tolerances or {}))
+    current = {scenario["name"]: scenario for scenario in results.get("scenarios", [])}
+    rows = []
+    for scenario in baseline.get("scenarios", []):
+        name = scenario["name"]
+        stages = {stage["stage"]: stage for stage in current.get(name, {}).get("stages", [])}
+        for before in scenario["stages"]:
+            row = {"scenario": name, "stage": before["stage"]}
+            after = stages.get(before["stage"])
+            if stage_problem(before):
+                rows.append(dict(row, status=REGRESSED, reason=f"baseline {stage_problem(before)}; record it again"))
+            elif name not in current:
+                rows.append(dict(row, status=REGRESSED, reason="scenario missing from results"))
+            elif after is None:
+                rows.append(dict(row, status=NOT_COMPARED, reason="not run"))
+            elif stage_problem(after):
+                rows.append(dict(row, status=REGRESSED, reason=stage_problem(after)))
+            else:
+                limits = stage_tolerances(tolerances, before["stage"])
+                rows.append(dict(row, **_check(
+                    "seconds", before["seconds"], after["seconds"], limits["seconds"], limits["min_seconds"]
+                )))
+                rows.append(dict(row, **_check(
+                    "peak_rss", before["peak_rss_bytes"], after["peak_rss_bytes"], limits["peak_rss"],
+                    limits["min_rss_bytes"]
+                )))
+    return rows
+
+def _value(metric, value):
+    return f"{value:.3f}s" if metric == "seconds" else f"{value / 2 ** 20:.1f} MiB"
+
+def format_report(rows):
+    """
+    Readable diff report: one line per compared metric, regressions marked.
+    """
+    lines = []
+    for row in rows:
+        prefix = f"{row['scenario']:<14} {row['stage']:<8}"
+        if "metric" not in row:
+            lines.append(f"{prefix} {'':<9} {row['status']}: {row['reason']}")
+            continue
+        change = f"{row['change']:+.1%}"
+        limit = f"(limit +{row['tolerance']:.0%})"
+        marker = "  <-- REGRESSED" if row["status"] == REGRESSED else ""
+        lines.append(
+            f"{prefix} {row['metric']:<9} {_value(row['metric'], row['baseline']):>11} -> "
+            f"{_value(row['metric'], row['current']):>11} {change:>8} {limit} {row['status']}{marker}"
+        )
+    regressed = sum(row["status"] == REGRESSED for row in rows)
+    lines.append(f"{regressed} regression(s) in {len(rows)} comparison(s)" if regressed else "No regressions")
+    return "\n".join(lines)
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare with")
+    parser.add_argument("--results", help="Compare these pipeline_benchmark results instead of running the scenarios")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Scenarios to run (default: those of the baseline)")
+    parser.add_argument("--repeat", type=int, help="Runs per scenario (default: the baseline's)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="Stages to run (default: all)")
+    parser.add_argument("--workbook-dir", help="Keep generated workbooks here and reuse them on later runs")
+    parser.add_argument("--time-tolerance", type=float, help="Allowed relative slowdown of every stage, e.g. 0.25")
+    parser.add_argument("--memory-tolerance", type=float, help="Allowed relative peak RSS growth of every stage")
+    parser.add_argument("--output", help="Also write the current results to this file")
+    parser.add_argument("--update", action="store_true", help="Record the current results as the new baseline")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        baseline = load_json(args.baseline)
+    elif not args.update:
+        parser.error(f"Baseline {args.baseline} not found; record one with --update")
+
+    if args.results:
+        try:
+            results = load_json(args.results)
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot read results {args.results}: {e}")
+    else:
+        sizes = args.sizes or [scenario["items"] for scenario in (baseline or {}).get("scenarios", [])]
+        repeat = args.repeat or max((scenario["repeat"] for scenario in (baseline or {}).get("scenarios", [])),
+                                    default=DEFAULT_GATE_REPEAT)
+        results = run_benchmark(
+            sizes or DEFAULT_GATE_SIZES, args.stages or STAGES, repeat, args.workbook_dir,
+            seed=(baseline or {}).get("seed", 0)
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update:
+        unclean = unclean_stages(results)
+        if unclean:
+            parser.error("Not recording a baseline with stages that did not run cleanly:\n  " + "\n  ".join(unclean))
+        if baseline and "tolerances" in baseline:
+            results["tolerances"] = baseline["tolerances"]
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    tolerances = {}
+    if args.time_tolerance is not None:
+        tolerances["seconds"] = args.time_tolerance
+    if args.memory_tolerance is not None:
+        tolerances["peak_rss"] = args.memory_tolerance
+    if args.sizes and not args.results:
+        # Only the scenarios that were run
+        baseline = dict(baseline, scenarios=[
+            scenario for scenario in baseline["scenarios"] if scenario["items"] in args.sizes
+        ])
+    rows = compare(baseline, results, tolerances)
+    print(format_report(rows))
+    return 1 if any(row["status"] == REGRESSED for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
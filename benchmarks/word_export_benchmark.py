@@ -0,0 +1,74 @@
+"""
+Benchmark Word table export: per-cell python-docx filling vs bulk row XML.
+
+Usage:
+    python benchmarks/word_export_benchmark.py [--sizes 1000 10000 50000] [--legacy-limit 10000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from docx import Document
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from word_export import add_bulk_table
+
+HEADERS = ["S.No", "Description", "Unit", "Quantity", "Rate", "Amount", "Remark"]
+
+def make_rows(count):
+    return [
+        [i + 1, f"Supply and fixing of item {i + 1} complete as per specification", "Nos",
+         f"{(i % 50) + 1:.2f}", f"{100 + i % 900:.2f}", f"{((i % 50) + 1) * (100 + i % 900):.2f}", ""]
+        for i in range(count)
+    ]
+
+def export_per_cell(rows):
+    """The original approach: add_row() and cell.text per value."""
+    doc = Document()
+    table = doc.add_table(rows=1, cols=len(HEADERS))
+    table.style = 'Table Grid'
+    for i, header in enumerate(HEADERS):
+        table.rows[0].cells[i].text = header
+    for values in rows:
+        cells = table.add_row().cells
+        for i, value in enumerate(values):
+            cells[i].text = str(value)
+    return doc
+
+def export_bulk(rows):
+    doc = Document()
+    add_bulk_table(doc, HEADERS, rows)
+    return doc
+
+def time_export(export, rows):
+    start = time.perf_counter()
+    export(rows)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-limit", type=int, default=10000,
+                        help="Skip the per-cell export above this many items (it grows quadratically)")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        rows = make_rows(size)
+        bulk = time_export(export_bulk, rows)
+        per_cell = time_export(export_per_cell, rows) if size <= args.legacy_limit else None
+        results.append({
+            "items": size,
+            "bulk_seconds": round(bulk, 4),
+            "per_cell_seconds": round(per_cell, 4) if per_cell is not None else None,
+            "speedup": round(per_cell / bulk, 1) if per_cell else None
+        })
+        print(f"{size:>7} items: bulk {bulk:8.3f}s   per-cell {'skipped' if per_cell is None else f'{per_cell:8.3f}s'}")
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark output archive packaging: zipfile ZIP_DEFLATED loop vs parallel compression.
+
+Usage:
+    python benchmarks/zip_benchmark.py [--bills 100 500] [--workers 1 2 4 8]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zip_packager import build_zip
+
+def make_members(bills):
+    """HTML and JSON members of roughly the size a rendered bill produces."""
+    members = []
+    for i in range(bills):
+        rows = "".join(
+            f"<tr><td>{j + 1}</td><td>Supply and fixing of item {j + 1} for bill {i}</td>"
+            f"<td>Nos</td><td>{(j % 50) + 1:.2f}</td><td>{100 + (i * j) % 900:.2f}</td></tr>"
+            for j in range(400)
+        )
+        members.append((f"bill_{i:04d}.html", f"<table>{rows}</table>".encode("utf-8")))
+        members.append((f"bill_{i:04d}.json", json.dumps({"bill": i, "rows": rows[:20000]}).encode("utf-8")))
+    return members
+
+def package_zipfile(members):
+    """The current approach: one ZipFile with ZIP_DEFLATED for every member."""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return output.getvalue()
+
+def time_packaging(package, members):
+    start = time.perf_counter()
+    data = package(members)
+    return time.perf_counter() - start, len(data)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bills", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    results = []
+    for bills in args.bills:
+        members = make_members(bills)
+        raw_size = sum(len(data) for _, data in members)
+        baseline, baseline_size = time_packaging(package_zipfile, members)
+        print(f"{bills:>5} bills ({raw_size / 1e6:.1f} MB): zipfile {baseline:7.3f}s")
+        for workers in args.workers:
+            seconds, size = time_packaging(
+                lambda m: build_zip(m, parallel=True, max_workers=workers), members
+            )
+            results.append({
+                "bills": bills,
+                "workers": workers,
+                "input_bytes": raw_size,
+                "zipfile_seconds": round(baseline, 4),
+                "zipfile_bytes": baseline_size,
+                "parallel_seconds": round(seconds, 4),
+                "parallel_bytes": size,
+                "speedup": round(baseline / seconds, 2)
+            })
+            print(f"{'':>5} {workers:>2} workers: parallel {seconds:7.3f}s  ({baseline / seconds:.2f}x)")
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
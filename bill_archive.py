@@ -0,0 +1,257 @@
+"""
+Columnar archive of computed bill line items, for management reports.
+
+Usage:
+    python bill_archive.py --by contractor|item|month [--from YYYY-MM] [--to YYYY-MM]
+                           [--root DIR] [--compact]
+
+Every archived bill is appended as a Parquet file under a month=YYYY-MM
+partition directory, so reports over a date range only read the months in
+range, and only the columns they aggregate. Regenerating a bill appends a new
+copy; queries use the latest copy of each (agreement, bill number).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from bill_history import bill_agreement, bill_header, bill_line_items
+from state_store import DEFAULT_STATE_DIR
+
+DEFAULT_ARCHIVE_DIR = os.environ.get("BILL_ARCHIVE_DIR", os.path.join(DEFAULT_STATE_DIR, "archive"))
+
+PARTITION_FIELD = "month"
+
+SCHEMA = pa.schema([
+    ("agreement_no", pa.string()),
+    ("contractor", pa.string()),
+    ("bill_serial", pa.int32()),
+    ("bill_number", pa.string()),
+    ("bill_type", pa.string()),
+    ("bill_date", pa.date32()),
+    ("position", pa.int32()),
+    ("serial_no", pa.string()),
+    ("description", pa.string()),
+    ("unit", pa.string()),
+    ("bsr", pa.string()),
+    ("quantity", pa.float64()),
+    ("rate", pa.float64()),
+    ("amount", pa.int64()),
+    ("is_extra", pa.bool_()),
+    ("archived_at", pa.float64())
+])
+
+# Columns identifying one copy of one bill; needed by every query to drop superseded copies
+BILL_KEY = ["agreement_no", "bill_serial"]
+COPY_KEY = BILL_KEY + ["archived_at"]
+
+# Report groupings: name -> grouping columns
+GROUPINGS = {
+    "contractor": ["contractor"],
+    "item": ["bsr", "unit"],
+    "month": [PARTITION_FIELD]
+}
+
+def line_item_table(sheets, bill_date=None, archived_at=None):
+    """
+    Line items of a computed bill as an Arrow table in the archive schema.
+
+    Args:
+        sheets: List of (sheet_name, template_data) pairs from compute_bill
+        bill_date: Date of the bill (defaults to today)
+        archived_at: Archive timestamp in seconds (defaults to now)
+
+    Returns:
+        pyarrow.Table, empty if the bill has no line items
+    """
+    header = bill_header(sheets)
+    items = bill_line_items(sheets)
+    columns = {name: [] for name in SCHEMA.names}
+    for position, item in enumerate(items):
+        for key in ("agreement_no", "contractor", "bill_serial", "bill_number", "bill_type"):
+            columns[key].append(header[key])
+        for key, value in item.items():
+            columns[key].append(value)
+        columns["position"].append(position)
+    n = len(items)
+    columns["bill_date"] = [bill_date or date.today()] * n
+    columns["archived_at"] = [archived_at if archived_at is not None else time.time()] * n
+    return pa.table(columns, schema=SCHEMA)
+
+class BillArchive:
+    """
+    Append-only, month-partitioned Parquet archive of bill line items.
+    """
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, clock=time.time):
+        self.root = os.path.abspath(root)
+        self.clock = clock
+        os.makedirs(self.root, exist_ok=True)
+
+    def _partition_dir(self, month):
+        return os.path.join(self.root, f"{PARTITION_FIELD}={month}")
+
+    def _write(self, table, directory):
+        os.makedirs(directory, exist_ok=True)
+        # Dot-prefixed files are ignored by readers until renamed into place
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".parquet.tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, temp_path, compression="zstd")
+            path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return path
+
+    def append(self, sheets, bill_date=None):
+        """
+        Archive the line items of a computed bill.
+
+        Args:
+            sheets: List of (sheet_name, template_data) pairs from compute_bill
+            bill_date: Date of the bill (defaults to today); picks the partition
+
+        Returns:
+            Path of the written file, or None if the bill has no agreement
+            number or no line items
+        """
+        if not bill_agreement(sheets):
+            return None
+        bill_date = bill_date or date.today()
+        table = line_item_table(sheets, bill_date, self.clock())
+        if table.num_rows == 0:
+            return None
+        return self._write(table, self._partition_dir(f"{bill_date:%Y-%m}"))
+
+    def months(self):
+        """
+        Archived months, oldest first.
+        """
+        prefix = f"{PARTITION_FIELD}="
+        return sorted(name[len(prefix):] for name in os.listdir(self.root) if name.startswith(prefix))
+
+    def _dataset(self):
+        return ds.dataset(
+            self.root, format="parquet", schema=SCHEMA.append(pa.field(PARTITION_FIELD, pa.string())),
+            partitioning=ds.partitioning(pa.schema([(PARTITION_FIELD, pa.string())]), flavor="hive")
+        )
+
+    def read(self, columns=None, start=None, end=None, latest_only=True):
+        """
+        Load archived line items.
+
+        Args:
+            columns: Columns to read (default all); the agreement_no,
+                bill_serial and archived_at columns are always included
+            start: First month to include, "YYYY-MM"
+            end: Last month to include, "YYYY-MM"
+            latest_only: Drop line items of superseded copies of a bill
+
+        Returns:
+            pandas DataFrame with one row per line item
+        """
+        names = SCHEMA.names + [PARTITION_FIELD]
+        unknown = [column for column in columns or () if column not in names]
+        if unknown:
+            raise ValueError(f"Unknown archive columns: {unknown}")
+        wanted = set(COPY_KEY).union(columns or names)
+        columns = [column for column in names if column in wanted]
+        if not self.months():
+            return pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+
+        # Month bounds prune whole partition directories
+        condition = ds.field(PARTITION_FIELD) >= start if start else None
+        if end:
+            before_end = ds.field(PARTITION_FIELD) <= end
+            condition = before_end if condition is None else condition & before_end
+        frame = self._dataset().to_table(columns=columns, filter=condition).to_pandas()
+        if latest_only and not frame.empty:
+            latest = frame.groupby(BILL_KEY, sort=False)["archived_at"].transform("max")
+            frame = frame[frame["archived_at"] == latest].reset_index(drop=True)
+        return frame
+
+    def aggregate(self, by, start=None, end=None):
+        """
+        Totals of the archived line items per group.
+
+        Args:
+            by: "contractor", "item" (BSR code and unit) or "month", or a list
+                of archive columns
+            start: First month to include, "YYYY-MM"
+            end: Last month to include, "YYYY-MM"
+
+        Returns:
+            pandas DataFrame with the grouping columns, bills, items, quantity
+            and amount, largest amount first
+        """
+        if isinstance(by, str) and by not in GROUPINGS:
+            raise ValueError(f"Unknown grouping: {by} (expected one of {', '.join(sorted(GROUPINGS))})")
+        keys = GROUPINGS[by] if isinstance(by, str) else list(by)
+        frame = self.read(keys + ["quantity", "amount"], start, end)
+        if frame.empty:
+            return pd.DataFrame(columns=keys + ["bills", "items", "quantity", "amount"])
+        frame["bill"] = frame["agreement_no"] + "#" + frame["bill_serial"].astype(str)
+        totals = frame.groupby(keys, sort=False).agg(
+            bills=("bill", "nunique"), items=("amount", "size"), quantity=("quantity", "sum"), amount=("amount", "sum")
+        )
+        return totals.sort_values("amount", ascending=False, kind="stable").reset_index()
+
+    def totals_by_contractor(self, start=None, end=None):
+        return self.aggregate("contractor", start, end)
+
+    def totals_by_item(self, start=None, end=None):
+        return self.aggregate("item", start, end)
+
+    def totals_by_month(self, start=None, end=None):
+        return self.aggregate("month", start, end).sort_values(PARTITION_FIELD, ignore_index=True)
+
+    def compact(self, month):
+        """
+        Rewrite a month's files as one file holding only the latest copy of
+        each bill. Files appended while compacting are kept.
+
+        Returns:
+            Number of files replaced
+        """
+        directory = self._partition_dir(month)
+        paths = [
+            os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith(".parquet") and not name.startswith(".")
+        ] if os.path.isdir(directory) else []
+        if len(paths) < 2:
+            return 0
+        frame = pq.read_table(paths, schema=SCHEMA).to_pandas()
+        latest = frame.groupby(BILL_KEY, sort=False)["archived_at"].transform("max")
+        frame = frame[frame["archived_at"] == latest].sort_values(BILL_KEY + ["position"])
+        self._write(pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False), directory)
+        for path in paths:
+            os.unlink(path)
+        return len(paths)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--by", choices=sorted(GROUPINGS), required=True, help="Report grouping")
+    parser.add_argument("--from", dest="start", help="First month, YYYY-MM")
+    parser.add_argument("--to", dest="end", help="Last month, YYYY-MM")
+    parser.add_argument("--root", default=DEFAULT_ARCHIVE_DIR, help="Archive directory")
+    parser.add_argument("--compact", action="store_true", help="Compact every month before reporting")
+    args = parser.parse_args(argv)
+
+    archive = BillArchive(args.root)
+    if args.compact:
+        for month in archive.months():
+            archive.compact(month)
+    report = archive.totals_by_month if args.by == "month" else lambda start, end: archive.aggregate(args.by, start, end)
+    report(args.start, args.end).to_csv(sys.stdout, index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
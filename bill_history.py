@@ -0,0 +1,352 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import date
+import pandas as pd
+from num2words import num2words
+from state_store import DEFAULT_STATE_DIR
+
+DEFAULT_HISTORY_DB = os.environ.get("BILL_HISTORY_DB", os.path.join(DEFAULT_STATE_DIR, "bill_history.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id INTEGER PRIMARY KEY,
+    agreement_no TEXT NOT NULL,
+    contractor TEXT NOT NULL,
+    bill_serial INTEGER NOT NULL,
+    bill_number TEXT NOT NULL,
+    bill_type TEXT NOT NULL,
+    bill_date TEXT NOT NULL,
+    work_order_total INTEGER NOT NULL,
+    extra_items_total INTEGER NOT NULL,
+    premium_amount INTEGER NOT NULL,
+    payable_amount INTEGER NOT NULL,
+    amount_paid_last_bill INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (agreement_no, bill_serial)
+);
+CREATE INDEX IF NOT EXISTS bills_contractor ON bills (contractor, agreement_no, bill_serial);
+CREATE TABLE IF NOT EXISTS bill_items (
+    bill_id INTEGER NOT NULL REFERENCES bills (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    serial_no TEXT NOT NULL,
+    description TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    bsr TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    rate REAL NOT NULL,
+    amount INTEGER NOT NULL,
+    is_extra INTEGER NOT NULL,
+    PRIMARY KEY (bill_id, position)
+);
+"""
+
+# Header labels in the Work Order sheet (see process_bill's header rows)
+AGREEMENT_LABEL = "agreement no"
+CONTRACTOR_LABEL = "name of contractor"
+WORK_LABEL = "name of work"
+
+def bill_number_name(serial):
+    """
+    Bill number as shown on the bill: 1 -> "First", 2 -> "Second", ...
+    """
+    return num2words(serial, to="ordinal").title()
+
+def bill_serial_for(bill_number):
+    """
+    Inverse of bill_number_name; also accepts the serial itself ("2" or 2).
+    Returns None for unrecognised names.
+    """
+    text = str(bill_number).strip()
+    if text.isdigit():
+        return int(text) if 0 < int(text) < 100 else None
+    for serial in range(1, 100):
+        if bill_number_name(serial).lower() == text.lower():
+            return serial
+    return None
+
+def workbook_identity(ws_wo):
+    """
+    Read the agreement number, contractor and work from the Work Order header rows.
+
+    Args:
+        ws_wo: Work Order sheet DataFrame
+
+    Returns:
+        Dictionary with agreement_no, contractor_name and work_name (empty
+        when not found)
+    """
+    identity = {"agreement_no": "", "contractor_name": "", "work_name": ""}
+    # Labels whose value is on the same row after the label, or on the next row
+    labels = {CONTRACTOR_LABEL: "contractor_name", WORK_LABEL: "work_name"}
+    rows = ws_wo.iloc[:20, :7].values.tolist()
+    for index, row in enumerate(rows):
+        cells = [str(value).strip() for value in row if pd.notnull(value) and str(value).strip()]
+        if not cells:
+            continue
+        label = cells[0].lower()
+        if label.startswith(AGREEMENT_LABEL) and len(cells) > 1:
+            identity["agreement_no"] = cells[1]
+            continue
+        for prefix, key in labels.items():
+            if not label.startswith(prefix):
+                continue
+            if len(cells) > 1:
+                identity[key] = cells[1]
+            elif index + 1 < len(rows):
+                following = [str(value).strip() for value in rows[index + 1] if pd.notnull(value) and str(value).strip()]
+                identity[key] = following[0] if following else ""
+    return identity
+
+def bill_agreement(sheets):
+    """
+    Agreement number a computed bill is filed under, or "" if it has none.
+
+    Bills without one are never stored, so check this before bill_header,
+    which rejects bill numbers it cannot file.
+    """
+    return str(dict(sheets).get("Note Sheet", {}).get("header", {}).get("agreement_no") or "").strip()
+
+def bill_header(sheets):
+    """
+    Identity of a computed bill, from the Note Sheet header that process_bill
+    fills from the bill inputs.
+
+    Args:
+        sheets: List of (sheet_name, template_data) pairs from compute_bill
+
+    Returns:
+        Dictionary with agreement_no, contractor, work_name, bill_serial,
+        bill_number and bill_type (agreement_no is empty when the bill has none)
+
+    Raises:
+        ValueError: If the bill number is not First, Second, ... or a serial
+    """
+    header = dict(sheets).get("Note Sheet", {}).get("header", {})
+    bill_number = header.get("bill_number") or "First"
+    serial = bill_serial_for(bill_number)
+    if serial is None:
+        # Filing it under another serial would replace that bill
+        raise ValueError(f"Unrecognised bill number {bill_number!r}: expected First, Second, ... or 1, 2, ...")
+    return {
+        "agreement_no": str(header.get("agreement_no") or "").strip(),
+        "contractor": str(header.get("name_of_firm") or "").strip(),
+        "work_name": str(header.get("name_of_work") or "").strip(),
+        "bill_serial": serial,
+        "bill_number": bill_number_name(serial),
+        "bill_type": header.get("bill_type") or "Running Bill"
+    }
+
+def bill_line_items(sheets):
+    """
+    Line items of a computed bill, from the First Page in bill order.
+
+    Work Order items come first, then extra items (after the divider row).
+    The "No Extra Items" placeholder row is skipped.
+
+    Args:
+        sheets: List of (sheet_name, template_data) pairs from compute_bill
+
+    Returns:
+        List of dictionaries with serial_no, description, unit, bsr,
+        quantity, rate, amount and is_extra
+    """
+    items, is_extra = [], False
+    for item in dict(sheets).get("First Page", {}).get("items", []):
+        if item.get("is_divider"):
+            is_extra = True
+            continue
+        if "quantity" not in item:
+            continue
+        items.append({
+            "serial_no": str(item.get("serial_no", "")),
+            "description": str(item.get("description", "")),
+            "unit": str(item.get("unit", "")),
+            "bsr": str(item.get("remark", "")),
+            "quantity": float(item["quantity"]),
+            "rate": float(item.get("rate", 0)),
+            "amount": int(item.get("amount", 0)),
+            "is_extra": is_extra
+        })
+    return items
+
+class BillHistory:
+    """
+    Archive of generated bills and their line items in SQLite.
+
+    Bills are keyed by (agreement_no, bill_serial), so the latest bill of an
+    agreement is one index probe however many bills are archived.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_DB, clock=time.time):
+        self.path = path
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def previous_bill(self, agreement_no, before_serial=None):
+        """
+        Latest archived bill of an agreement.
+
+        Args:
+            agreement_no: Agreement number
+            before_serial: Only consider bills with a lower serial (e.g. when
+                regenerating an older bill)
+
+        Returns:
+            Bill dictionary, or None if the agreement has no earlier bill
+        """
+        query = "SELECT * FROM bills WHERE agreement_no = ?"
+        params = [agreement_no]
+        if before_serial is not None:
+            query += " AND bill_serial < ?"
+            params.append(before_serial)
+        with closing(self._connect()) as conn:
+            row = conn.execute(query + " ORDER BY bill_serial DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def bills(self, agreement_no=None, contractor=None):
+        """
+        Archived bills, filtered by agreement or contractor, in serial order.
+        """
+        conditions, params = [], []
+        if agreement_no is not None:
+            conditions.append("agreement_no = ?")
+            params.append(agreement_no)
+        if contractor is not None:
+            conditions.append("contractor = ?")
+            params.append(contractor)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT * FROM bills{where} ORDER BY agreement_no, bill_serial", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def items(self, bill_id):
+        """
+        Line items of an archived bill, in bill order.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM bill_items WHERE bill_id = ? ORDER BY position", (bill_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_bill(self, sheets, bill_date=None):
+        """
+        Archive a generated bill, replacing an earlier copy of the same serial.
+
+        The agreement, contractor, bill number and type are taken from the
+        Note Sheet header that process_bill fills from the bill inputs.
+
+        Args:
+            sheets: List of (sheet_name, template_data) pairs from compute_bill
+            bill_date: Optional date of the bill (defaults to today)
+
+        Returns:
+            Bill id, or None if the bill has no agreement number to file it under
+        """
+        data = dict(sheets)
+        if not bill_agreement(sheets):
+            return None
+        header = bill_header(sheets)
+        totals = data.get("First Page", {}).get("totals", {})
+        last_page = data.get("Last Page", {})
+        items = [
+            (position, item["serial_no"], item["description"], item["unit"], item["bsr"], item["quantity"],
+             item["rate"], item["amount"], int(item["is_extra"]))
+            for position, item in enumerate(bill_line_items(sheets))
+        ]
+        agreement_no, serial = header["agreement_no"], header["bill_serial"]
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM bills WHERE agreement_no = ? AND bill_serial = ?", (agreement_no, serial))
+            cursor = conn.execute(
+                "INSERT INTO bills (agreement_no, contractor, bill_serial, bill_number, bill_type, bill_date,"
+                " work_order_total, extra_items_total, premium_amount, payable_amount, amount_paid_last_bill, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    agreement_no, header["contractor"], serial, header["bill_number"], header["bill_type"],
+                    str(bill_date or date.today()),
+                    int(totals.get("work_order_total", 0)),
+                    int(data.get("Extra Items", {}).get("totals", {}).get("extra_items_total", 0)),
+                    int((totals.get("premium") or {}).get("amount", 0)),
+                    int(last_page.get("payable_amount", 0)), int(last_page.get("amount_paid_last_bill", 0)),
+                    self.clock()
+                )
+            )
+            bill_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO bill_items (bill_id, position, serial_no, description, unit, bsr, quantity, rate, amount, is_extra)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(bill_id, *item) for item in items]
+            )
+            conn.execute("COMMIT")
+        return bill_id
+
+def next_bill_inputs(previous):
+    """
+    Bill inputs carried forward from the previous bill of an agreement.
+
+    Running bills are cumulative, so the amount paid up to the last bill is
+    that bill's payable amount.
+
+    Args:
+        previous: Bill dictionary from BillHistory.previous_bill, or None
+
+    Returns:
+        Dictionary with bill_number, amount_paid_last_bill and last_bill
+    """
+    if previous is None:
+        return {"bill_number": bill_number_name(1), "amount_paid_last_bill": 0, "last_bill": "Not Applicable"}
+    return {
+        "bill_number": bill_number_name(previous["bill_serial"] + 1),
+        "amount_paid_last_bill": previous["payable_amount"],
+        "last_bill": f"{previous['bill_number']} {previous['bill_type']} dated {previous['bill_date']}"
+    }
+
+def with_identity(form, ws_wo):
+    """
+    Fill agreement_no, contractor_name and work_name from the Work Order
+    header where the form leaves them empty.
+
+    Returns:
+        New form dictionary
+    """
+    form = dict(form)
+    for key, value in workbook_identity(ws_wo).items():
+        if value and not form.get(key):
+            form[key] = value
+    return form
+
+def apply_history(form, ws_wo, history):
+    """
+    Complete bill inputs from the workbook header and the bill history.
+
+    The agreement number, contractor and work are read from the Work Order
+    header when the form does not give them (see with_identity). The previous
+    bill's figures (see next_bill_inputs) fill bill_number,
+    amount_paid_last_bill and last_bill unless the form sets them explicitly.
+
+    Args:
+        form: Dictionary with the bill form fields
+        ws_wo: Work Order sheet DataFrame
+        history: BillHistory
+
+    Returns:
+        New form dictionary
+    """
+    form = with_identity(form, ws_wo)
+    if form.get("agreement_no"):
+        for key, value in next_bill_inputs(history.previous_bill(form["agreement_no"])).items():
+            form.setdefault(key, value)
+    return form
@@ -0,0 +1,208 @@
+import io
+import json
+import os
+import pandas as pd
+from datetime import date, datetime
+from jinja2 import Environment, FileSystemLoader
+from utils import process_bill, create_word_doc
+from output_plan import parse_outputs, plan_stages
+from pdf_pipeline import render_sheet_pdfs, merge_pdf_bytes
+from bill_history import apply_history
+from bsr_schedule import apply_schedule
+from stage_timing import stage
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+SHEET_NAMES = ["Work Order", "Bill Quantity", "Extra Items"]
+
+def create_environment():
+    """
+    Create the Jinja2 environment for the bill templates.
+    """
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    env.filters['strptime'] = lambda s, fmt: datetime.strptime(s, fmt) if s else None
+    return env
+
+def read_workbook(source, timer=None):
+    """
+    Read the Work Order, Bill Quantity and Extra Items sheets.
+
+    Args:
+        source: Path, bytes or file-like object of an .xlsx workbook
+        timer: Optional StageTimer recording the "parse" stage
+
+    Returns:
+        Tuple of (ws_wo, ws_bq, ws_extra) DataFrames
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with stage("parse", timer), pd.ExcelFile(source) as xls:
+        missing = [name for name in SHEET_NAMES if name not in xls.sheet_names]
+        if missing:
+            raise ValueError(f"Excel file missing required sheets: {missing}")
+        return tuple(pd.read_excel(xls, name, header=None) for name in SHEET_NAMES)
+
+def build_user_inputs(form):
+    """
+    Build the user_inputs dictionary expected by process_bill from form values.
+
+    Args:
+        form: Dictionary with the bill form fields (premium_percent, premium_type,
+            premium_position, amount_paid_last_bill, start_date, completion_date,
+            bill_type, bill_number, work_order_amount)
+
+    Returns:
+        Dictionary of user inputs
+    """
+    user_inputs = {
+        "work_order_amount": form.get("work_order_amount", 0),
+        "premium_percent": form.get("premium_percent", 0.0),
+        "premium_type": form.get("premium_type", "Above"),
+        "amount_paid_last_bill": form.get("amount_paid_last_bill", 0),
+        "start_date": form.get("start_date", date.today()),
+        "completion_date": form.get("completion_date", date.today()),
+        "bill_type": form.get("bill_type", "Running Bill"),
+        "bill_number": form.get("bill_number", "First"),
+        "is_first_bill": form.get("bill_type", "Running Bill") == "Running Bill" and form.get("bill_number", "First") == "First",
+        "premium_position": form.get("premium_position", "Percentage")
+    }
+    # Pass through any extra fields (agreement no, contractor, ...)
+    for key, value in form.items():
+        user_inputs.setdefault(key, value)
+    return user_inputs
+
+def compute_bill(ws_wo, ws_bq, ws_extra, form, history=None, schedule=None, timer=None):
+    """
+    Run process_bill and collect the template data for every sheet.
+
+    Args:
+        ws_wo: Work Order sheet DataFrame
+        ws_bq: Bill Quantity sheet DataFrame
+        ws_extra: Extra Items sheet DataFrame
+        form: Dictionary with the bill form fields (see build_user_inputs)
+        history: Optional BillHistory; the previous bill of the agreement
+            supplies amount_paid_last_bill, bill_number and last_bill when
+            the form does not (see bill_history.apply_history)
+        schedule: Optional BsrSchedule; every item's rate and unit are
+            checked against it and the result is added to the First Page
+            data as "bsr_validation". When the form sets
+            fill_bsr_descriptions, empty item descriptions are taken from it
+        timer: Optional StageTimer recording the "compute" stage
+
+    Returns:
+        List of (sheet_name, template_data) pairs in output order
+    """
+    if history is not None:
+        form = apply_history(form, ws_wo, history)
+    user_inputs = build_user_inputs(form)
+    with stage("compute", timer):
+        first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data = process_bill(
+            ws_wo, ws_bq, ws_extra,
+            premium_percent=user_inputs["premium_percent"],
+            premium_type=user_inputs["premium_type"],
+            amount_paid_last_bill=user_inputs["amount_paid_last_bill"],
+            is_first_bill=user_inputs["is_first_bill"],
+            user_inputs=user_inputs
+        )
+        if schedule is not None:
+            apply_schedule(first_page_data, schedule, fill_descriptions=bool(form.get("fill_bsr_descriptions")))
+
+    sheets = []
+    for sheet_name, data in {
+        "First Page": first_page_data,
+        "Last Page": last_page_data,
+        "Deviation Statement": deviation_data,
+        "Extra Items": extra_items_data,
+        "Note Sheet": note_sheet_data
+    }.items():
+        if data is None:
+            continue
+
+        # Prepare template data
+        template_data = data.copy()
+        template_data.update({
+            "premium_percent": user_inputs["premium_percent"],
+            "premium_type": user_inputs["premium_type"],
+            "amount_paid_last_bill": user_inputs["amount_paid_last_bill"],
+            "premium_position": user_inputs["premium_position"]
+        })
+        sheets.append((sheet_name, template_data))
+    return sheets
+
+def generate_outputs(sheets, outputs=None, env=None, name="contractor_bill", deterministic=False, max_workers=None,
+                     wkhtmltopdf_path=None, timer=None, timeout=None):
+    """
+    Produce the requested artifacts for a computed bill.
+
+    Only the stages needed for the requested outputs run (see
+    output_plan.plan_stages); e.g. asking for JSON alone never renders a PDF.
+    The Word document holds the First Page only.
+
+    Args:
+        sheets: List of (sheet_name, template_data) pairs from compute_bill
+        outputs: Requested artifact names (defaults to the combined PDF only)
+        env: Optional Jinja2 environment
+        name: Base file name for the artifacts
+        deterministic: Produce byte-identical PDFs for identical inputs
+        max_workers: Optional number of concurrent renderer processes
+        wkhtmltopdf_path: Optional explicit path to the PDF renderer
+        timer: Optional StageTimer recording every stage (see stage_timing)
+        timeout: Optional seconds PDF rendering may take; renderer processes
+            still running then are killed
+
+    Returns:
+        Dictionary of file name to bytes, in stage order
+    """
+    outputs = parse_outputs(outputs)
+    artifacts = {}
+    rendered = None
+
+    for step in plan_stages(outputs):
+        with stage(step, timer):
+            if step == "render_pdf":
+                rendered = render_sheet_pdfs(
+                    env or create_environment(), sheets, max_workers=max_workers, wkhtmltopdf_path=wkhtmltopdf_path,
+                    timer=timer, timeout=timeout
+                )
+            elif step == "merge_pdf":
+                artifacts[f"{name}.pdf"] = merge_pdf_bytes(
+                    (pdf_bytes for _, chunks in rendered for pdf_bytes in chunks),
+                    deterministic=deterministic
+                )
+            elif step == "sheet_pdfs":
+                for sheet_name, chunks in rendered:
+                    slug = sheet_name.lower().replace(' ', '_')
+                    artifacts[f"{name}_{slug}.pdf"] = merge_pdf_bytes(chunks, deterministic=deterministic)
+            elif step == "word":
+                buffer = io.BytesIO()
+                first_page = dict(sheets).get("First Page", {})
+                create_word_doc("first_page", first_page, buffer, header_data=first_page.get("header"))
+                artifacts[f"{name}_first_page.docx"] = buffer.getvalue()
+            elif step == "json":
+                artifacts[f"{name}.json"] = json.dumps(
+                    {sheet_name: data for sheet_name, data in sheets}, indent=2, default=str
+                ).encode("utf-8")
+
+    return artifacts
+
+def run_bill(source, form, outputs=None, name="contractor_bill", deterministic=False, max_workers=None, timer=None):
+    """
+    Read a workbook, compute the bill and produce the requested artifacts.
+
+    Args:
+        source: Path, bytes or file-like object of an .xlsx workbook
+        form: Dictionary with the bill form fields (see build_user_inputs)
+        outputs: Requested artifact names (defaults to the combined PDF only)
+        name: Base file name for the artifacts
+        deterministic: Produce byte-identical PDFs for identical inputs
+        max_workers: Optional number of concurrent renderer processes
+        timer: Optional StageTimer recording every stage
+
+    Returns:
+        Dictionary of file name to bytes
+    """
+    ws_wo, ws_bq, ws_extra = read_workbook(source, timer=timer)
+    sheets = compute_bill(ws_wo, ws_bq, ws_extra, form, timer=timer)
+    return generate_outputs(
+        sheets, outputs, name=name, deterministic=deterministic, max_workers=max_workers, timer=timer
+    )
@@ -0,0 +1,237 @@
+"""
+Full-text search over generated bills.
+
+Usage:
+    python bill_search.py QUERY [--field agreement_no|contractor|work_name|items]
+                          [--page N] [--per-page N] [--index DB]
+
+Bills are indexed in a SQLite FTS5 table as they are generated: the
+agreement number, contractor and work from the Note Sheet header, the
+First Page header text and the item descriptions with their BSR codes.
+Re-indexing a bill replaces its earlier entry, so the index stays current
+without rebuilds.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import date
+from bill_history import bill_agreement, bill_header, bill_line_items
+from state_store import DEFAULT_STATE_DIR
+
+DEFAULT_SEARCH_DB = os.environ.get("BILL_SEARCH_DB", os.path.join(DEFAULT_STATE_DIR, "bill_search.sqlite3"))
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# Searchable columns of the full-text index, in table order
+SEARCH_FIELDS = ("agreement_no", "contractor", "work_name", "header", "items")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id INTEGER PRIMARY KEY,
+    agreement_no TEXT NOT NULL,
+    bill_serial INTEGER NOT NULL,
+    contractor TEXT NOT NULL,
+    work_name TEXT NOT NULL,
+    bill_number TEXT NOT NULL,
+    bill_type TEXT NOT NULL,
+    bill_date TEXT NOT NULL,
+    payable_amount INTEGER NOT NULL,
+    indexed_at REAL NOT NULL,
+    UNIQUE (agreement_no, bill_serial)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS bill_text USING fts5 (
+    agreement_no, contractor, work_name, header, items,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Weights of SEARCH_FIELDS for bm25 ranking: identity fields outrank item text
+FIELD_WEIGHTS = (10.0, 5.0, 5.0, 1.0, 1.0)
+
+TERM_PATTERN = re.compile(r'[^\s"]+')
+
+def match_expression(query, field=None, prefix=True):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every term must match. Terms are quoted, so punctuation in agreement
+    numbers (48/2024-25) and FTS5 operators are taken literally; the last
+    term also matches as a prefix, for search-as-you-type.
+
+    Args:
+        query: Text typed by the user
+        field: Optional column from SEARCH_FIELDS to restrict the search to
+        prefix: Let the last term match as a prefix
+
+    Returns:
+        MATCH expression, or None if the query has no terms
+
+    Raises:
+        ValueError: If field is not searchable
+    """
+    if field is not None and field not in SEARCH_FIELDS:
+        raise ValueError(f"Unknown search field: {field} (expected one of {', '.join(SEARCH_FIELDS)})")
+    terms = [f'"{term}"' for term in TERM_PATTERN.findall(query)]
+    if not terms:
+        return None
+    if prefix:
+        terms[-1] += "*"
+    expression = " ".join(terms)
+    return f"{field} : ({expression})" if field else expression
+
+def header_text(sheets):
+    """
+    Non-empty cells of the First Page header rows, one row per line.
+    """
+    lines = []
+    for row in dict(sheets).get("First Page", {}).get("header", []):
+        cells = [str(cell).strip() for cell in row if str(cell).strip()]
+        if cells:
+            lines.append(" ".join(cells))
+    return "\n".join(lines)
+
+class BillSearchIndex:
+    """
+    Inverted index over generated bills, in SQLite FTS5.
+    """
+
+    def __init__(self, path=DEFAULT_SEARCH_DB, clock=time.time):
+        self.path = path
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _delete(self, conn, agreement_no, bill_serial):
+        row = conn.execute(
+            "SELECT id FROM bills WHERE agreement_no = ? AND bill_serial = ?", (agreement_no, bill_serial)
+        ).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM bill_text WHERE rowid = ?", (row["id"],))
+        conn.execute("DELETE FROM bills WHERE id = ?", (row["id"],))
+        return True
+
+    def index_bill(self, sheets, bill_date=None):
+        """
+        Add a generated bill to the index, replacing an earlier entry for the
+        same agreement and bill number.
+
+        Args:
+            sheets: List of (sheet_name, template_data) pairs from compute_bill
+            bill_date: Date of the bill (defaults to today)
+
+        Returns:
+            Document id, or None if the bill has no agreement number
+        """
+        if not bill_agreement(sheets):
+            return None
+        header = bill_header(sheets)
+        items = "\n".join(
+            f"{item['bsr']} {item['description']}".strip() for item in bill_line_items(sheets)
+        )
+        payable = int(dict(sheets).get("Last Page", {}).get("payable_amount", 0))
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._delete(conn, header["agreement_no"], header["bill_serial"])
+            cursor = conn.execute(
+                "INSERT INTO bills (agreement_no, bill_serial, contractor, work_name, bill_number, bill_type,"
+                " bill_date, payable_amount, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    header["agreement_no"], header["bill_serial"], header["contractor"], header["work_name"],
+                    header["bill_number"], header["bill_type"], str(bill_date or date.today()), payable, self.clock()
+                )
+            )
+            document_id = cursor.lastrowid
+            conn.execute(
+                "INSERT INTO bill_text (rowid, agreement_no, contractor, work_name, header, items)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (document_id, header["agreement_no"], header["contractor"], header["work_name"],
+                 header_text(sheets), items)
+            )
+            conn.execute("COMMIT")
+        return document_id
+
+    def remove(self, agreement_no, bill_serial):
+        """
+        Drop a bill from the index.
+
+        Returns:
+            True if the bill was indexed
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = self._delete(conn, agreement_no, bill_serial)
+            conn.execute("COMMIT")
+        return removed
+
+    def search(self, query, field=None, page=1, per_page=DEFAULT_PER_PAGE):
+        """
+        Find bills matching every term of the query, best matches first.
+
+        Args:
+            query: Free text, e.g. an agreement number, contractor or item
+            field: Optional column from SEARCH_FIELDS to search in
+            page: 1-based page number
+            per_page: Results per page (at most MAX_PER_PAGE)
+
+        Returns:
+            Dictionary with total, page, per_page, pages and results; each
+            result has the bill's identity, bill_date, payable_amount and a
+            snippet of the matching text with matches in [brackets]
+
+        Raises:
+            ValueError: If field is not searchable
+        """
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        page = max(1, int(page))
+        expression = match_expression(query, field)
+        response = {"total": 0, "page": page, "per_page": per_page, "pages": 0, "results": []}
+        if expression is None:
+            return response
+
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+        with closing(self._connect()) as conn:
+            response["total"] = conn.execute(
+                "SELECT count(*) FROM bill_text WHERE bill_text MATCH ?", (expression,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                "SELECT bills.agreement_no, bills.bill_serial, bills.contractor, bills.work_name, bills.bill_number,"
+                " bills.bill_type, bills.bill_date, bills.payable_amount,"
+                " snippet(bill_text, -1, '[', ']', '...', 12) AS snippet"
+                " FROM bill_text JOIN bills ON bills.id = bill_text.rowid"
+                f" WHERE bill_text MATCH ? ORDER BY bm25(bill_text, {weights}), bills.id DESC"
+                " LIMIT ? OFFSET ?",
+                (expression, per_page, (page - 1) * per_page)
+            ).fetchall()
+        response["pages"] = -(-response["total"] // per_page)
+        response["results"] = [dict(row) for row in rows]
+        return response
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("query", help="Search terms")
+    parser.add_argument("--field", choices=SEARCH_FIELDS, help="Only search this field")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--per-page", type=int, default=DEFAULT_PER_PAGE)
+    parser.add_argument("--index", default=DEFAULT_SEARCH_DB, help="Search index database")
+    args = parser.parse_args(argv)
+
+    response = BillSearchIndex(args.index).search(args.query, args.field, args.page, args.per_page)
+    print(json.dumps(response, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+HTTP service for generating bills programmatically.
+
+Usage:
+    python bill_service.py [--host 127.0.0.1] [--port 8502] [--compute-workers N]
+                           [--render-workers N] [--timeout SECONDS]
+
+Endpoints (multipart requests carry the workbook in a "workbook" file field
+and the bill inputs as a JSON object in an "inputs" field, using the same
+names as a batch_cli manifest entry):
+
+    POST /process   Run process_bill; responds with the sheet data as JSON
+    POST /bill      Generate the bill; "outputs" (inputs field or query) picks
+                    the artifacts. One artifact is returned as is, several
+                    (or ?format=zip) as a zip streamed while it is built
+    POST /render    JSON body {"sheet": "First Page", "data": {...},
+                    "format": "html" | "pdf"}; renders one sheet template
+    GET  /metrics   Prometheus metrics of the service (see metrics)
+    GET  /healthz   Liveness
+    GET  /readyz    Readiness: 503 unless the PDF renderer and templates are usable
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import uvicorn
+from jinja2 import TemplateError, TemplateNotFound
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from bill_pipeline import create_environment, read_workbook, compute_bill, generate_outputs
+from batch_cli import coerce_inputs
+from output_plan import parse_outputs
+from pdf_pipeline import find_wkhtmltopdf, render_sheet_html, render_bill_pdf
+from zip_packager import iter_zip_chunks, DEFAULT_CHUNK_SIZE
+from bsr_schedule import default_schedule
+from stage_timing import StageTimer
+from metrics import COUNTERS, BILLS_GENERATED, PROMETHEUS_CONTENT_TYPE, readiness, render_metrics
+from diagnostics import configure_logging
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+DEFAULT_TIMEOUT = 120
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".json": "application/json",
+    ".zip": "application/zip"
+}
+
+def compute_sheets(data, form):
+    """
+    Parse a workbook and compute the bill; runs in the compute worker pool.
+
+    Bills are validated against the BSR schedule when BILL_BSR_SCHEDULE is set.
+    The stages are timed here but counted by the calling process, whose
+    metrics the service reports.
+
+    Returns:
+        Tuple of (list of (sheet_name, template_data) pairs, stage timings
+        as in StageTimer.record)
+    """
+    timer = StageTimer(metrics=None)
+    sheets = compute_bill(*read_workbook(data, timer=timer), form, schedule=default_schedule(), timer=timer)
+    return sheets, timer.record()["stages"]
+
+def add_stages(timer, stages):
+    """
+    Add stage timings measured in a worker process to timer.
+    """
+    for entry in stages:
+        timer.add(entry["stage"], entry["seconds"], error=entry["errors"] > 0)
+
+def iter_bytes(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+class RequestError(Exception):
+    """
+    Invalid request; reported to the client with the given HTTP status.
+    """
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class BillService:
+    """
+    Worker pools and handlers behind the HTTP endpoints.
+
+    Workbook parsing and bill computation are CPU-bound pandas code, so they
+    run in a process pool; rendering mostly waits on wkhtmltopdf subprocesses,
+    so it runs in a thread pool. Every offloaded call is bounded by timeout,
+    and renders are given the same timeout so their wkhtmltopdf processes
+    are killed rather than left running after the request gave up.
+    """
+
+    def __init__(self, compute_workers=None, render_workers=None, timeout=DEFAULT_TIMEOUT, compute_executor=None):
+        """
+        Args:
+            compute_workers: Processes for parsing and computing bills
+            render_workers: Threads for rendering and packaging outputs
+            timeout: Seconds a request may spend waiting on a worker pool
+            compute_executor: Optional executor to use instead of the process
+                pool (e.g. a thread pool in tests)
+        """
+        self.timeout = timeout
+        self.compute_executor = compute_executor or ProcessPoolExecutor(
+            max_workers=compute_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.render_executor = ThreadPoolExecutor(max_workers=render_workers, thread_name_prefix="bill-render")
+        self.env = create_environment()
+        self.wkhtmltopdf_path = find_wkhtmltopdf()
+
+    async def offload(self, executor, func, *args):
+        """
+        Run func in a worker pool without blocking the event loop.
+
+        Raises:
+            RequestError: 504 if the call does not finish within the timeout
+        """
+        future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise RequestError(f"Request timed out after {self.timeout} seconds", 504)
+
+    async def read_bill_request(self, request):
+        """
+        Extract the workbook bytes, bill inputs and requested outputs.
+        """
+        async with request.form(max_files=1, max_part_size=MAX_UPLOAD_BYTES) as form:
+            upload = form.get("workbook")
+            if upload is None or isinstance(upload, str):
+                raise RequestError("Missing 'workbook' file field")
+            data = await upload.read()
+            try:
+                inputs = json.loads(form.get("inputs") or "{}")
+            except ValueError as e:
+                raise RequestError(f"Invalid 'inputs' JSON: {e}")
+        if not isinstance(inputs, dict):
+            raise RequestError("'inputs' must be a JSON object")
+        try:
+            outputs = parse_outputs(request.query_params.get("outputs") or inputs.get("outputs"))
+            return data, coerce_inputs(inputs), outputs
+        except ValueError as e:
+            raise RequestError(str(e))
+
+    async def process(self, request):
+        data, form, _ = await self.read_bill_request(request)
+        timer = StageTimer()
+        sheets, stages = await self.offload(self.compute_executor, compute_sheets, data, form)
+        add_stages(timer, stages)
+        timer.finish(endpoint="process")
+        return Response(
+            json.dumps({sheet_name: sheet for sheet_name, sheet in sheets}, default=str),
+            media_type="application/json"
+        )
+
+    async def bill(self, request):
+        data, form, outputs = await self.read_bill_request(request)
+        name = request.query_params.get("name", "contractor_bill")
+        timer = StageTimer()
+        sheets, stages = await self.offload(self.compute_executor, compute_sheets, data, form)
+        add_stages(timer, stages)
+        try:
+            artifacts = await self.offload(
+                self.render_executor, lambda: generate_outputs(
+                    sheets, outputs, env=self.env, name=name, wkhtmltopdf_path=self.wkhtmltopdf_path, timer=timer,
+                    timeout=self.timeout
+                )
+            )
+        except Exception:
+            COUNTERS.inc(BILLS_GENERATED, status="failed")
+            raise
+        COUNTERS.inc(BILLS_GENERATED, status="done")
+        timer.finish(endpoint="bill", name=name)
+
+        if len(artifacts) == 1 and request.query_params.get("format") != "zip":
+            file_name, content = next(iter(artifacts.items()))
+            return StreamingResponse(
+                iter_bytes(content),
+                media_type=MEDIA_TYPES[os.path.splitext(file_name)[1]],
+                headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+            )
+        return StreamingResponse(
+            iter_zip_chunks(artifacts.items()),
+            media_type=MEDIA_TYPES[".zip"],
+            headers={"Content-Disposition": f'attachment; filename="{name}.zip"'}
+        )
+
+    async def render(self, request):
+        try:
+            body = await request.json()
+            sheet_name, data = body["sheet"], body["data"]
+        except (ValueError, KeyError, TypeError):
+            raise RequestError("Body must be a JSON object with 'sheet' and 'data'")
+        output_format = body.get("format", "pdf")
+        if output_format not in ("html", "pdf"):
+            raise RequestError("'format' must be 'html' or 'pdf'")
+
+        try:
+            if output_format == "html":
+                html = await self.offload(self.render_executor, render_sheet_html, self.env, sheet_name, data)
+                return Response(html, media_type="text/html")
+            pdf = await self.offload(
+                self.render_executor, lambda: render_bill_pdf(self.env, [(sheet_name, data)], max_workers=1, timeout=self.timeout)
+            )
+        except TemplateNotFound:
+            raise RequestError(f"Unknown sheet: {sheet_name}", 404)
+        except TemplateError as e:
+            raise RequestError(f"Could not render {sheet_name}: {e}")
+        return StreamingResponse(iter_bytes(pdf), media_type=MEDIA_TYPES[".pdf"])
+
+    async def metrics(self, request):
+        return Response(render_metrics(wkhtmltopdf_path=self.wkhtmltopdf_path), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    async def health(self, request):
+        ready, checks = readiness(wkhtmltopdf_path=self.wkhtmltopdf_path)
+        if request.url.path == "/readyz" and not ready:
+            return JSONResponse({"status": "unavailable", "ready": False, "checks": checks}, status_code=503)
+        return JSONResponse({"status": "ok", "ready": ready, "checks": checks})
+
+    def shutdown(self):
+        self.compute_executor.shutdown(wait=False, cancel_futures=True)
+        self.render_executor.shutdown(wait=False, cancel_futures=True)
+
+def _endpoint(handler):
+    async def endpoint(request):
+        try:
+            return await handler(request)
+        except RequestError as e:
+            return JSONResponse({"error": str(e)}, status_code=e.status_code)
+        except FileNotFoundError as e:
+            # wkhtmltopdf is not installed, or a template is missing
+            return JSONResponse({"error": str(e)}, status_code=503)
+        except Exception as e:
+            return JSONResponse({"error": f"{type(e).__name__}: {e}"}, status_code=500)
+    return endpoint
+
+def create_app(service=None):
+    """
+    Build the ASGI application.
+
+    Args:
+        service: Optional BillService (a default one is created otherwise)
+
+    Returns:
+        Starlette application
+    """
+    service = service or BillService()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        service.shutdown()
+
+    return Starlette(
+        routes=[
+            Route("/process", _endpoint(service.process), methods=["POST"]),
+            Route("/bill", _endpoint(service.bill), methods=["POST"]),
+            Route("/render", _endpoint(service.render), methods=["POST"]),
+            Route("/metrics", _endpoint(service.metrics), methods=["GET"]),
+            Route("/healthz", _endpoint(service.health), methods=["GET"]),
+            Route("/readyz", _endpoint(service.health), methods=["GET"])
+        ],
+        lifespan=lifespan
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--compute-workers", type=int, help="Processes for parsing and computing bills")
+    parser.add_argument("--render-workers", type=int, help="Threads for rendering outputs")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    service = BillService(args.compute_workers, args.render_workers, args.timeout)
+    uvicorn.run(create_app(service), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import re
+from functools import lru_cache
+import pandas as pd
+
+# Path of the BSR rate schedule; unset means bills are not validated
+DEFAULT_BSR_SCHEDULE = os.environ.get("BILL_BSR_SCHEDULE", "")
+
+# Schedule file columns: code, description, unit, rate. Header names are
+# matched case-insensitively against these alternatives
+SCHEDULE_COLUMNS = {
+    "code": ("code", "bsr", "bsr no", "bsr no.", "item code"),
+    "description": ("description", "particulars", "item"),
+    "unit": ("unit",),
+    "rate": ("rate",)
+}
+
+# Relative difference between quoted and schedule rates that is tolerated
+DEFAULT_RATE_TOLERANCE = 0.0
+
+# Deviation kinds reported by validate_items
+UNKNOWN_CODE = "unknown_code"
+RATE_MISMATCH = "rate"
+UNIT_MISMATCH = "unit"
+
+UNIT_NOISE = re.compile(r"[\s.]+")
+
+def normalize_code(code):
+    """
+    Key of a BSR code in the schedule index: "1.5.1 " and "1.5.1" match.
+    """
+    if code is None or (isinstance(code, float) and pd.isna(code)):
+        return ""
+    return " ".join(str(code).split()).upper()
+
+def normalize_unit(unit):
+    """
+    Comparable unit text: "P. point", "p point" and "P.Point" match.
+    """
+    return UNIT_NOISE.sub("", str(unit or "")).lower()
+
+class BsrSchedule:
+    """
+    BSR rate schedule held in memory, indexed by code.
+
+    Single lookups go through a dictionary; whole bills are validated with
+    one hash join against the schedule DataFrame, so the cost grows linearly
+    with the number of items.
+    """
+
+    def __init__(self, frame):
+        """
+        Args:
+            frame: DataFrame with code, description, unit and rate columns
+
+        Raises:
+            ValueError: If a code appears twice
+        """
+        frame = frame.assign(code=frame["code"].map(normalize_code))
+        frame = frame[frame["code"] != ""]
+        duplicates = frame["code"][frame["code"].duplicated()].unique().tolist()
+        if duplicates:
+            raise ValueError(f"Duplicate BSR codes in schedule: {duplicates[:10]}")
+        self.frame = pd.DataFrame({
+            "code": frame["code"],
+            "schedule_description": frame["description"].fillna("").astype(str).str.strip(),
+            "schedule_unit": frame["unit"].fillna("").astype(str).str.strip(),
+            "schedule_rate": pd.to_numeric(frame["rate"], errors="coerce")
+        }).reset_index(drop=True)
+        self.index = {record["code"]: record for record in self.frame.to_dict("records")}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, code):
+        return normalize_code(code) in self.index
+
+    def get(self, code):
+        """
+        Schedule entry of a code.
+
+        Returns:
+            Dictionary with code, schedule_description, schedule_unit and
+            schedule_rate, or None if the code is not in the schedule
+        """
+        return self.index.get(normalize_code(code))
+
+    def validate_items(self, items, tolerance=DEFAULT_RATE_TOLERANCE):
+        """
+        Check the rate and unit of bill items against the schedule.
+
+        Items without a BSR code are skipped; items without a rate or unit
+        (such as group headings) are not checked for the missing value.
+
+        Args:
+            items: Item dictionaries from process_bill (BSR code in "remark")
+            tolerance: Relative rate difference that is not reported
+
+        Returns:
+            List of deviation dictionaries with position (index in items),
+            serial_no, bsr, kind (UNKNOWN_CODE, RATE_MISMATCH or
+            UNIT_MISMATCH), the quoted and schedule values and, for rates,
+            difference and difference_percent
+        """
+        rows = [
+            (position, item.get("serial_no", ""), normalize_code(item.get("remark")), item.get("unit", ""),
+             item.get("rate", 0))
+            for position, item in enumerate(items)
+            if not item.get("is_divider") and "quantity" in item
+        ]
+        if not rows:
+            return []
+        bill = pd.DataFrame(rows, columns=["position", "serial_no", "code", "unit", "rate"])
+        bill = bill[bill["code"] != ""]
+        joined = bill.merge(self.frame, on="code", how="left", indicator=True)
+
+        unknown = joined["_merge"] == "left_only"
+        rate = pd.to_numeric(joined["rate"], errors="coerce").fillna(0)
+        schedule_rate = joined["schedule_rate"]
+        difference = rate - schedule_rate
+        rate_mismatch = (
+            ~unknown & (rate > 0) & schedule_rate.notna()
+            & (difference.abs() > tolerance * schedule_rate.abs() + 1e-9)
+        )
+        unit_mismatch = (
+            ~unknown & (joined["unit"].map(normalize_unit) != "")
+            & (joined["unit"].map(normalize_unit) != joined["schedule_unit"].map(normalize_unit))
+        )
+
+        deviations = []
+        for kind, mask in ((UNKNOWN_CODE, unknown), (RATE_MISMATCH, rate_mismatch), (UNIT_MISMATCH, unit_mismatch)):
+            for row in joined[mask].itertuples(index=False):
+                deviation = {"position": int(row.position), "serial_no": row.serial_no, "bsr": row.code, "kind": kind}
+                if kind == RATE_MISMATCH:
+                    deviation.update({
+                        "rate": float(row.rate), "schedule_rate": float(row.schedule_rate),
+                        "difference": float(row.rate) - float(row.schedule_rate),
+                        "difference_percent": round(
+                            (float(row.rate) - float(row.schedule_rate)) / float(row.schedule_rate) * 100, 2
+                        ) if row.schedule_rate else None
+                    })
+                elif kind == UNIT_MISMATCH:
+                    deviation.update({"unit": row.unit, "schedule_unit": row.schedule_unit})
+                deviations.append(deviation)
+        return sorted(deviations, key=lambda deviation: deviation["position"])
+
+    def fill_descriptions(self, items):
+        """
+        Give items with a known BSR code and no description the schedule's
+        description. Items are updated in place.
+
+        Returns:
+            Number of items filled
+        """
+        filled = 0
+        for item in items:
+            if item.get("is_divider") or str(item.get("description", "")).strip():
+                continue
+            entry = self.get(item.get("remark"))
+            if entry is not None and entry["schedule_description"]:
+                item["description"] = entry["schedule_description"]
+                filled += 1
+        return filled
+
+def _match_columns(frame):
+    headers = {str(column).strip().lower(): column for column in frame.columns}
+    columns = {}
+    for name, alternatives in SCHEDULE_COLUMNS.items():
+        column = next((headers[alternative] for alternative in alternatives if alternative in headers), None)
+        if column is None:
+            raise ValueError(f"BSR schedule has no {name} column (expected one of: {', '.join(alternatives)})")
+        columns[column] = name
+    return frame[list(columns)].rename(columns=columns)
+
+def load_schedule(path):
+    """
+    Read a BSR schedule from a CSV or Excel file with code, description,
+    unit and rate columns.
+
+    Returns:
+        BsrSchedule
+
+    Raises:
+        ValueError: If a column is missing or a code appears twice
+    """
+    if path.lower().endswith(".csv"):
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    else:
+        frame = pd.read_excel(path, dtype=str)
+    return BsrSchedule(_match_columns(frame))
+
+@lru_cache(maxsize=1)
+def default_schedule():
+    """
+    Schedule named by BILL_BSR_SCHEDULE, loaded once per process; None when unset.
+    """
+    return load_schedule(DEFAULT_BSR_SCHEDULE) if DEFAULT_BSR_SCHEDULE else None
+
+def apply_schedule(first_page_data, schedule, fill_descriptions=False, tolerance=DEFAULT_RATE_TOLERANCE):
+    """
+    Validate a computed bill against the schedule.
+
+    Adds "bsr_validation" to the First Page data: the number of items
+    checked, the deviations (see BsrSchedule.validate_items) and the number
+    of descriptions filled from the schedule.
+
+    Args:
+        first_page_data: First Page data from process_bill
+        schedule: BsrSchedule
+        fill_descriptions: Fill empty item descriptions from the schedule
+        tolerance: Relative rate difference that is not reported
+
+    Returns:
+        The bsr_validation dictionary
+    """
+    items = first_page_data.get("items", [])
+    filled = schedule.fill_descriptions(items) if fill_descriptions else 0
+    validation = {
+        "checked": sum(1 for item in items if normalize_code(item.get("remark")) and "quantity" in item),
+        "deviations": schedule.validate_items(items, tolerance),
+        "filled_descriptions": filled
+    }
+    first_page_data["bsr_validation"] = validation
+    return validation
@@ -6,6 +6,7 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 import traceback
 import os
+from reproducible import now, fixed_clock
 
 def read_excel_file(xls: pd.ExcelFile, sheet_name: str) -> pd.DataFrame:
     """
@@ -236,7 +237,7 @@ def generate_bill_notes(bill_data):
     except Exception as e:
         return f"Error generating notes: {str(e)}"
 
-def generate_pdf(output_path, bill_data, bill_result):
+def generate_pdf(output_path, bill_data, bill_result, clock=None, deterministic=False):
     """
     Generate a PDF bill using ReportLab.
     
@@ -244,9 +245,13 @@ def generate_pdf(output_path, bill_data, bill_result):
         output_path: Path where PDF should be saved
         bill_data: Dictionary containing bill metadata
         bill_result: Processed bill result tuple
+        clock: Optional callable returning the datetime used for the Bill Date
+        deterministic: Produce byte-identical output for identical inputs
     """
     try:
-        doc = SimpleDocTemplate(output_path, pagesize=letter)
+        if deterministic and clock is None:
+            clock = fixed_clock()
+        doc = SimpleDocTemplate(output_path, pagesize=letter, invariant=1 if deterministic else 0)
         elements = []
         styles = getSampleStyleSheet()
         
@@ -261,7 +266,7 @@ def generate_pdf(output_path, bill_data, bill_result):
             ["Agreement No:", bill_data['agreement_no']],
             ["Work Order Ref:", bill_data['work_order_ref']],
             ["Bill Number:", bill_data['bill_number']],
-            ["Bill Date:", datetime.now().strftime("%d-%m-%Y")]
+            ["Bill Date:", now(clock).strftime("%d-%m-%Y")]
         ]
         
         info_table = Table(info, colWidths=[150, 350])
@@ -0,0 +1,112 @@
+"""
+Structured, level-gated diagnostics.
+
+Every diagnostic goes through a StructuredLogger: an event name plus fields,
+written as one JSON line to stderr by the handler configure_logging installs
+on the "bill" logger. BILL_LOG_LEVEL (DEBUG, INFO, WARNING, ERROR) sets the
+level. Field values that are callables are only called when the level is
+enabled, so expensive debug payloads such as sheet dumps cost nothing
+otherwise:
+
+    log = get_logger("bill.compute")
+    log.debug("work_order_sample", rows=lambda: ws_wo.iloc[20:23].to_string())
+"""
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+ROOT_LOGGER = "bill"
+
+# Level used when BILL_LOG_LEVEL is unset
+DEFAULT_LOG_LEVEL = "INFO"
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, event, the record's
+    fields and, for exceptions, the formatted traceback.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class StructuredLogger:
+    """
+    Logger taking an event name and keyword fields.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def is_enabled(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, event, exc_info=False, **fields):
+        """
+        Log event at level. Callable field values are evaluated here, and
+        only if the level is enabled.
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        fields = {key: value() if callable(value) else value for key, value in fields.items()}
+        self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        """
+        Log event at ERROR with the traceback of the exception being handled.
+        """
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+def get_logger(name):
+    """
+    StructuredLogger for name, which should sit under ROOT_LOGGER
+    ("bill.compute") so configure_logging applies to it.
+    """
+    return StructuredLogger(logging.getLogger(name))
+
+def configure_logging(level=None, stream=None):
+    """
+    Write ROOT_LOGGER records as JSON lines. Safe to call more than once;
+    later calls only change the level.
+
+    Args:
+        level: Level name or number (defaults to BILL_LOG_LEVEL, then
+            DEFAULT_LOG_LEVEL)
+        stream: Stream for the handler (defaults to stderr)
+
+    Returns:
+        The configured logging.Logger
+    """
+    logger = logging.getLogger(ROOT_LOGGER)
+    level = level or os.environ.get("BILL_LOG_LEVEL") or DEFAULT_LOG_LEVEL
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not any(getattr(handler, "_bill_diagnostics", False) for handler in logger.handlers):
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        handler._bill_diagnostics = True
+        logger.addHandler(handler)
+        # Streamlit and uvicorn configure the root logger their own way
+        logger.propagate = False
+    return logger
@@ -1,26 +1,37 @@
 import streamlit as st
 import pandas as pd
-import pdfkit
 from docx import Document
 import os
-import zipfile
-import tempfile
+import io
+import json
 from jinja2 import Environment, FileSystemLoader, TemplateNotFound
-from pypdf import PdfReader, PdfWriter
 import numpy as np
 from datetime import datetime
-import traceback
-import shutil
+import sys
 from num2words import num2words
 
+# Shared pipeline modules live in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_merger import StreamingPdfMerger
+from word_export import add_bulk_table
+from output_plan import ARTIFACTS, plan_stages
+from pdf_pipeline import find_wkhtmltopdf, render_pdf_bytes
+from zip_packager import StreamingZipPackager
+from sheet_alignment import align_sheets, DEFAULT_ALIGN_KEY
+from diagnostics import get_logger, configure_logging
+
+configure_logging()
+log = get_logger("bill.extracted")
+
+# This app's Work Order and Bill Quantity column layout (no serial column)
+SHEET_LAYOUT = {"serial": None, "description": 0, "unit": 1, "quantity": 2, "rate": 3, "bsr": 5}
+
 # Initialize Jinja2 environment
 env = Environment(loader=FileSystemLoader("templates"), cache_size=0)
 env.filters['strptime'] = lambda s, fmt: datetime.strptime(s, fmt) if s else None
-TEMP_DIR = tempfile.mkdtemp()
 
 # Configure wkhtmltopdf
-wkhtmltopdf_path = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path)
+wkhtmltopdf_path = find_wkhtmltopdf()
 
 def number_to_words(number):
     try:
@@ -29,7 +40,7 @@ def number_to_words(number):
         return str(number)
 
 def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_paid_last_bill, is_first_bill, is_final_bill, user_inputs):
-    st.write("Starting process_bill")
+    log.debug("process_bill_started")
     first_page_data = {"header": {}, "items": [], "totals": {}}
     certificate_ii_data = {"payable_amount": 0, "amount_words": "", "summary": {}}
     certificate_iii_data = {"payable_amount": 0, "amount_words": "", "summary": {}, "certification": "Certified that the work has been completed as per specifications."}
@@ -57,13 +68,13 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
     }
     note_sheet_data["header"] = first_page_data["header"].copy()
 
-    # Log sheet shapes and sample data
-    print(f"Work Order shape: {ws_wo.shape}")
-    print(f"Work Order sample (rows 21-23):\n{ws_wo.iloc[20:23].to_string()}")
-    print(f"Bill Quantity shape: {ws_bq.shape}")
-    print(f"Bill Quantity sample (rows 21-23):\n{ws_bq.iloc[20:23].to_string()}")
-    print(f"Extra Items shape: {ws_extra.shape}")
-    print(f"Extra Items sample (rows 6-8):\n{ws_extra.iloc[5:8].to_string() if ws_extra.shape[0] >= 8 else 'Not enough rows or empty'}")
+    # Log sheet shapes and sample data (the samples are only rendered at DEBUG)
+    log.debug("sheet_sample", sheet="Work Order", shape=ws_wo.shape, rows=lambda: ws_wo.iloc[20:23].to_string())
+    log.debug("sheet_sample", sheet="Bill Quantity", shape=ws_bq.shape, rows=lambda: ws_bq.iloc[20:23].to_string())
+    log.debug(
+        "sheet_sample", sheet="Extra Items", shape=ws_extra.shape,
+        rows=lambda: ws_extra.iloc[5:8].to_string() if ws_extra.shape[0] >= 8 else "Not enough rows or empty"
+    )
 
     # Validate sheets
     if ws_wo.empty or ws_bq.empty:
@@ -71,43 +82,25 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
     if ws_wo.shape[0] < 22 or ws_bq.shape[0] < 22:
         raise ValueError("Work Order or Bill Quantity sheet has insufficient rows (need at least 22)")
 
-    # Work Order items (start from row 22, 0-based index 21)
-    last_row_wo = ws_wo.shape[0]
-    for i in range(21, last_row_wo):
-        qty_raw = ws_bq.iloc[i, 2] if i < ws_bq.shape[0] and pd.notnull(ws_bq.iloc[i, 2]) else None
-        rate_raw = ws_wo.iloc[i, 3] if pd.notnull(ws_wo.iloc[i, 3]) else None
-
-        qty = 0
-        if isinstance(qty_raw, (int, float)):
-            qty = float(qty_raw)
-        elif isinstance(qty_raw, str):
-            cleaned_qty = qty_raw.strip().replace(',', '').replace(' ', '')
-            try:
-                qty = float(cleaned_qty)
-            except ValueError:
-                print(f"Skipping invalid quantity at Bill Quantity row {i+1}: '{qty_raw}'")
-                continue
-
-        rate = 0
-        if isinstance(rate_raw, (int, float)):
-            rate = float(rate_raw)
-        elif isinstance(rate_raw, str):
-            cleaned_rate = rate_raw.strip().replace(',', '').replace(' ', '')
-            try:
-                rate = float(cleaned_rate)
-            except ValueError:
-                print(f"Skipping invalid rate at Work Order row {i+1}: '{rate_raw}'")
-                continue
-
+    # Work Order items (start from row 22, 0-based index 21); Bill Quantity
+    # rows are matched to Work Order rows by BSR code
+    alignment = align_sheets(ws_wo, ws_bq, key=user_inputs.get("align_key", DEFAULT_ALIGN_KEY), layout=SHEET_LAYOUT)
+    for cell in alignment.invalid:
+        log.warning("invalid_cell_skipped", **cell)
+    for row in alignment.unmatched_bill_quantity:
+        log.warning("bill_quantity_row_unmatched", row=row["row"], description=row["description"])
+    aligned = alignment.items[alignment.items["valid"]]
+    for row in aligned.itertuples(index=False):
+        qty, rate = row.quantity, row.rate
         item = {
-            "serial_no": str(i - 20),
-            "description": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
-            "unit": str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else "",
+            "serial_no": str(row.row - 20),
+            "description": row.description,
+            "unit": row.unit,
             "quantity": qty,
             "rate": rate,
             "amount": round(qty * rate) if qty and rate else 0,
-            "bsr": str(ws_wo.iloc[i, 5]) if pd.notnull(ws_wo.iloc[i, 5]) else "",
-            "remark": str(ws_wo.iloc[i, 6]) if pd.notnull(ws_wo.iloc[i, 6]) else "",
+            "bsr": row.bsr,
+            "remark": str(ws_wo.iloc[row.row, 6]) if pd.notnull(ws_wo.iloc[row.row, 6]) else "",
             "is_divider": False
         }
         first_page_data["items"].append(item)
@@ -142,7 +135,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                 try:
                     qty = float(cleaned_qty)
                 except ValueError:
-                    print(f"Skipping invalid quantity at Extra Items row {j+1}: '{qty_raw}'")
+                    log.warning("invalid_cell_skipped", sheet="Extra Items", row=j + 1, field="quantity", value=qty_raw)
                     continue
 
             rate = 0
@@ -153,7 +146,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                 try:
                     rate = float(cleaned_rate)
                 except ValueError:
-                    print(f"Skipping invalid rate at Extra Items row {j+1}: '{rate_raw}'")
+                    log.warning("invalid_cell_skipped", sheet="Extra Items", row=j + 1, field="rate", value=rate_raw)
                     continue
 
             amount = 0
@@ -164,7 +157,9 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                 try:
                     amount = float(cleaned_amount)
                 except ValueError:
-                    print(f"Skipping invalid amount at Extra Items row {j+1}: '{amount_raw}'")
+                    log.warning(
+                        "invalid_cell_skipped", sheet="Extra Items", row=j + 1, field="amount", value=amount_raw
+                    )
                     continue
 
             item = {
@@ -215,48 +210,12 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
 
     # Deviation Statement (only for final bill)
     if is_final_bill:
-        last_row_wo = ws_wo.shape[0]
         work_order_total = 0
         executed_total = 0
         overall_excess = 0
         overall_saving = 0
-        for i in range(21, last_row_wo):
-            qty_wo_raw = ws_wo.iloc[i, 2] if pd.notnull(ws_wo.iloc[i, 2]) else None
-            rate_raw = ws_wo.iloc[i, 3] if pd.notnull(ws_wo.iloc[i, 3]) else None
-            qty_bill_raw = ws_bq.iloc[i, 2] if i < ws_bq.shape[0] and pd.notnull(ws_bq.iloc[i, 2]) else None
-
-            qty_wo = 0
-            if isinstance(qty_wo_raw, (int, float)):
-                qty_wo = float(qty_wo_raw)
-            elif isinstance(qty_wo_raw, str):
-                cleaned_qty_wo = qty_wo_raw.strip().replace(',', '').replace(' ', '')
-                try:
-                    qty_wo = float(cleaned_qty_wo)
-                except ValueError:
-                    print(f"Skipping invalid qty_wo at row {i+1}: '{qty_wo_raw}'")
-                    continue
-
-            rate = 0
-            if isinstance(rate_raw, (int, float)):
-                rate = float(rate_raw)
-            elif isinstance(rate_raw, str):
-                cleaned_rate = rate_raw.strip().replace(',', '').replace(' ', '')
-                try:
-                    rate = float(cleaned_rate)
-                except ValueError:
-                    print(f"Skipping invalid rate at row {i+1}: '{rate_raw}'")
-                    continue
-
-            qty_bill = 0
-            if isinstance(qty_bill_raw, (int, float)):
-                qty_bill = float(qty_bill_raw)
-            elif isinstance(qty_bill_raw, str):
-                cleaned_qty_bill = qty_bill_raw.strip().replace(',', '').replace(' ', '')
-                try:
-                    qty_bill = float(cleaned_qty_bill)
-                except ValueError:
-                    print(f"Skipping invalid qty_bill at row {i+1}: '{qty_bill_raw}'")
-                    continue
+        for row in aligned.itertuples(index=False):
+            qty_wo, rate, qty_bill = row.work_order_quantity, row.rate, row.quantity
 
             amt_wo = round(qty_wo * rate)
             amt_bill = round(qty_bill * rate)
@@ -266,9 +225,9 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
             saving_amt = round(saving_qty * rate) if saving_qty > 0 else 0
 
             item = {
-                "serial_no": str(i - 20),
-                "description": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
-                "unit": str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else "",
+                "serial_no": str(row.row - 20),
+                "description": row.description,
+                "unit": row.unit,
                 "qty_wo": qty_wo,
                 "rate": rate,
                 "amt_wo": amt_wo,
@@ -278,7 +237,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                 "excess_amt": excess_amt,
                 "saving_qty": saving_qty,
                 "saving_amt": saving_amt,
-                "bsr": str(ws_wo.iloc[i, 5]) if pd.notnull(ws_wo.iloc[i, 5]) else ""
+                "bsr": row.bsr
             }
             deviation_data["items"].append(item)
             work_order_total += amt_wo
@@ -314,10 +273,12 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
             "net_difference": round(net_difference)
         }
 
-    print(f"first_page_data['items'] type: {type(first_page_data['items'])}, length: {len(first_page_data['items'])}")
-    print(f"extra_items_data['items'] type: {type(extra_items_data['items'])}, length: {len(extra_items_data['items'])}")
-    if deviation_data:
-        print(f"deviation_data['items'] type: {type(deviation_data['items'])}, length: {len(deviation_data['items'])}")
+    log.debug(
+        "process_bill_finished",
+        first_page_items=len(first_page_data["items"]),
+        extra_items=len(extra_items_data["items"]),
+        deviation_items=len(deviation_data["items"]) if deviation_data else None
+    )
     
     return first_page_data, certificate_ii_data, certificate_iii_data, deviation_data, extra_items_data, note_sheet_data
 
@@ -371,7 +332,7 @@ def generate_bill_notes(payable_amount, work_order_amount, extra_item_amount, no
     return notes
 
 def generate_pdf(sheet_name, data, orientation, output_path, note_sheet_data=None):
-    st.write(f"Generating PDF for {sheet_name}, data type: {type(data)}")
+    log.debug("pdf_started", sheet=sheet_name, data_type=lambda: type(data).__name__)
     try:
         template_name = f"{sheet_name.lower().replace(' ', '_')}.html"
         template = env.get_template(template_name)
@@ -382,9 +343,12 @@ def generate_pdf(sheet_name, data, orientation, output_path, note_sheet_data=Non
         }
         # Log the note_sheet_data structure before rendering
         if sheet_name == "Note Sheet":
-            print("note_sheet_data structure:", note_sheet_data)
-            print("note_sheet_data keys:", list(note_sheet_data.keys()))
-            print("work_order_amount in note_sheet_data:", note_sheet_data.get("work_order_amount", "Not found"))
+            log.debug(
+                "note_sheet_data",
+                keys=lambda: list(note_sheet_data.keys()),
+                work_order_amount=lambda: note_sheet_data.get("work_order_amount", "Not found"),
+                data=lambda: repr(note_sheet_data)
+            )
         html_content = template.render(**context)
         options = {
             "page-size": "A4",
@@ -395,112 +359,69 @@ def generate_pdf(sheet_name, data, orientation, output_path, note_sheet_data=Non
             "margin-right": "0.25in" if sheet_name == "Note Sheet" else "0in",
             "encoding": "UTF-8"
         }
-        pdfkit.from_string(html_content, output_path, configuration=config, options=options)
-        st.write(f"Finished PDF for {sheet_name}")
+        pdf_bytes = render_pdf_bytes(html_content, options=options, wkhtmltopdf_path=wkhtmltopdf_path)
+        if output_path:
+            with open(output_path, "wb") as f:
+                f.write(pdf_bytes)
+        log.debug("pdf_finished", sheet=sheet_name, bytes=len(pdf_bytes))
+        return pdf_bytes
     except TemplateNotFound:
-        st.error(f"Template {template_name} not found in the templates directory.")
+        log.error("pdf_template_missing", sheet=sheet_name, template=template_name)
         raise
-    except Exception as e:
-        st.error(f"Error generating PDF for {sheet_name}: {str(e)}")
+    except Exception:
+        log.exception("pdf_failed", sheet=sheet_name)
         raise
 
 def create_word_doc(sheet_name, data, doc_path, header_data=None):
-    st.write(f"Creating Word doc for {sheet_name}")
+    log.debug("word_doc_started", sheet=sheet_name)
     try:
         doc = Document()
         if sheet_name == "First Page":
             if header_data:
                 for key, value in header_data.items():
                     doc.add_paragraph(f"{key.replace('_', ' ').title()}: {value}")
-            table = doc.add_table(rows=len(data["items"]) + 3, cols=8)
-            table.style = "Table Grid"
-            headers = ["Serial No.", "Unit", "Quantity", "Description", "Rate", "Amount", "BSR", "Remark"]
-            for j, header in enumerate(headers):
-                table.rows[0].cells[j].text = header
-            for i, item in enumerate(data["items"]):
-                row = table.rows[i + 1]
-                row.cells[0].text = str(item.get("serial_no", ""))
-                row.cells[1].text = str(item.get("unit", ""))
-                row.cells[2].text = str(item.get("quantity", ""))
-                row.cells[3].text = str(item.get("description", ""))
-                row.cells[4].text = str(item.get("rate", ""))
-                row.cells[5].text = str(item.get("amount", ""))
-                row.cells[6].text = str(item.get("bsr", ""))
-                row.cells[7].text = str(item.get("remark", ""))
-            row = table.rows[-3]
-            row.cells[3].text = "Grand Total"
-            row.cells[5].text = str(data["totals"].get("grand_total", ""))
-            row = table.rows[-2]
-            row.cells[3].text = f"Tender Premium @ {data['totals']['premium'].get('percent', 0) * 100:.2f}%"
-            row.cells[5].text = str(data["totals"]["premium"].get("amount", ""))
-            row = table.rows[-1]
-            row.cells[3].text = "Payable Amount"
-            row.cells[5].text = str(data["totals"].get("payable", ""))
+            rows = [
+                [item.get("serial_no", ""), item.get("unit", ""), item.get("quantity", ""), item.get("description", ""),
+                 item.get("rate", ""), item.get("amount", ""), item.get("bsr", ""), item.get("remark", "")]
+                for item in data["items"]
+            ]
+            rows.append(["", "", "", "Grand Total", "", data["totals"].get("grand_total", "")])
+            rows.append(["", "", "", f"Tender Premium @ {data['totals']['premium'].get('percent', 0) * 100:.2f}%", "", data["totals"]["premium"].get("amount", "")])
+            rows.append(["", "", "", "Payable Amount", "", data["totals"].get("payable", "")])
+            add_bulk_table(doc, ["Serial No.", "Unit", "Quantity", "Description", "Rate", "Amount", "BSR", "Remark"], rows, bold_header=False)
         elif sheet_name == "Certificate II" or sheet_name == "Certificate III":
             doc.add_paragraph(f"Payable Amount: {data.get('payable_amount', '')}")
             doc.add_paragraph(f"Total in Words: {data.get('amount_words', '')}")
             if sheet_name == "Certificate III":
                 doc.add_paragraph(data.get('certification', ''))
         elif sheet_name == "Extra Items":
-            table = doc.add_table(rows=len(data["items"]) + 1, cols=7)
-            table.style = "Table Grid"
-            headers = ["Serial No.", "Ref BSR", "Description", "Quantity", "Rate", "Amount", "Remark"]
-            for j, header in enumerate(headers):
-                table.rows[0].cells[j].text = header
-            for i, item in enumerate(data["items"]):
-                row = table.rows[i + 1]
-                row.cells[0].text = str(item.get("serial_no", ""))
-                row.cells[1].text = str(item.get("ref_bsr", ""))
-                row.cells[2].text = str(item.get("description", ""))
-                row.cells[3].text = str(item.get("quantity", ""))
-                row.cells[4].text = str(item.get("rate", ""))
-                row.cells[5].text = str(item.get("amount", ""))
-                row.cells[6].text = str(item.get("remark", ""))
+            rows = [
+                [item.get("serial_no", ""), item.get("ref_bsr", ""), item.get("description", ""),
+                 item.get("quantity", ""), item.get("rate", ""), item.get("amount", ""), item.get("remark", "")]
+                for item in data["items"]
+            ]
+            add_bulk_table(doc, ["Serial No.", "Ref BSR", "Description", "Quantity", "Rate", "Amount", "Remark"], rows, bold_header=False)
         elif sheet_name == "Deviation Statement":
             if header_data:
                 for key, value in header_data.items():
                     doc.add_paragraph(f"{key.replace('_', ' ').title()}: {value}")
-            table = doc.add_table(rows=len(data["items"]) + 5, cols=12)
-            table.style = "Table Grid"
-            headers = ["Serial No.", "Description", "Unit", "Qty WO", "Rate", "Amt WO", "Qty Bill", "Amt Bill", "Excess Qty", "Excess Amt", "Saving Qty", "Saving Amt"]
-            for j, header in enumerate(headers):
-                table.rows[0].cells[j].text = header
-            for i, item in enumerate(data["items"]):
-                row = table.rows[i + 1]
-                row.cells[0].text = str(item.get("serial_no", ""))
-                row.cells[1].text = str(item.get("description", ""))
-                row.cells[2].text = str(item.get("unit", ""))
-                row.cells[3].text = str(item.get("qty_wo", ""))
-                row.cells[4].text = str(item.get("rate", ""))
-                row.cells[5].text = str(item.get("amt_wo", ""))
-                row.cells[6].text = str(item.get("qty_bill", ""))
-                row.cells[7].text = str(item.get("amt_bill", ""))
-                row.cells[8].text = str(item.get("excess_qty", ""))
-                row.cells[9].text = str(item.get("excess_amt", ""))
-                row.cells[10].text = str(item.get("saving_qty", ""))
-                row.cells[11].text = str(item.get("saving_amt", ""))
-            row = table.rows[-4]
-            row.cells[1].text = "Grand Total"
-            row.cells[5].text = str(data["summary"].get("work_order_total", ""))
-            row.cells[7].text = str(data["summary"].get("executed_total", ""))
-            row.cells[9].text = str(data["summary"].get("overall_excess", ""))
-            row.cells[11].text = str(data["summary"].get("overall_saving", ""))
-            row = table.rows[-3]
-            row.cells[1].text = f"Add Tender Premium @ {data['summary']['premium'].get('percent', 0) * 100:.2f}%"
-            row.cells[5].text = str(data["summary"].get("tender_premium_f", ""))
-            row.cells[7].text = str(data["summary"].get("tender_premium_h", ""))
-            row.cells[9].text = str(data["summary"].get("tender_premium_j", ""))
-            row.cells[11].text = str(data["summary"].get("tender_premium_l", ""))
-            row = table.rows[-2]
-            row.cells[1].text = "Grand Total including Tender Premium"
-            row.cells[5].text = str(data["summary"].get("grand_total_f", ""))
-            row.cells[7].text = str(data["summary"].get("grand_total_h", ""))
-            row.cells[9].text = str(data["summary"].get("grand_total_j", ""))
-            row.cells[11].text = str(data["summary"].get("grand_total_l", ""))
-            row = table.rows[-1]
-            net_difference = data["summary"].get("net_difference", 0)
-            row.cells[1].text = "Overall Excess" if net_difference > 0 else "Overall Saving"
-            row.cells[7].text = str(abs(round(net_difference)))
+            summary = data["summary"]
+            net_difference = summary.get("net_difference", 0)
+            rows = [
+                [item.get("serial_no", ""), item.get("description", ""), item.get("unit", ""), item.get("qty_wo", ""),
+                 item.get("rate", ""), item.get("amt_wo", ""), item.get("qty_bill", ""), item.get("amt_bill", ""),
+                 item.get("excess_qty", ""), item.get("excess_amt", ""), item.get("saving_qty", ""), item.get("saving_amt", "")]
+                for item in data["items"]
+            ]
+            rows.append(["", ""] * 6)
+            rows.append(["", "Grand Total", "", "", "", summary.get("work_order_total", ""), "", summary.get("executed_total", ""),
+                         "", summary.get("overall_excess", ""), "", summary.get("overall_saving", "")])
+            rows.append(["", f"Add Tender Premium @ {summary['premium'].get('percent', 0) * 100:.2f}%", "", "", "", summary.get("tender_premium_f", ""),
+                         "", summary.get("tender_premium_h", ""), "", summary.get("tender_premium_j", ""), "", summary.get("tender_premium_l", "")])
+            rows.append(["", "Grand Total including Tender Premium", "", "", "", summary.get("grand_total_f", ""), "", summary.get("grand_total_h", ""),
+                         "", summary.get("grand_total_j", ""), "", summary.get("grand_total_l", "")])
+            rows.append(["", "Overall Excess" if net_difference > 0 else "Overall Saving", "", "", "", "", "", abs(round(net_difference))])
+            add_bulk_table(doc, ["Serial No.", "Description", "Unit", "Qty WO", "Rate", "Amt WO", "Qty Bill", "Amt Bill", "Excess Qty", "Excess Amt", "Saving Qty", "Saving Amt"], rows, bold_header=False)
         elif sheet_name == "Note Sheet":
             if header_data:
                 for key, value in header_data.items():
@@ -508,9 +429,9 @@ def create_word_doc(sheet_name, data, doc_path, header_data=None):
             for note in data.get("notes", []):
                 doc.add_paragraph(str(note))
         doc.save(doc_path)
-        st.write(f"Finished Word doc for {sheet_name}")
-    except Exception as e:
-        st.error(f"Error creating Word doc for {sheet_name}: {str(e)}")
+        log.debug("word_doc_finished", sheet=sheet_name, path=doc_path)
+    except Exception:
+        log.exception("word_doc_failed", sheet=sheet_name)
         raise
 
 # Streamlit app
@@ -610,13 +531,22 @@ with st.form(key='bill_form'):
     user_inputs["agreement_no"] = st.text_input("Agreement No.", value="48/2024-25")
     user_inputs["measurement_date"] = st.text_input("Measurement Date (DD/MM/YYYY)", value="03/03/2025")
 
+    outputs = st.multiselect(
+        "Outputs",
+        list(ARTIFACTS),
+        default=list(ARTIFACTS)[:3],
+        format_func=ARTIFACTS.get,
+        help="Only the selected files are generated and added to the zip"
+    )
+
     submitted = st.form_submit_button("Generate Bill")
 
 if submitted and uploaded_files:
     try:
-        TEMP_DIR = tempfile.mkdtemp()
-        zip_path = os.path.join(TEMP_DIR, f"BILL_OUTPUT_{datetime.now().strftime('%Y%m%d')}.zip")
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        stages = plan_stages(outputs)
+        zip_buffer = io.BytesIO()
+        # Artifacts go into the archive from memory as soon as they are produced
+        with StreamingZipPackager(zip_buffer) as packager:
             for uploaded_file in uploaded_files:
                 excel_file = pd.ExcelFile(uploaded_file)
                 # Verify sheet names
@@ -635,7 +565,7 @@ if submitted and uploaded_files:
                 )
 
                 # Log note_sheet_data after processing
-                print("note_sheet_data after process_bill:", note_sheet_data)
+                log.debug("note_sheet_data_processed", file=uploaded_file.name, data=lambda: repr(note_sheet_data))
 
                 # Generate note sheet notes
                 note_sheet_data["notes"] = generate_bill_notes(
@@ -646,7 +576,6 @@ if submitted and uploaded_files:
                 )
 
                 pdf_files = []
-                word_files = []
 
                 # Generate PDFs
                 pdf_sheet_names = [
@@ -661,10 +590,22 @@ if submitted and uploaded_files:
                 if is_final_bill:
                     pdf_sheet_names.append(("Note Sheet", note_sheet_data, "portrait"))
 
+                if "render_pdf" not in stages:
+                    pdf_sheet_names = []
                 for sheet_name, data, orientation in pdf_sheet_names:
-                    pdf_path = os.path.join(TEMP_DIR, f"{sheet_name.replace(' ', '_')}_{uploaded_file.name}.pdf")
-                    generate_pdf(sheet_name, data, orientation, pdf_path, note_sheet_data if sheet_name == "Note Sheet" else None)
-                    pdf_files.append(pdf_path)
+                    pdf_name = f"{sheet_name.replace(' ', '_')}_{uploaded_file.name}.pdf"
+                    pdf_bytes = generate_pdf(sheet_name, data, orientation, None, note_sheet_data if sheet_name == "Note Sheet" else None)
+                    pdf_files.append((pdf_name, pdf_bytes))
+
+                # Combine PDFs
+                if "merge_pdf" in stages:
+                    merger = StreamingPdfMerger()
+                    for _, pdf_bytes in pdf_files:
+                        merger.append(pdf_bytes)
+                    packager.add(f"BILL_AND_DEVIATION_{datetime.now().strftime('%Y%m%d')}_{uploaded_file.name}.pdf", merger.getvalue())
+                if "sheet_pdfs" in stages:
+                    for pdf_name, pdf_bytes in pdf_files:
+                        packager.add(pdf_name, pdf_bytes)
 
                 # Generate Word documents
                 word_sheet_names = ["First Page", "Certificate II", "Certificate III"]
@@ -675,6 +616,8 @@ if submitted and uploaded_files:
                 if is_final_bill:
                     word_sheet_names.append("Note Sheet")
 
+                if "word" not in stages:
+                    word_sheet_names = []
                 for sheet_name in word_sheet_names:
                     data = {
                         "First Page": first_page_data,
@@ -684,35 +627,27 @@ if submitted and uploaded_files:
                         "Deviation Statement": deviation_data,
                         "Note Sheet": note_sheet_data
                     }[sheet_name]
-                    doc_path = os.path.join(TEMP_DIR, f"{sheet_name.replace(' ', '_')}_{uploaded_file.name}.docx")
-                    create_word_doc(sheet_name, data, doc_path, first_page_data["header"])
-                    word_files.append(doc_path)
+                    doc_buffer = io.BytesIO()
+                    create_word_doc(sheet_name, data, doc_buffer, first_page_data["header"])
+                    packager.add(f"{sheet_name.replace(' ', '_')}_{uploaded_file.name}.docx", doc_buffer.getvalue())
 
-                # Combine PDFs
-                pdf_output = os.path.join(TEMP_DIR, f"BILL_AND_DEVIATION_{datetime.now().strftime('%Y%m%d')}_{uploaded_file.name}.pdf")
-                writer = PdfWriter()
-                for pdf in pdf_files:
-                    if os.path.exists(pdf):
-                        reader = PdfReader(pdf)
-                        for page in reader.pages:
-                            writer.add_page(page)
-                with open(pdf_output, "wb") as out_file:
-                    writer.write(out_file)
-                zipf.write(pdf_output, os.path.basename(pdf_output))
-                for file in pdf_files + word_files:
-                    if os.path.exists(file):
-                        zipf.write(file, os.path.basename(file))
-
-        with open(zip_path, "rb") as f:
-            st.download_button(
-                label="Download Bill Output",
-                data=f,
-                file_name="bill_output.zip",
-                mime="application/zip"
-            )
+                if "json" in stages:
+                    bill_data = {
+                        "First Page": first_page_data,
+                        "Certificate II": certificate_ii_data,
+                        "Certificate III": certificate_iii_data,
+                        "Extra Items": extra_items_data,
+                        "Deviation Statement": deviation_data,
+                        "Note Sheet": note_sheet_data
+                    }
+                    packager.add(f"BILL_DATA_{uploaded_file.name}.json", json.dumps(bill_data, indent=2, default=str))
+
+        st.download_button(
+            label="Download Bill Output",
+            data=zip_buffer.getvalue(),
+            file_name="bill_output.zip",
+            mime="application/zip"
+        )
     except Exception as e:
+        log.exception("bill_generation_failed")
         st.error(f"Error: {str(e)}")
-        st.write(traceback.format_exc())
-    finally:
-        if os.path.exists(TEMP_DIR):
-            shutil.rmtree(TEMP_DIR)
\ No newline at end of file
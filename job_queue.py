@@ -0,0 +1,527 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+import zipfile
+from contextlib import closing
+from jinja2 import TemplateError
+from bill_pipeline import read_workbook, compute_bill, generate_outputs
+from bill_history import bill_agreement, bill_header
+from state_store import dump_params, load_params
+from stage_timing import StageTimer
+from metrics import COUNTERS, BILLS_GENERATED
+from diagnostics import get_logger
+from workspace import QuotaExceededError
+
+log = get_logger("bill.jobs")
+
+DEFAULT_JOB_DB = os.environ.get("BILL_JOB_DB", os.path.join(tempfile.gettempdir(), "bill_jobs.sqlite3"))
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 2.0
+DEFAULT_POLL_INTERVAL = 0.5
+# Running jobs older than this are assumed abandoned by a worker that died
+DEFAULT_STALE_TIMEOUT = 15 * 60
+# Seconds a job's PDF rendering may take before wkhtmltopdf is killed
+DEFAULT_RENDER_TIMEOUT = 120
+# How often idle workers remove expired workspaces and finished jobs
+CLEANUP_INTERVAL = 60
+# Finished jobs and their results are deleted after this many seconds
+DEFAULT_JOB_RETENTION = float(os.environ.get("BILL_JOB_RETENTION") or 24 * 60 * 60)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Errors of the workbook or form of a bill job: retrying cannot fix them
+INPUT_ERRORS = (ValueError, KeyError, IndexError, TypeError, zipfile.BadZipFile, TemplateError, QuotaExceededError)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    input BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at, created_at);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+CREATE TABLE IF NOT EXISTS job_timings (
+    job_id TEXT PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+    timing TEXT NOT NULL
+);
+"""
+
+class PermanentJobError(Exception):
+    """
+    Job failure that retrying cannot fix, such as an unreadable workbook; the
+    job is marked failed without further attempts.
+    """
+
+class JobStore:
+    """
+    SQLite-backed job queue.
+
+    Every operation opens its own connection, so one store can be shared by
+    the Streamlit session threads and the worker threads. Claiming a job runs
+    in an IMMEDIATE transaction, so a job is handed to exactly one worker even
+    when several processes use the same database file.
+    """
+
+    def __init__(self, path=DEFAULT_JOB_DB, max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY,
+                 clock=time.time):
+        """
+        Args:
+            path: SQLite database file
+            max_attempts: Default number of attempts before a job is marked failed
+            retry_delay: Base delay in seconds before a failed job is retried;
+                doubles with every attempt
+            clock: Callable returning the current time in seconds
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def submit(self, params, input_data=None, max_attempts=None):
+        """
+        Queue a job.
+
+        Args:
+            params: JSON-serializable parameters (dates are allowed)
+            input_data: Optional input file content as bytes
+            max_attempts: Optional override of the store's attempt limit
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex
+        now = self.clock()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, input, max_attempts, created_at, updated_at, available_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, dump_params(params), input_data, max_attempts or self.max_attempts, now, now, now)
+            )
+        return job_id
+
+    def claim(self):
+        """
+        Take the oldest job that is ready to run and mark it running.
+
+        Returns:
+            Job dictionary (see get) including "input", or None if no job is ready
+        """
+        now = self.clock()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND available_at <= ? ORDER BY created_at LIMIT 1",
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"], include_input=True)
+
+    def complete(self, job_id, artifacts, timing=None):
+        """
+        Store a job's results and mark it done.
+
+        Args:
+            job_id: Job id
+            artifacts: Dictionary of file name to bytes
+            timing: Optional timing record of the run (see StageTimer.record)
+        """
+        now = self.clock()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            conn.executemany(
+                "INSERT INTO job_results (job_id, position, name, data) VALUES (?, ?, ?, ?)",
+                [(job_id, position, name, data) for position, (name, data) in enumerate(artifacts.items())]
+            )
+            if timing is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_timings (job_id, timing) VALUES (?, ?)", (job_id, json.dumps(timing))
+                )
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, input = NULL, finished_at = ?, updated_at = ? WHERE id = ?",
+                (DONE, now, now, job_id)
+            )
+            conn.execute("COMMIT")
+
+    def fail(self, job_id, error, retry=True):
+        """
+        Record a failed attempt; the job is retried with backoff until it runs
+        out of attempts, then marked failed.
+
+        Args:
+            job_id: Job id
+            error: Error message
+            retry: False to mark the job failed right away
+
+        Returns:
+            New job status (QUEUED or FAILED), or None if the job was deleted
+            while it ran
+        """
+        now = self.clock()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                log.warning("job_fail_missing", job_id=job_id)
+                return None
+            if retry and row["attempts"] < row["max_attempts"]:
+                status = QUEUED
+                available_at = now + self.retry_delay * 2 ** (row["attempts"] - 1)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ?, updated_at = ? WHERE id = ?",
+                    (status, error, available_at, now, job_id)
+                )
+            else:
+                status = FAILED
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, input = NULL, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (status, error, now, now, job_id)
+                )
+            conn.execute("COMMIT")
+        return status
+
+    def requeue_stale(self, timeout):
+        """
+        Put back jobs left running by a worker that died, e.g. on a restart.
+
+        Args:
+            timeout: Seconds after which a running job is considered abandoned
+
+        Returns:
+            Number of jobs requeued
+        """
+        now = self.clock()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, updated_at = ? WHERE status = ? AND started_at < ?",
+                (QUEUED, now, now, RUNNING, now - timeout)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id, include_input=False):
+        """
+        Look up a job.
+
+        Args:
+            job_id: Job id
+            include_input: Also return the input file content
+
+        Returns:
+            Dictionary with id, status, params, attempts, max_attempts, error,
+            created_at, started_at, finished_at (and input), or None if unknown
+        """
+        columns = "id, status, params, attempts, max_attempts, error, created_at, started_at, finished_at"
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT {columns}{', input' if include_input else ''} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = load_params(job["params"])
+        return job
+
+    def results(self, job_id):
+        """
+        Fetch the artifacts of a finished job.
+
+        Returns:
+            Dictionary of file name to bytes, in the order they were produced
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT name, data FROM job_results WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+        return {row["name"]: bytes(row["data"]) for row in rows}
+
+    def counts(self):
+        """
+        Number of jobs per status.
+
+        Returns:
+            Dictionary of status to count; statuses without jobs are 0
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, count(*) AS jobs FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        counts.update({row["status"]: row["jobs"] for row in rows})
+        return counts
+
+    def timing(self, job_id):
+        """
+        Timing record of a finished job.
+
+        Returns:
+            Dictionary with total_seconds and stages (see StageTimer.record),
+            or None if the job was not timed
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT timing FROM job_timings WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["timing"]) if row else None
+
+    def purge(self, older_than):
+        """
+        Delete finished jobs and their results.
+
+        Args:
+            older_than: Age in seconds after which done or failed jobs are removed
+
+        Returns:
+            Number of jobs deleted
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, self.clock() - older_than)
+            )
+            return cursor.rowcount
+
+class WorkerPool:
+    """
+    Threads that claim jobs from a JobStore and run them through a handler.
+
+    The number of workers caps how many jobs run at once; anything beyond
+    that waits in the queue. With a WorkspaceManager, every attempt gets its
+    own workspace (job["workspace"]) that is removed when the attempt ends.
+    Every attempt also gets a StageTimer (job["timer"]); the timing record of
+    a successful attempt is stored with its results. Handlers put side effects
+    that must happen once per job (recording the bill elsewhere) in
+    job["on_complete"]; they run only after the results are stored, so a
+    retried attempt never repeats them. A handler raising PermanentJobError
+    fails the job without retrying it.
+    """
+
+    def __init__(self, store, handler, workers=DEFAULT_JOB_WORKERS, poll_interval=DEFAULT_POLL_INTERVAL,
+                 workspaces=None, retention=DEFAULT_JOB_RETENTION, state_store=None):
+        """
+        Args:
+            store: JobStore to take jobs from
+            handler: Callable taking a job dictionary (see JobStore.claim) and
+                returning a dictionary of file name to bytes
+            workers: Number of worker threads
+            poll_interval: Seconds to wait when the queue is empty
+            workspaces: Optional WorkspaceManager for per-job directories; idle
+                workers also remove its expired workspaces
+            retention: Seconds finished jobs and their results are kept; idle
+                workers purge older ones (None keeps them)
+            state_store: Optional StateStore whose expired entries idle
+                workers purge
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.workspaces = workspaces
+        self.retention = retention
+        self.state_store = state_store
+        self._last_cleanup = float("-inf")
+        self._cleanup_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """
+        Start the worker threads (no-op if already running).
+        """
+        if self._threads:
+            return self
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"bill-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Ask the workers to exit after their current job and wait for them.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self):
+        """
+        Claim and run a single job in the calling thread.
+
+        Returns:
+            True if a job was run, False if none was ready
+        """
+        job = self.store.claim()
+        if job is None:
+            return False
+        workspace = self.workspaces.create("job") if self.workspaces else None
+        timer = StageTimer()
+        try:
+            job["workspace"] = workspace
+            job["timer"] = timer
+            job["on_complete"] = []
+            artifacts = self.handler(job)
+        except Exception as e:
+            retry = not isinstance(e, PermanentJobError)
+            status = self.store.fail(job["id"], f"{e}\n{traceback.format_exc()}", retry=retry)
+            timer.finish(job_id=job["id"], status=status)
+            if status == FAILED:
+                COUNTERS.inc(BILLS_GENERATED, status=FAILED)
+        else:
+            self.store.complete(job["id"], artifacts, timing=timer.finish(job_id=job["id"], status=DONE))
+            COUNTERS.inc(BILLS_GENERATED, status=DONE)
+            for callback in job["on_complete"]:
+                try:
+                    callback()
+                except Exception:
+                    log.exception("job_on_complete_failed", job_id=job["id"])
+        finally:
+            if workspace:
+                workspace.remove()
+        return True
+
+    def cleanup(self, force=False):
+        """
+        Remove expired workspaces and state store entries and purge
+        finished jobs older than the retention, at most once per
+        CLEANUP_INTERVAL.
+
+        Args:
+            force: Clean up even if the last cleanup was recent
+        """
+        if not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            if force or time.monotonic() - self._last_cleanup >= CLEANUP_INTERVAL:
+                self._last_cleanup = time.monotonic()
+                if self.workspaces:
+                    self.workspaces.cleanup_expired()
+                if self.retention is not None:
+                    purged = self.store.purge(self.retention)
+                    if purged:
+                        log.info("jobs_purged", jobs=purged)
+                if self.state_store is not None:
+                    purged = self.state_store.purge_expired()
+                    if purged:
+                        log.info("state_entries_purged", entries=purged)
+        finally:
+            self._cleanup_lock.release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.run_once():
+                self.cleanup()
+                self._stop.wait(self.poll_interval)
+
+def submit_bill_job(store, input_data, form, outputs=None):
+    """
+    Queue a bill generation job.
+
+    Args:
+        store: JobStore
+        input_data: Workbook content as bytes
+        form: Dictionary with the bill form fields
+        outputs: Requested artifact names
+
+    Returns:
+        Job id
+    """
+    return store.submit({"form": form, "outputs": outputs}, input_data=input_data)
+
+def bill_job_handler(env=None, wkhtmltopdf_path=None, deterministic=False, history=None, archive=None,
+                     search_index=None, schedule=None, timeout=DEFAULT_RENDER_TIMEOUT):
+    """
+    Build a WorkerPool handler that runs bill jobs through the bill pipeline.
+
+    Args:
+        env: Optional Jinja2 environment shared by all jobs
+        wkhtmltopdf_path: Optional explicit path to the PDF renderer
+        deterministic: Produce byte-identical PDFs for identical inputs
+        history: Optional BillHistory; bills are computed against it and
+            archived in it once the job is done
+        archive: Optional BillArchive receiving the line items of every
+            done bill
+        search_index: Optional BillSearchIndex updated with every done bill
+        schedule: Optional BsrSchedule every bill is validated against
+        timeout: Seconds a job's PDF rendering may take (None for no limit);
+            renderer processes still running then are killed and the job is
+            retried
+
+    Returns:
+        Callable taking a job dictionary and returning its artifacts; errors
+        of the workbook or form are raised as PermanentJobError. With a job
+        workspace, the workbook is read from a copy written there, so the
+        workspace quota bounds the upload.
+    """
+    def handle(job):
+        params = job["params"]
+        timer = job.get("timer")
+        workspace = job.get("workspace")
+        try:
+            source = job["input"]
+            if workspace is not None:
+                source = workspace.write("input.xlsx", source)
+            sheets = compute_bill(
+                *read_workbook(source, timer=timer), params["form"], history=history, schedule=schedule,
+                timer=timer
+            )
+            if (history is not None or archive is not None or search_index is not None) and bill_agreement(sheets):
+                # The bill number must file the bill under a serial before anything is generated
+                bill_header(sheets)
+            artifacts = generate_outputs(
+                sheets, params.get("outputs"), env=env, deterministic=deterministic,
+                wkhtmltopdf_path=wkhtmltopdf_path, timer=timer, timeout=timeout
+            )
+        except INPUT_ERRORS as e:
+            raise PermanentJobError(f"{type(e).__name__}: {e}") from e
+        # Recorded once the results are stored, so a retried attempt does not record the bill twice
+        on_complete = job.setdefault("on_complete", [])
+        if history is not None:
+            on_complete.append(lambda: history.record_bill(sheets))
+        if archive is not None:
+            on_complete.append(lambda: archive.append(sheets))
+        if search_index is not None:
+            on_complete.append(lambda: search_index.index_bill(sheets))
+        return artifacts
+
+    return handle
@@ -0,0 +1,278 @@
+"""
+Load metrics and health checks for the deployment.
+
+Endpoints (served next to the Streamlit app by MetricsServer on
+BILL_METRICS_PORT, and by bill_service on its own port):
+
+    GET /metrics   Prometheus text format: bills generated, stage latency
+                   histograms, renderer failures, job queue depth, cache
+                   requests and misses, workspace and disk usage
+    GET /healthz   Liveness; always 200 while the process serves requests,
+                   with the readiness checks for information
+    GET /readyz    Readiness; 200 when the PDF renderer and the templates are
+                   usable (and the job store answers), 503 otherwise
+
+    curl -s localhost:8503/metrics
+"""
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bill_pipeline import TEMPLATE_DIR
+from pdf_pipeline import find_wkhtmltopdf
+from stage_timing import STAGE_METRICS
+from diagnostics import get_logger
+
+log = get_logger("bill.metrics")
+
+# Metrics server started next to the Streamlit app; an empty or 0 port disables it
+DEFAULT_METRICS_HOST = os.environ.get("BILL_METRICS_HOST", "127.0.0.1")
+DEFAULT_METRICS_PORT = int(os.environ.get("BILL_METRICS_PORT") or 8503)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Templates every bill is rendered with
+REQUIRED_TEMPLATES = (
+    "first_page.html", "last_page.html", "deviation_statement.html", "extra_items.html", "note_sheet.html"
+)
+
+# Counter names
+BILLS_GENERATED = "bill_generated_total"
+CACHE_REQUESTS = "bill_cache_requests_total"
+CACHE_MISSES = "bill_cache_misses_total"
+
+COUNTER_HELP = {
+    BILLS_GENERATED: "Bills whose outputs were generated, by final status.",
+    CACHE_REQUESTS: "Lookups in the parsed workbook, bill and preview caches.",
+    CACHE_MISSES: "Cache lookups that had to compute the value."
+}
+
+class Counters:
+    """
+    Process-wide monotonic counters with labels.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, name, **labels):
+        with self._lock:
+            return self._values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """
+        Returns:
+            Dictionary of counter name to {label pairs: value}
+        """
+        with self._lock:
+            values = dict(self._values)
+        counters = {}
+        for (name, labels), value in sorted(values.items()):
+            counters.setdefault(name, {})[labels] = value
+        return counters
+
+COUNTERS = Counters()
+
+def readiness(job_store=None, wkhtmltopdf_path=None, template_dir=TEMPLATE_DIR):
+    """
+    Check that bills can be generated.
+
+    Args:
+        job_store: Optional JobStore that must answer a query
+        wkhtmltopdf_path: Renderer to check (looked up when omitted)
+        template_dir: Directory holding REQUIRED_TEMPLATES
+
+    Returns:
+        Tuple of (ready, dictionary of check name to {"ok", "detail"})
+    """
+    checks = {}
+    path = wkhtmltopdf_path or find_wkhtmltopdf()
+    if not path:
+        checks["renderer"] = {"ok": False, "detail": "wkhtmltopdf not found"}
+    elif not os.access(path, os.X_OK):
+        checks["renderer"] = {"ok": False, "detail": f"{path} is not executable"}
+    else:
+        checks["renderer"] = {"ok": True, "detail": path}
+
+    missing = [name for name in REQUIRED_TEMPLATES if not os.path.isfile(os.path.join(template_dir, name))]
+    checks["templates"] = {
+        "ok": not missing,
+        "detail": f"missing {', '.join(missing)} in {template_dir}" if missing else template_dir
+    }
+
+    if job_store is not None:
+        try:
+            checks["job_store"] = {"ok": True, "detail": f"{sum(job_store.counts().values())} jobs"}
+        except Exception as e:
+            checks["job_store"] = {"ok": False, "detail": f"{type(e).__name__}: {e}"}
+    return all(check["ok"] for check in checks.values()), checks
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+def _number(value):
+    if isinstance(value, float):
+        return "+Inf" if math.isinf(value) else repr(value)
+    return str(int(value))
+
+class _Exposition:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, labels=()):
+        self.lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+def render_metrics(job_store=None, workspaces=None, wkhtmltopdf_path=None, counters=COUNTERS,
+                   stage_metrics=STAGE_METRICS):
+    """
+    Current metrics of the process in Prometheus text format.
+
+    Args:
+        job_store: Optional JobStore; its jobs per status are the queue depth
+        workspaces: Optional WorkspaceManager for temp disk usage
+        wkhtmltopdf_path: Renderer for the readiness gauges
+        counters: Counters to export
+        stage_metrics: StageMetrics to export
+
+    Returns:
+        Exposition text
+    """
+    out = _Exposition()
+    values = counters.snapshot()
+    for name, help_text in COUNTER_HELP.items():
+        out.family(name, "counter", help_text)
+        for labels, value in values.get(name, {}).items():
+            out.sample(name, value, labels)
+
+    requests = values.get(CACHE_REQUESTS, {})
+    out.family("bill_cache_hit_ratio", "gauge", "Share of cache lookups served from the cache since start.")
+    for labels, total in requests.items():
+        misses = values.get(CACHE_MISSES, {}).get(labels, 0)
+        out.sample("bill_cache_hit_ratio", max(total - misses, 0) / total if total else 0.0, labels)
+
+    stages = stage_metrics.snapshot()
+    out.family("bill_stage_duration_seconds", "histogram", "Duration of pipeline stages.")
+    for stage, totals in stages.items():
+        for bound, count in totals["buckets"]:
+            out.sample("bill_stage_duration_seconds_bucket", count, (("stage", stage), ("le", _number(float(bound)))))
+        out.sample("bill_stage_duration_seconds_sum", float(totals["seconds"]), (("stage", stage),))
+        out.sample("bill_stage_duration_seconds_count", totals["count"], (("stage", stage),))
+    out.family("bill_stage_errors_total", "counter", "Pipeline stage runs that raised.")
+    for stage, totals in stages.items():
+        out.sample("bill_stage_errors_total", totals["errors"], (("stage", stage),))
+    out.family("bill_renderer_failures_total", "counter", "wkhtmltopdf runs that failed or timed out.")
+    out.sample("bill_renderer_failures_total", stages.get("wkhtmltopdf", {}).get("errors", 0))
+
+    if job_store is not None:
+        out.family("bill_jobs", "gauge", "Bill jobs by status; queued jobs are the queue depth.")
+        for status, count in sorted(job_store.counts().items()):
+            out.sample("bill_jobs", count, (("status", status),))
+
+    if workspaces is not None:
+        usage = workspaces.metrics()
+        for key, help_text in (
+            ("workspaces", "Temporary workspaces on disk."),
+            ("workspace_bytes", "Bytes used by temporary workspaces."),
+            ("largest_workspace_bytes", "Bytes used by the largest workspace."),
+            ("disk_free_bytes", "Free bytes on the workspace filesystem."),
+            ("disk_total_bytes", "Size of the workspace filesystem.")
+        ):
+            out.family(f"bill_{key}", "gauge", help_text)
+            out.sample(f"bill_{key}", usage[key])
+
+    ready, checks = readiness(job_store, wkhtmltopdf_path)
+    out.family("bill_check_ok", "gauge", "1 when a readiness check passes.")
+    for name, check in checks.items():
+        out.sample("bill_check_ok", int(check["ok"]), (("check", name),))
+    out.family("bill_ready", "gauge", "1 when every readiness check passes.")
+    out.sample("bill_ready", int(ready))
+    return out.text()
+
+class MetricsServer:
+    """
+    /metrics, /healthz and /readyz on a separate port, served from a daemon
+    thread. Streamlit owns the app port, so these cannot share it.
+    """
+
+    def __init__(self, host=DEFAULT_METRICS_HOST, port=DEFAULT_METRICS_PORT, job_store=None, workspaces=None,
+                 wkhtmltopdf_path=None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            job_store: Optional JobStore reported as queue depth and checked
+            workspaces: Optional WorkspaceManager reported as disk usage
+            wkhtmltopdf_path: Renderer to check (looked up when omitted)
+        """
+        self.job_store = job_store
+        self.workspaces = workspaces
+        self.wkhtmltopdf_path = wkhtmltopdf_path
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, content_type, body = server.respond(self.path.split("?", 1)[0])
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug("metrics_request", client=self.client_address[0], request=lambda: format % args)
+
+        return Handler
+
+    def respond(self, path):
+        """
+        Returns:
+            Tuple of (HTTP status, content type, body bytes) for a GET of path
+        """
+        if path == "/metrics":
+            text = render_metrics(self.job_store, self.workspaces, self.wkhtmltopdf_path)
+            return 200, PROMETHEUS_CONTENT_TYPE, text.encode("utf-8")
+        if path in ("/healthz", "/readyz"):
+            ready, checks = readiness(self.job_store, self.wkhtmltopdf_path)
+            status = 200 if ready or path == "/healthz" else 503
+            body = {"status": "ok" if status == 200 else "unavailable", "ready": ready, "checks": checks}
+            return status, "application/json", json.dumps(body).encode("utf-8")
+        return 404, "application/json", b'{"error": "not found"}'
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name="bill-metrics", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread = None
@@ -0,0 +1,76 @@
+# Artifacts a caller can ask for, with the labels shown in the UI
+ARTIFACTS = {
+    "combined_pdf": "Combined PDF",
+    "sheet_pdfs": "Per-sheet PDFs",
+    "word": "Word document (First Page)",
+    "json": "JSON data"
+}
+
+DEFAULT_OUTPUTS = ("combined_pdf",)
+
+# Pipeline stages in execution order, with the stages each one depends on
+STAGES = {
+    "render_pdf": (),
+    "merge_pdf": ("render_pdf",),
+    "sheet_pdfs": ("render_pdf",),
+    "word": (),
+    "json": ()
+}
+
+# Stage that produces each artifact
+ARTIFACT_STAGES = {
+    "combined_pdf": "merge_pdf",
+    "sheet_pdfs": "sheet_pdfs",
+    "word": "word",
+    "json": "json"
+}
+
+def parse_outputs(outputs):
+    """
+    Normalise a requested output list.
+
+    Args:
+        outputs: Iterable of artifact names, a comma-separated string, or None
+            for the default plan
+
+    Returns:
+        Tuple of artifact names in canonical order
+
+    Raises:
+        ValueError: If an artifact name is unknown or nothing was requested
+    """
+    if outputs is None:
+        return DEFAULT_OUTPUTS
+    if isinstance(outputs, str):
+        outputs = [name.strip() for name in outputs.split(",") if name.strip()]
+
+    requested = set(outputs)
+    unknown = requested - set(ARTIFACTS)
+    if unknown:
+        raise ValueError(f"Unknown output(s): {', '.join(sorted(unknown))}. Valid outputs: {', '.join(ARTIFACTS)}")
+    if not requested:
+        raise ValueError("At least one output must be requested")
+
+    return tuple(name for name in ARTIFACTS if name in requested)
+
+def plan_stages(outputs):
+    """
+    Build the list of stages needed to produce the requested artifacts.
+
+    Only stages that some requested artifact depends on are included, so
+    e.g. a Word-only request never starts the PDF renderer.
+
+    Args:
+        outputs: Requested artifact names (see parse_outputs)
+
+    Returns:
+        List of stage names in execution order
+    """
+    needed = set()
+    pending = [ARTIFACT_STAGES[name] for name in parse_outputs(outputs)]
+    while pending:
+        stage = pending.pop()
+        if stage not in needed:
+            needed.add(stage)
+            pending.extend(STAGES[stage])
+    return [stage for stage in STAGES if stage in needed]
@@ -0,0 +1,139 @@
+import math
+
+# Page geometry in millimetres for the templates with long item tables.
+# Heights are estimates tuned to the template CSS; they only need to be
+# conservative enough that a chunk never overflows its page.
+FIRST_PAGE_LAYOUT = {
+    "page_height": 255.0,
+    "title_height": 30.0,
+    "header_row_height": 8.0,
+    "table_head_height": 28.0,
+    "footer_height": 48.0,
+    "carry_row_height": 8.0,
+    "chars_per_line": 40,
+    "line_height": 3.4,
+    "row_padding": 4.5,
+    "amount_keys": ("amount",)
+}
+
+DEVIATION_LAYOUT = {
+    "page_height": 175.0,
+    "title_height": 45.0,
+    "header_row_height": 0.0,
+    "table_head_height": 22.0,
+    "footer_height": 40.0,
+    "carry_row_height": 8.0,
+    "chars_per_line": 55,
+    "line_height": 3.8,
+    "row_padding": 4.0,
+    "amount_keys": ("amt_wo", "amt_bill", "excess_amt", "saving_amt")
+}
+
+PAGINATED_SHEETS = {
+    "First Page": FIRST_PAGE_LAYOUT,
+    "Deviation Statement": DEVIATION_LAYOUT
+}
+
+def estimate_row_height(item, layout):
+    """
+    Estimate the rendered height of one item row.
+
+    Args:
+        item: Item dictionary
+        layout: Page layout dictionary
+
+    Returns:
+        Height in millimetres
+    """
+    description = str(item.get("description", "") or "")
+    lines = max(1, math.ceil(len(description) / layout["chars_per_line"]))
+    return lines * layout["line_height"] + layout["row_padding"]
+
+def _amount(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+def paginate_items(items, layout, header_rows=0):
+    """
+    Split items into page-sized chunks with carried-forward subtotals.
+
+    Args:
+        items: List of item dictionaries
+        layout: Page layout dictionary
+        header_rows: Number of header rows printed above the table on the first page
+
+    Returns:
+        List of chunk dictionaries with keys: items, page_number, page_count,
+        is_first, is_last, brought_forward and carried_forward
+    """
+    first_page_reserved = layout["title_height"] + header_rows * layout["header_row_height"]
+    capacity = layout["page_height"] - layout["table_head_height"] - 2 * layout["carry_row_height"]
+
+    chunks = [[]]
+    heights = [0.0]
+    available = capacity - first_page_reserved
+    for item in items:
+        height = estimate_row_height(item, layout)
+        if chunks[-1] and heights[-1] + height > available:
+            chunks.append([])
+            heights.append(0.0)
+            available = capacity
+        chunks[-1].append(item)
+        heights[-1] += height
+
+    # The totals rows only appear after the last chunk; move its tail to a
+    # new page if they would not fit
+    if len(chunks[-1]) > 1 and heights[-1] + layout["footer_height"] > available:
+        tail = []
+        while len(chunks[-1]) > 1 and heights[-1] + layout["footer_height"] > available:
+            item = chunks[-1].pop()
+            heights[-1] -= estimate_row_height(item, layout)
+            tail.insert(0, item)
+        chunks.append(tail)
+
+    pages = []
+    running = {key: 0 for key in layout["amount_keys"]}
+    for index, chunk_items in enumerate(chunks):
+        brought_forward = dict(running)
+        for item in chunk_items:
+            for key in running:
+                running[key] += _amount(item.get(key))
+        pages.append({
+            "items": chunk_items,
+            "page_number": index + 1,
+            "page_count": len(chunks),
+            "is_first": index == 0,
+            "is_last": index == len(chunks) - 1,
+            "brought_forward": brought_forward if index > 0 else None,
+            "carried_forward": dict(running) if index < len(chunks) - 1 else None
+        })
+    return pages
+
+def paginate_sheet(sheet_name, data):
+    """
+    Split a sheet's template data into independently renderable chunks.
+
+    Sheets without a pagination layout, or without an item list, are
+    returned unchanged as a single chunk.
+
+    Args:
+        sheet_name: Display name of the sheet (e.g. "First Page")
+        data: Dictionary containing data for the template
+
+    Returns:
+        List of template data dictionaries, one per chunk
+    """
+    layout = PAGINATED_SHEETS.get(sheet_name)
+    items = data.get("items") if isinstance(data, dict) else None
+    if layout is None or not isinstance(items, list):
+        return [data]
+
+    header = data.get("header")
+    header_rows = sum(1 for row in header if len(row) > 0) if isinstance(header, list) else 0
+
+    chunks = []
+    for page in paginate_items(items, layout, header_rows):
+        chunk = dict(data)
+        chunk["items"] = page.pop("items")
+        chunk["page"] = page
+        chunks.append(chunk)
+    return chunks
@@ -0,0 +1,85 @@
+import io
+from pypdf import PdfReader, PdfWriter
+from reproducible import deterministic_metadata
+
+class StreamingPdfMerger:
+    """
+    Merge PDF documents in-process as they become available.
+
+    Each document is appended as soon as it is added, so callers can render
+    and merge one sheet at a time. When the output is written, identical
+    objects shared between the documents (fonts, images, resource
+    dictionaries) are stored once and page content streams are compressed.
+
+    In deterministic mode the output carries fixed metadata and a document
+    ID derived from its content, so identical inputs give identical bytes.
+    """
+
+    def __init__(self, compress=True, deterministic=False, clock=None, deduplicate=True):
+        """
+        Args:
+            compress: Compress page content, and deduplicate shared objects
+                (see deduplicate) when the merged document is written
+            deterministic: Write fixed metadata and a content-derived ID
+            clock: Optional callable returning the datetime stamped into
+                deterministic metadata
+            deduplicate: Store identical objects once when compressing
+        """
+        self.compress = compress
+        self.deduplicate = deduplicate
+        self.deterministic = deterministic
+        self.clock = clock
+        self.document_count = 0
+        self.page_count = 0
+        self._writer = PdfWriter()
+
+    def append(self, pdf):
+        """
+        Append every page of a PDF document.
+
+        Args:
+            pdf: PDF as bytes, a file path or a binary file-like object
+
+        Returns:
+            Number of pages appended
+        """
+        if isinstance(pdf, (bytes, bytearray)):
+            pdf = io.BytesIO(pdf)
+        reader = PdfReader(pdf)
+
+        start = len(self._writer.pages)
+        self._writer.append(reader)
+        added = len(self._writer.pages) - start
+
+        if self.compress:
+            for page in self._writer.pages[start:]:
+                page.compress_content_streams()
+
+        self.document_count += 1
+        self.page_count += added
+        return added
+
+    def write(self, stream):
+        """
+        Write the merged document.
+
+        Args:
+            stream: Output path or binary file-like object
+        """
+        if not self.document_count:
+            raise ValueError("No PDFs to combine")
+
+        if self.compress and self.deduplicate:
+            self._writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+        if self.deterministic:
+            self._writer.add_metadata(deterministic_metadata(self.clock))
+            self._writer.generate_file_identifiers()
+        self._writer.write(stream)
+
+    def getvalue(self):
+        """
+        Return the merged document as bytes.
+        """
+        output = io.BytesIO()
+        self.write(output)
+        return output.getvalue()
@@ -0,0 +1,223 @@
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pdf_merger import StreamingPdfMerger
+from pagination import paginate_sheet
+from stage_timing import stage
+
+# Common wkhtmltopdf install locations checked after WKHTMLTOPDF_PATH and PATH
+WKHTMLTOPDF_CANDIDATES = [
+    r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe",
+    r"C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe",
+    r"C:\Program Files\wkhtmltopdf\wkhtmltopdf.exe",
+    r"C:\Program Files (x86)\wkhtmltopdf\wkhtmltopdf.exe",
+    "/usr/local/bin/wkhtmltopdf",
+    "/usr/bin/wkhtmltopdf"
+]
+
+# Renderer processes run concurrently when a bill is split into several chunks
+DEFAULT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+DEFAULT_PDF_OPTIONS = {
+    'page-size': 'A4',
+    'margin-top': '0.25in',
+    'margin-bottom': '0.25in',
+    'margin-left': '0.25in',
+    'margin-right': '0.5in',
+    'encoding': "UTF-8",
+    'quiet': "",
+    'no-outline': None,
+    'enable-local-file-access': None,
+    'disable-smart-shrinking': None,
+    'dpi': 300,
+    'javascript-delay': "1000",
+    'no-stop-slow-scripts': None,
+    'load-error-handling': "ignore"
+}
+
+def find_wkhtmltopdf():
+    """
+    Locate the wkhtmltopdf executable.
+
+    Returns:
+        Path to the executable, or None if it is not installed
+    """
+    env_path = os.environ.get("WKHTMLTOPDF_PATH")
+    if env_path and os.path.exists(env_path):
+        return env_path
+
+    on_path = shutil.which("wkhtmltopdf")
+    if on_path:
+        return on_path
+
+    for path in WKHTMLTOPDF_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+def build_wkhtmltopdf_args(options):
+    """
+    Convert a pdfkit-style options dictionary into wkhtmltopdf arguments.
+
+    Args:
+        options: Dictionary of option name to value; None or "" marks a bare flag
+
+    Returns:
+        List of command line arguments
+    """
+    args = []
+    for key, value in (options or {}).items():
+        args.append(key if key.startswith("-") else f"--{key}")
+        if value is not None and value != "":
+            args.append(str(value))
+    return args
+
+def render_pdf_bytes(html_content, options=None, wkhtmltopdf_path=None, timeout=None):
+    """
+    Render HTML to PDF entirely in memory.
+
+    The HTML is piped to wkhtmltopdf on stdin and the PDF is read back from
+    stdout, so no temporary files are created.
+
+    Args:
+        html_content: HTML content as string
+        options: Optional wkhtmltopdf options (defaults to DEFAULT_PDF_OPTIONS)
+        wkhtmltopdf_path: Optional explicit path to the executable
+        timeout: Optional timeout in seconds for the renderer process
+
+    Returns:
+        PDF document as bytes
+    """
+    wkhtmltopdf_path = wkhtmltopdf_path or find_wkhtmltopdf()
+    if not wkhtmltopdf_path:
+        raise FileNotFoundError("wkhtmltopdf executable not found. Please install it from: https://wkhtmltopdf.org/downloads.html")
+
+    cmd = [wkhtmltopdf_path, *build_wkhtmltopdf_args(DEFAULT_PDF_OPTIONS if options is None else options), "-", "-"]
+    try:
+        result = subprocess.run(
+            cmd,
+            input=html_content.encode("utf-8"),
+            capture_output=True,
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"wkhtmltopdf timed out after {timeout} seconds")
+
+    # wkhtmltopdf exits non-zero on ignored load errors but still writes a valid PDF
+    if not result.stdout.startswith(b"%PDF"):
+        raise RuntimeError(f"wkhtmltopdf failed (exit code {result.returncode}): {result.stderr.decode('utf-8', 'replace')}")
+
+    return result.stdout
+
+def merge_pdf_bytes(pdf_buffers, deterministic=False, clock=None):
+    """
+    Merge PDF documents held in memory into a single PDF.
+
+    Documents are appended as the iterable yields them, so a generator of
+    rendered sheets is merged while later sheets are still being rendered.
+
+    Args:
+        pdf_buffers: Iterable of PDF documents as bytes
+        deterministic: Produce byte-identical output for identical inputs
+        clock: Optional callable returning the datetime used in metadata
+
+    Returns:
+        Combined PDF document as bytes
+    """
+    merger = StreamingPdfMerger(deterministic=deterministic, clock=clock)
+    for pdf_bytes in pdf_buffers:
+        merger.append(pdf_bytes)
+    return merger.getvalue()
+
+def render_sheet_html(env, sheet_name, data):
+    """
+    Render the template for a bill sheet.
+
+    Args:
+        env: Jinja2 environment
+        sheet_name: Display name of the sheet (e.g. "First Page")
+        data: Dictionary containing data for the template
+
+    Returns:
+        Rendered HTML as string
+    """
+    template = env.get_template(f"{sheet_name.lower().replace(' ', '_')}.html")
+    return template.render(data=data, **data)
+
+def render_sheet_pdfs(env, sheets, options=None, max_workers=None, wkhtmltopdf_path=None, timer=None, timeout=None):
+    """
+    Render bill sheets to PDF, one list of chunk documents per sheet.
+
+    Sheets with long item tables are split into page-sized chunks first.
+    All chunks are rendered in parallel.
+
+    Args:
+        env: Jinja2 environment
+        sheets: Ordered iterable of (sheet_name, template_data) pairs
+        options: Optional wkhtmltopdf options
+        max_workers: Optional number of concurrent renderer processes
+        wkhtmltopdf_path: Optional explicit path to the executable (looked up
+            once here rather than per chunk when omitted)
+        timer: Optional StageTimer; template rendering and wkhtmltopdf are
+            recorded as the "render_html" and "wkhtmltopdf" stages, summed
+            over all chunks
+        timeout: Optional seconds for the whole render; renderer processes
+            still running then are killed
+
+    Returns:
+        List of (sheet_name, [chunk PDF bytes]) pairs in sheet order
+
+    Raises:
+        RuntimeError: If the render takes longer than timeout
+    """
+    wkhtmltopdf_path = wkhtmltopdf_path or find_wkhtmltopdf()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    units = [
+        (sheet_name, chunk)
+        for sheet_name, data in sheets
+        for chunk in paginate_sheet(sheet_name, data)
+    ]
+
+    def render_unit(unit):
+        with stage("render_html", timer):
+            html = render_sheet_html(env, *unit)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            raise RuntimeError(f"PDF rendering timed out after {timeout} seconds")
+        with stage("wkhtmltopdf", timer):
+            return render_pdf_bytes(html, options=options, wkhtmltopdf_path=wkhtmltopdf_path, timeout=remaining)
+
+    with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_RENDER_WORKERS) as executor:
+        rendered = list(executor.map(render_unit, units))
+
+    results = []
+    for (sheet_name, _), pdf_bytes in zip(units, rendered):
+        if not results or results[-1][0] != sheet_name:
+            results.append((sheet_name, []))
+        results[-1][1].append(pdf_bytes)
+    return results
+
+def render_bill_pdf(env, sheets, options=None, deterministic=False, clock=None, max_workers=None, timeout=None):
+    """
+    Render bill sheets to PDF and merge them into one document in memory.
+
+    Args:
+        env: Jinja2 environment
+        sheets: Ordered iterable of (sheet_name, template_data) pairs
+        options: Optional wkhtmltopdf options
+        deterministic: Produce byte-identical output for identical inputs
+        clock: Optional callable returning the datetime used in metadata
+        max_workers: Optional number of concurrent renderer processes
+        timeout: Optional seconds for rendering (see render_sheet_pdfs)
+
+    Returns:
+        Combined PDF document as bytes
+    """
+    rendered = render_sheet_pdfs(env, sheets, options=options, max_workers=max_workers, timeout=timeout)
+    return merge_pdf_bytes(
+        (pdf_bytes for _, chunks in rendered for pdf_bytes in chunks),
+        deterministic=deterministic,
+        clock=clock
+    )
@@ -0,0 +1,58 @@
+import html
+import time
+from jinja2 import TemplateError
+from pdf_pipeline import render_sheet_html
+
+# Inputs must stay unchanged this long before the preview is recomputed
+PREVIEW_DEBOUNCE_SECONDS = 0.75
+
+def render_preview(env, sheets, sheet_names=None):
+    """
+    Render bill sheets to HTML for an on-screen preview.
+
+    This uses the same templates as the PDF output but never starts the PDF
+    renderer, so it is cheap enough to run on every input change. Sheets are
+    rendered whole rather than in page-sized chunks. A sheet whose template
+    fails is replaced by an error message so the other sheets still show.
+
+    Args:
+        env: Jinja2 environment
+        sheets: Ordered iterable of (sheet_name, template_data) pairs
+        sheet_names: Optional subset of sheets to render
+
+    Returns:
+        Dictionary of sheet name to HTML, in sheet order
+    """
+    preview = {}
+    for sheet_name, data in sheets:
+        if sheet_names is not None and sheet_name not in sheet_names:
+            continue
+        try:
+            preview[sheet_name] = render_sheet_html(env, sheet_name, data)
+        except TemplateError as e:
+            preview[sheet_name] = f"<p><strong>Could not render {html.escape(sheet_name)}:</strong> {html.escape(str(e))}</p>"
+    return preview
+
+def debounce(state, key, value, delay=PREVIEW_DEBOUNCE_SECONDS, clock=time.monotonic):
+    """
+    Report whether a value has settled.
+
+    The first time a new value is seen its arrival time is recorded in state;
+    it counts as settled once it has been unchanged for delay seconds.
+
+    Args:
+        state: Mutable mapping that persists between calls (e.g. st.session_state)
+        key: Key under which the value and its arrival time are stored
+        value: Current value; must support equality comparison
+        delay: Seconds the value must stay unchanged
+        clock: Callable returning the current time in seconds
+
+    Returns:
+        True if the value has been unchanged for at least delay seconds
+    """
+    current_time = clock()
+    seen = state.get(key)
+    if seen is None or seen[0] != value:
+        state[key] = (value, current_time)
+        return delay <= 0
+    return current_time - seen[1] >= delay
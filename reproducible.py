@@ -0,0 +1,79 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+
+# Timestamp used in deterministic mode when neither a clock nor SOURCE_DATE_EPOCH is given
+DEFAULT_FIXED_TIME = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+PDF_PRODUCER = "Contractor Bill Generator"
+
+def fixed_clock(value=None):
+    """
+    Create a clock that always returns the same time.
+
+    Args:
+        value: datetime to return (defaults to the reproducible build time)
+
+    Returns:
+        Callable returning a datetime
+    """
+    value = value or source_date() or DEFAULT_FIXED_TIME
+    return lambda: value
+
+def source_date():
+    """
+    Read the reproducible-builds SOURCE_DATE_EPOCH environment variable.
+
+    Returns:
+        UTC datetime, or None if the variable is unset or invalid
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return None
+    try:
+        return datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+    except (ValueError, OverflowError):
+        return None
+
+def now(clock=None):
+    """
+    Current time from the injected clock, SOURCE_DATE_EPOCH or the system.
+
+    Args:
+        clock: Optional callable returning a datetime
+
+    Returns:
+        datetime
+    """
+    if clock is not None:
+        return clock()
+    return source_date() or datetime.now()
+
+def pdf_date(value):
+    """
+    Format a datetime as a PDF date string (D:YYYYMMDDHHmmSS).
+    """
+    return value.strftime("D:%Y%m%d%H%M%S") + ("Z" if value.tzinfo else "")
+
+def deterministic_metadata(clock=None):
+    """
+    Document information dictionary with fixed producer and dates.
+
+    Args:
+        clock: Optional callable returning a datetime; defaults to fixed_clock()
+
+    Returns:
+        Dictionary suitable for PdfWriter.add_metadata
+    """
+    timestamp = pdf_date((clock or fixed_clock())())
+    return {
+        "/Producer": PDF_PRODUCER,
+        "/CreationDate": timestamp,
+        "/ModDate": timestamp
+    }
+
+def content_digest(data):
+    """
+    SHA-256 hex digest of generated output, for content-addressed storage.
+    """
+    return hashlib.sha256(data).hexdigest()
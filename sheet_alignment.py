@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+# First item row of the Work Order and Bill Quantity sheets (0-based)
+DATA_START_ROW = 21
+
+# Column of each field in the Work Order and Bill Quantity sheets (see
+# process_bill); None for fields a layout does not have
+SHEET_LAYOUT = {"serial": 0, "description": 1, "unit": 2, "quantity": 3, "rate": 4, "bsr": 6}
+
+# Keys rows can be matched on:
+#   bsr       BSR code (or the description for rows without a code); codes
+#             that repeat are qualified by their item group, the serial
+#             number carried down to its sub-items
+#   serial    item group and position within the group
+#   position  sheet row, as in the original positional pairing
+ALIGN_KEYS = ("bsr", "serial", "position")
+DEFAULT_ALIGN_KEY = "bsr"
+
+KEY_COLUMNS = ["group", "code", "occurrence"]
+
+def parse_numbers(values):
+    """
+    Parse sheet cells as numbers the way process_bill always has: numbers
+    as is, strings with thousands separators and spaces removed, blanks as 0.
+
+    Args:
+        values: Sequence or Series of cell values
+
+    Returns:
+        Tuple of (float ndarray, bool ndarray marking unparseable strings)
+    """
+    series = pd.Series(values, dtype=object).reset_index(drop=True)
+    kinds = series.map(type)
+    numeric = [kind for kind in kinds.unique() if issubclass(kind, (int, float, np.number))]
+    numbers = pd.to_numeric(series.where(kinds.isin(numeric)), errors="coerce")
+    strings = series.where(kinds == str)
+    cleaned = strings.str.strip().str.replace(r"[, ]", "", regex=True).replace("", "0")
+    parsed = pd.to_numeric(cleaned, errors="coerce")
+    invalid = strings.notna() & parsed.isna()
+    result = parsed.where(strings.notna(), numbers).fillna(0)
+    return result.to_numpy(dtype=float), invalid.to_numpy()
+
+def _column(sheet, index):
+    if index is None or index >= sheet.shape[1]:
+        return pd.Series([np.nan] * len(sheet), index=sheet.index, dtype=object)
+    return sheet.iloc[:, index]
+
+def _text(series):
+    return series.astype(str).where(series.notna(), "")
+
+def _item_rows(sheet, layout, start_row):
+    rows = sheet.iloc[start_row:]
+    frame = pd.DataFrame({
+        "row": np.arange(start_row, start_row + len(rows)),
+        "serial_no": _text(_column(rows, layout.get("serial"))).to_numpy(),
+        "description": _text(_column(rows, layout.get("description"))).to_numpy(),
+        "unit": _text(_column(rows, layout.get("unit"))).to_numpy(),
+        "bsr": _text(_column(rows, layout.get("bsr"))).to_numpy()
+    })
+    frame["quantity"], frame["quantity_invalid"] = parse_numbers(_column(rows, layout.get("quantity")))
+    frame["rate"], frame["rate_invalid"] = parse_numbers(_column(rows, layout.get("rate")))
+    frame["blank"] = (frame[["serial_no", "description", "bsr"]] == "").all(axis=1) & (frame["quantity"] == 0)
+    return frame
+
+def _collapse(text):
+    # Vectorised " ".join(value.split()), as in normalize_code
+    return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+def _codes(frame):
+    code = _collapse(frame["bsr"]).str.upper()
+    uncoded = code == ""
+    code[uncoded] = "description:" + _collapse(frame.loc[uncoded, "description"]).str.lower()
+    return code
+
+def row_keys(frame, key=DEFAULT_ALIGN_KEY, repeated=()):
+    """
+    Join key of every item row.
+
+    Sub-items carry no serial number, so each row's group is the last serial
+    number above it. Keys that still repeat are numbered in sheet order,
+    which makes every key unique.
+
+    Args:
+        frame: Item rows with row, serial_no, description and bsr columns
+        key: One of ALIGN_KEYS
+        repeated: For the bsr key, codes to qualify with their item group
+
+    Returns:
+        DataFrame of KEY_COLUMNS aligned with frame
+    """
+    if key not in ALIGN_KEYS:
+        raise ValueError(f"Unknown alignment key: {key} (expected one of {', '.join(ALIGN_KEYS)})")
+    if key == "position":
+        return pd.DataFrame({"group": "", "code": frame["row"].astype(str), "occurrence": 0}, index=frame.index)
+    serial = frame["serial_no"].str.strip()
+    group = serial.where(serial != "").ffill().fillna("")
+    if key == "bsr":
+        code = _codes(frame)
+        group = group.where(code.isin(set(repeated)), "")
+    else:
+        code = pd.Series("", index=frame.index)
+    keys = pd.DataFrame({"group": group, "code": code}, index=frame.index)
+    keys["occurrence"] = keys.groupby(["group", "code"], sort=False).cumcount()
+    return keys
+
+class SheetAlignment:
+    """
+    Work Order rows joined with their Bill Quantity rows.
+
+    Attributes:
+        key: Key the rows were matched on
+        items: DataFrame with one row per Work Order item row, in sheet order:
+            row, serial_no, description, unit, bsr, rate, quantity (from
+            the Bill Quantity sheet, 0 when unmatched), work_order_quantity,
+            bill_row (-1 when unmatched) and valid (False when the quantity or
+            rate cell cannot be parsed)
+        unmatched_work_order: Work Order rows with no Bill Quantity row
+        unmatched_bill_quantity: Bill Quantity rows with no Work Order row;
+            their quantities are not billed
+        invalid: Cells that could not be parsed as numbers
+    """
+
+    def __init__(self, key, items, unmatched_work_order, unmatched_bill_quantity, invalid):
+        self.key = key
+        self.items = items
+        self.unmatched_work_order = unmatched_work_order
+        self.unmatched_bill_quantity = unmatched_bill_quantity
+        self.invalid = invalid
+
+    @property
+    def reordered(self):
+        """
+        Number of matched rows that are not on the same row in both sheets.
+        """
+        matched = self.items[self.items["bill_row"] >= 0]
+        return int((matched["bill_row"] != matched["row"]).sum())
+
+    def report(self):
+        """
+        JSON-serialisable summary for the bill data and the UI.
+        """
+        return {
+            "key": self.key,
+            "work_order_rows": len(self.items),
+            "reordered": self.reordered,
+            "unmatched_work_order": self.unmatched_work_order,
+            "unmatched_bill_quantity": self.unmatched_bill_quantity,
+            "invalid": self.invalid
+        }
+
+def _describe(frame):
+    return [
+        {"row": int(row.row) + 1, "serial_no": row.serial_no, "bsr": row.bsr, "description": row.description[:80]}
+        for row in frame.itertuples(index=False)
+    ]
+
+def _invalid_cells(frame, sheet_name):
+    cells = []
+    for field in ("quantity", "rate"):
+        for row in frame.loc[frame[f"{field}_invalid"], ["row"]].itertuples(index=False):
+            cells.append({"sheet": sheet_name, "row": int(row.row) + 1, "field": field})
+    return cells
+
+def align_sheets(ws_wo, ws_bq, key=DEFAULT_ALIGN_KEY, layout=SHEET_LAYOUT, bill_layout=None,
+                 start_row=DATA_START_ROW):
+    """
+    Match Bill Quantity rows to Work Order rows with a hash join on key.
+
+    Args:
+        ws_wo: Work Order sheet DataFrame
+        ws_bq: Bill Quantity sheet DataFrame
+        key: One of ALIGN_KEYS
+        layout: Column of each field in the Work Order sheet
+        bill_layout: Column of each field in the Bill Quantity sheet
+            (defaults to layout)
+        start_row: First item row of both sheets
+
+    Returns:
+        SheetAlignment (row numbers in its reports are 1-based sheet rows)
+    """
+    work_order = _item_rows(ws_wo, layout, start_row)
+    bill = _item_rows(ws_bq, bill_layout or layout, start_row)
+
+    repeated = ()
+    if key == "bsr":
+        codes = pd.concat([_codes(work_order), _codes(bill)], keys=["work_order", "bill"])
+        counts = codes.groupby(level=0).value_counts()
+        repeated = counts[counts > 1].index.get_level_values(-1).unique()
+    left = pd.concat([work_order[["row"]], row_keys(work_order, key, repeated)], axis=1)
+    right = pd.concat(
+        [bill[["row"]].rename(columns={"row": "bill_row"}), row_keys(bill, key, repeated)], axis=1
+    )
+    right["bill_index"] = np.arange(len(bill))
+    joined = left.merge(right, on=KEY_COLUMNS, how="outer", indicator=True, validate="one_to_one")
+
+    # Work Order order is the bill order
+    matched = joined[joined["_merge"] != "right_only"].sort_values("row", kind="stable")
+    bill_index = matched["bill_index"].fillna(-1).astype(int).to_numpy()
+    has_bill = bill_index >= 0
+    take = np.where(has_bill, bill_index, 0)
+
+    items = work_order[["row", "serial_no", "description", "unit", "bsr", "rate"]].copy()
+    items["work_order_quantity"] = work_order["quantity"]
+    items["quantity"] = np.where(has_bill, bill["quantity"].to_numpy()[take] if len(bill) else 0.0, 0.0)
+    items["bill_row"] = np.where(has_bill, matched["bill_row"].fillna(-1).to_numpy(), -1).astype(int)
+    quantity_invalid = np.where(has_bill, bill["quantity_invalid"].to_numpy()[take] if len(bill) else False, False)
+    items["valid"] = ~(quantity_invalid | work_order["rate_invalid"].to_numpy())
+
+    unmatched_bill = bill.iloc[joined.loc[joined["_merge"] == "right_only", "bill_index"].astype(int)]
+    return SheetAlignment(
+        key,
+        items,
+        _describe(work_order[~has_bill & ~work_order["blank"].to_numpy()]),
+        _describe(unmatched_bill[~unmatched_bill["blank"]]),
+        _invalid_cells(work_order[["row", "rate_invalid"]].assign(quantity_invalid=False), "Work Order")
+        + _invalid_cells(bill[["row", "quantity_invalid"]].assign(rate_invalid=False), "Bill Quantity")
+    )
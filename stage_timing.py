@@ -0,0 +1,176 @@
+"""
+Per-stage timing of bill generation.
+
+Every pipeline stage (parse, compute, template render, wkhtmltopdf, merge,
+Word export, zip) runs inside a StageTimer.stage() block. The timer keeps a
+timing record for the bill and feeds each measurement into process-wide
+counters and latency histograms (STAGE_METRICS). finish() writes the bill's
+record as one structured log line (see diagnostics).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from diagnostics import get_logger
+
+log = get_logger("bill.timing")
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Pipeline stages in run order; records list other stages after these
+STAGES = (
+    "parse", "compute", "render_html", "wkhtmltopdf", "render_pdf", "merge_pdf", "sheet_pdfs", "word", "json", "zip"
+)
+
+def _stage_order(name):
+    return (STAGES.index(name), "") if name in STAGES else (len(STAGES), name)
+
+class StageMetrics:
+    """
+    Process-wide call and error counters and latency histograms per stage.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, name, seconds, error=False):
+        """
+        Count one run of a stage.
+
+        Args:
+            name: Stage name
+            seconds: Duration of the run
+            error: The stage raised
+        """
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = {
+                    "count": 0, "errors": 0, "seconds": 0.0, "buckets": [0] * (len(self.buckets) + 1)
+                }
+            stage["count"] += 1
+            stage["errors"] += bool(error)
+            stage["seconds"] += seconds
+            stage["buckets"][bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        """
+        Copy of the counters, in stage order.
+
+        Returns:
+            Dictionary of stage name to count, errors, seconds (total) and
+            buckets, a list of (upper bound, cumulative count) pairs ending
+            with (inf, count)
+        """
+        with self._lock:
+            stages = {name: dict(stage, buckets=list(stage["buckets"])) for name, stage in self._stages.items()}
+        bounds = self.buckets + (float("inf"),)
+        snapshot = {}
+        for name in sorted(stages, key=_stage_order):
+            stage = stages[name]
+            cumulative, buckets = 0, []
+            for bound, count in zip(bounds, stage["buckets"]):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            snapshot[name] = dict(stage, buckets=buckets)
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+STAGE_METRICS = StageMetrics()
+
+class StageTimer:
+    """
+    Timing record of one bill.
+
+    Stages may run more than once (one wkhtmltopdf call per page chunk) and
+    from several threads; their durations are added up, so stages that run
+    in parallel can add up to more than the wall time of the bill.
+    """
+
+    def __init__(self, metrics=STAGE_METRICS, clock=time.perf_counter):
+        """
+        Args:
+            metrics: StageMetrics every measurement is also counted in, or None
+            clock: Monotonic clock returning seconds
+        """
+        self.metrics = metrics
+        self.clock = clock
+        self.started = clock()
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block as a run of stage name. A block that raises
+        is recorded as an error and the exception propagates.
+        """
+        start = self.clock()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.add(name, self.clock() - start, error)
+
+    def add(self, name, seconds, error=False):
+        """
+        Record a run of a stage measured elsewhere.
+        """
+        with self._lock:
+            stage = self._stages.setdefault(name, {"seconds": 0.0, "calls": 0, "errors": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+            stage["errors"] += bool(error)
+        if self.metrics is not None:
+            self.metrics.observe(name, seconds, error)
+        log.debug("stage", stage=name, seconds=round(seconds, 6), error=error)
+
+    def record(self):
+        """
+        Timing record of the bill so far.
+
+        Returns:
+            Dictionary with total_seconds (wall time since the timer was
+            created) and stages, a list of dictionaries with stage, seconds,
+            calls and errors in stage order
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+        return {
+            "total_seconds": round(self.clock() - self.started, 6),
+            "stages": [
+                {"stage": name, **dict(stages[name], seconds=round(stages[name]["seconds"], 6))}
+                for name in sorted(stages, key=_stage_order)
+            ]
+        }
+
+    def finish(self, **context):
+        """
+        Write the timing record as a structured log line.
+
+        Args:
+            **context: Identifying fields added to the log line (job id, name, ...)
+
+        Returns:
+            The timing record
+        """
+        record = self.record()
+        log.info("bill_timing", **context, **record)
+        return record
+
+def stage(name, timer=None):
+    """
+    Time a block as stage name in timer, or only in STAGE_METRICS when no
+    per-bill timer is given. Pipeline functions take an optional timer and
+    time their stages with this.
+    """
+    return (timer or StageTimer()).stage(name)
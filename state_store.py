@@ -0,0 +1,268 @@
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from datetime import date, datetime
+
+DEFAULT_STATE_DIR = os.environ.get("BILL_STATE_DIR", os.path.join(tempfile.gettempdir(), "bill_state"))
+DEFAULT_STATE_STORE = os.environ.get("BILL_STATE_STORE", "sqlite:///" + os.path.join(DEFAULT_STATE_DIR, "state.sqlite3"))
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decode_value(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+def dump_params(params):
+    """
+    Serialize job parameters to JSON, keeping dates and datetimes round-trippable.
+    """
+    return json.dumps(params, default=_encode_value, sort_keys=True)
+
+def load_params(text):
+    """
+    Inverse of dump_params.
+    """
+    return json.loads(text, object_hook=_decode_value)
+
+class StateStore(ABC):
+    """
+    Namespaced key-value store shared by every replica of the app.
+
+    Values are bytes; get_json/put_json and get_object/put_object wrap them
+    for form state and cached bill data. Entries may carry a TTL after which
+    they read as missing. Subclasses implement get, put, delete, keys and
+    purge_expired.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+
+    @abstractmethod
+    def get(self, namespace, key, default=None):
+        pass
+
+    @abstractmethod
+    def put(self, namespace, key, value, ttl=None):
+        pass
+
+    @abstractmethod
+    def delete(self, namespace, key):
+        pass
+
+    @abstractmethod
+    def keys(self, namespace):
+        pass
+
+    @abstractmethod
+    def purge_expired(self):
+        pass
+
+    def _expires_at(self, ttl):
+        return self.clock() + ttl if ttl else None
+
+    def get_json(self, namespace, key, default=None):
+        """
+        Read a value stored with put_json (dates round-trip).
+        """
+        value = self.get(namespace, key)
+        return default if value is None else load_params(value.decode("utf-8"))
+
+    def put_json(self, namespace, key, value, ttl=None):
+        self.put(namespace, key, dump_params(value).encode("utf-8"), ttl)
+
+    def get_object(self, namespace, key, default=None):
+        """
+        Read a value stored with put_object. Only use with stores this
+        application alone writes to; values are unpickled.
+        """
+        value = self.get(namespace, key)
+        return default if value is None else pickle.loads(value)
+
+    def put_object(self, namespace, key, value, ttl=None):
+        self.put(namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+
+class FileStateStore(StateStore):
+    """
+    State store in a directory, e.g. a volume mounted by every replica.
+
+    Each entry is a data file plus a small JSON metadata file, both replaced
+    atomically, named after a hash of the key.
+    """
+
+    def __init__(self, root=DEFAULT_STATE_DIR, clock=time.time):
+        super().__init__(clock)
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _paths(self, namespace, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        directory = os.path.join(self.root, hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:16])
+        return directory, os.path.join(directory, f"{name}.bin"), os.path.join(directory, f"{name}.json")
+
+    def _write_atomic(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, namespace, key, default=None):
+        _, data_path, meta_path = self._paths(namespace, key)
+        meta = self._read_meta(meta_path)
+        if meta is None or (meta["expires_at"] is not None and meta["expires_at"] <= self.clock()):
+            return default
+        try:
+            with open(data_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return default
+
+    def put(self, namespace, key, value, ttl=None):
+        directory, data_path, meta_path = self._paths(namespace, key)
+        os.makedirs(directory, exist_ok=True)
+        # Data first: a reader that sees the new metadata also sees the new data
+        self._write_atomic(data_path, bytes(value))
+        meta = {"namespace": namespace, "key": key, "expires_at": self._expires_at(ttl)}
+        self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def delete(self, namespace, key):
+        _, data_path, meta_path = self._paths(namespace, key)
+        for path in (meta_path, data_path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self, namespace=None):
+        directories = [self._paths(namespace, "")[0]] if namespace is not None else [
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+        ]
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    meta = self._read_meta(os.path.join(directory, name))
+                    if meta is not None:
+                        yield meta
+
+    def keys(self, namespace):
+        now = self.clock()
+        return sorted(
+            meta["key"] for meta in self._entries(namespace)
+            if meta["expires_at"] is None or meta["expires_at"] > now
+        )
+
+    def purge_expired(self):
+        """
+        Delete expired entries.
+
+        Returns:
+            Number of entries deleted
+        """
+        now = self.clock()
+        expired = [meta for meta in self._entries() if meta["expires_at"] is not None and meta["expires_at"] <= now]
+        for meta in expired:
+            self.delete(meta["namespace"], meta["key"])
+        return len(expired)
+
+class SQLiteStateStore(StateStore):
+    """
+    State store in a SQLite database file (WAL mode), e.g. on a shared volume.
+    """
+
+    def __init__(self, path=os.path.join(DEFAULT_STATE_DIR, "state.sqlite3"), clock=time.time):
+        super().__init__(clock)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " expires_at REAL, updated_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, namespace, key, default=None):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, self.clock())
+            ).fetchone()
+        return default if row is None else bytes(row[0])
+
+    def put(self, namespace, key, value, ttl=None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, bytes(value), self._expires_at(ttl), self.clock())
+            )
+
+    def delete(self, namespace, key):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def keys(self, namespace):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT key FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?) ORDER BY key",
+                (namespace, self.clock())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_expired(self):
+        """
+        Delete expired entries.
+
+        Returns:
+            Number of entries deleted
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("DELETE FROM state WHERE expires_at <= ?", (self.clock(),))
+            return cursor.rowcount
+
+def open_state_store(url=DEFAULT_STATE_STORE):
+    """
+    Open the state store named by a URL.
+
+    Args:
+        url: "sqlite:///path/to/state.sqlite3" or "file:///path/to/directory";
+            a bare path ending in .sqlite3 or .db is SQLite, any other a directory
+
+    Returns:
+        StateStore
+    """
+    if url.startswith("sqlite://"):
+        return SQLiteStateStore(url[len("sqlite://"):])
+    if url.startswith("file://"):
+        return FileStateStore(url[len("file://"):])
+    if url.endswith((".sqlite3", ".db")):
+        return SQLiteStateStore(url)
+    return FileStateStore(url)
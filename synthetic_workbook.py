@@ -0,0 +1,220 @@
+"""
+Synthetic bill workbooks of any size for tests and benchmarks.
+
+The workbooks have the layout of the real inputs (see test_files): a Work
+Order and a Bill Quantity sheet with 21 header rows and one row per item
+from row 22, items grouped under a numbered parent row with sub-items coded
+<parent BSR>.<n>, and an Extra Items sheet with its items from row 7.
+
+Usage:
+    python synthetic_workbook.py out.xlsx --items 10000 [--extra-items 500] [--seed 0]
+"""
+import argparse
+import io
+import numpy as np
+import pandas as pd
+from sheet_alignment import DATA_START_ROW
+
+# First item row of the Extra Items sheet (0-based)
+EXTRA_START_ROW = 6
+
+WORK_NAME = "Electric Repair and MTC work at Govt. Ambedkar hostel Ambamata, Govardhanvilas, Udaipur"
+CONTRACTOR = "M/s Seema Electrical Udaipur"
+
+UNITS = ["P. point", "Each", "Nos", "Meter", "Job", "Set"]
+
+WORKS = [
+    "Rewiring of light point/ fan point/ exhaust fan point/ call bell point with 1.5 sq. mm FR PVC insulated "
+    "copper conductor single core cable in surface/ recessed PVC conduit",
+    "Supply and fixing of 6 A modular switch/ socket outlet on existing modular plate and switch box",
+    "Supplying and laying of PVC insulated aluminium conductor armoured power cable in existing pipe/ trench",
+    "Supply and installation of LED luminaire complete with all accessories as per specification",
+    "Providing and fixing of MCB distribution board, double door, with all accessories"
+]
+
+SUB_ITEMS = ["Short point (up to 3 mtr.)", "Medium point (up to 6 mtr.)", "Long point (up to 10 mtr.)",
+             "Up to 20 A", "Above 20 A", "Single phase", "Three phase"]
+
+def _header_rows(title, tender_premium=4.0):
+    rows = [[np.nan] * 7 for _ in range(DATA_START_ROW)]
+    fields = {
+        1: ("FOR CONTRACTORS & SUPPLIERS ONLY FOR PAYMENT FOR WORK OR SUPPLIES ACTUALLY MEASURED", None),
+        2: (title, None),
+        5: ("Name of Contractor or supplier :", None),
+        7: ("Name of Work ;-", None),
+        9: ("Serial No. of this bill :", "First & Final Bill"),
+        10: ("No. and date of the last bill-", "Not Applicable"),
+        11: ("Reference to work order or Agreement :", "1179 Dt. 09-01-2025"),
+        12: ("Agreement No.", "48/2024-25"),
+        13: ("Date of written order to commence work :", pd.Timestamp("2025-01-09")),
+        14: ("St. date of Start :", pd.Timestamp("2025-01-18")),
+        15: ("St. date of completion :", pd.Timestamp("2025-04-17")),
+        16: ("Date of actual completion of work :", pd.Timestamp("2025-03-01")),
+        17: ("Date of measurement :", pd.Timestamp("2025-03-03"))
+    }
+    for row, (label, value) in fields.items():
+        rows[row][0] = label
+        if value is not None:
+            rows[row][4] = value
+    rows[6][1] = CONTRACTOR
+    rows[8][1] = WORK_NAME
+    rows[19][0], rows[19][4], rows[19][5], rows[19][6] = "TENDER PREMIUM %", tender_premium, "%", "ABOVE"
+    rows[20] = ["Item", "Description", "Unit", "Quantity", "Rate", "Amount", "BSR"]
+    return rows
+
+def make_items(items, seed=0):
+    """
+    Work Order item rows.
+
+    Args:
+        items: Number of item rows
+        seed: Random seed; the same seed gives the same rows
+
+    Returns:
+        DataFrame with serial, description, unit, quantity, rate, amount and
+        bsr columns, in the sheet's column order
+    """
+    rng = np.random.default_rng(seed)
+    # Parent rows carry the serial number and the BSR code of their group;
+    # parents with sub-items have no quantity of their own
+    sizes = rng.integers(0, 5, size=items)
+    parent = np.zeros(items, dtype=bool)
+    position, group_of, sub_index = 0, np.zeros(items, dtype=int), np.zeros(items, dtype=int)
+    for group, size in enumerate(sizes):
+        if position >= items:
+            break
+        parent[position] = True
+        group_of[position:position + size + 1] = group
+        sub_index[position:position + size + 1] = np.arange(min(size + 1, items - position))
+        position += size + 1
+    has_children = np.zeros(items, dtype=bool)
+    has_children[:-1] = parent[:-1] & ~parent[1:]
+
+    group_codes = np.char.add(np.char.add((group_of // 50 + 1).astype(str), "."), (group_of % 50 + 1).astype(str))
+    bsr = np.where(parent, group_codes, np.char.add(np.char.add(group_codes, "."), sub_index.astype(str)))
+    works = np.array(WORKS, dtype=object)[group_of % len(WORKS)]
+    subs = np.array(SUB_ITEMS, dtype=object)[(sub_index - 1) % len(SUB_ITEMS)]
+    description = np.where(parent, works + " (" + bsr.astype(object) + ")", subs)
+
+    quantity = rng.integers(1, 120, size=items).astype(float)
+    rate = rng.integers(40, 9000, size=items).astype(float)
+    billed = ~has_children
+    frame = pd.DataFrame({
+        "serial": pd.Series(np.where(parent, group_of + 1, 0), dtype=object).where(parent),
+        "description": description,
+        "unit": pd.Series(np.array(UNITS, dtype=object)[rng.integers(0, len(UNITS), size=items)]).where(billed),
+        "quantity": pd.Series(quantity).where(billed),
+        "rate": pd.Series(rate).where(billed),
+        "amount": pd.Series(quantity * rate).where(billed),
+        "bsr": bsr.astype(object)
+    })
+    return frame
+
+def make_bill_quantities(work_order_items, seed=0, deviation=0.2):
+    """
+    Bill Quantity rows for the Work Order rows: the same items, a share of
+    them with executed quantities that differ from the ordered ones.
+
+    Args:
+        work_order_items: DataFrame from make_items
+        seed: Random seed
+        deviation: Share of billed items whose quantity differs
+
+    Returns:
+        DataFrame in the Work Order column order
+    """
+    rng = np.random.default_rng(seed + 1)
+    bill = work_order_items.copy()
+    billed = bill["quantity"].notna().to_numpy()
+    changed = billed & (rng.random(len(bill)) < deviation)
+    change = rng.integers(-10, 15, size=len(bill))
+    quantity = bill["quantity"].to_numpy().copy()
+    quantity[changed] = np.maximum(quantity[changed] + change[changed], 0)
+    bill["quantity"] = quantity
+    bill["amount"] = bill["quantity"] * bill["rate"]
+    return bill
+
+def make_extra_items(count, seed=0):
+    """
+    Extra Items sheet rows: serial, BSR, description, quantity, unit, rate,
+    amount and remarks.
+    """
+    rng = np.random.default_rng(seed + 2)
+    quantity = rng.integers(1, 20, size=count)
+    rate = rng.integers(50, 6000, size=count)
+    return pd.DataFrame({
+        "serial": [f"E-{i + 1:02d}" for i in range(count)],
+        "bsr": np.nan,
+        "description": np.array(SUB_ITEMS + WORKS, dtype=object)[np.arange(count) % (len(SUB_ITEMS) + len(WORKS))],
+        "quantity": quantity,
+        "unit": "Each",
+        "rate": rate,
+        "amount": quantity * rate,
+        "remarks": np.nan
+    })
+
+def _with_header(header, rows):
+    frame = pd.DataFrame(header)
+    rows = pd.DataFrame(rows.to_numpy(), columns=range(rows.shape[1]))
+    return pd.concat([frame, rows], ignore_index=True)
+
+def make_sheets(items, extra_items=None, seed=0):
+    """
+    Sheets of a synthetic bill workbook, as read_workbook returns them.
+
+    Args:
+        items: Number of Work Order and Bill Quantity item rows
+        extra_items: Number of Extra Items rows (defaults to one per 20 items)
+        seed: Random seed; the same arguments give the same sheets
+
+    Returns:
+        Dictionary of sheet name to DataFrame (no header row)
+    """
+    extra_items = max(1, items // 20) if extra_items is None else extra_items
+    work_order = make_items(items, seed)
+    extra_header = [[np.nan] * 8 for _ in range(EXTRA_START_ROW)]
+    extra_header[0][3] = "EXTRA ITEM SLIP"
+    extra_header[1][0], extra_header[1][2] = "Name of Work :-", WORK_NAME
+    extra_header[2][0], extra_header[2][3] = "Name of Contractor or supplier :", CONTRACTOR
+    extra_header[3][0], extra_header[3][3] = "Reference to work order or Agreement :", "1179 Dt. 09-01-2025"
+    extra_header[5] = ["S.No.", "Ref. BSR No.", "Particulars", "Qty.", np.nan, "Rate", "Amount", "Remarks"]
+    return {
+        "Work Order": _with_header(_header_rows("WORK ORDER"), work_order),
+        "Bill Quantity": _with_header(_header_rows("BILL QUANTITY"), make_bill_quantities(work_order, seed)),
+        "Extra Items": _with_header(extra_header, make_extra_items(extra_items, seed))
+    }
+
+def write_workbook(target, items, extra_items=None, seed=0):
+    """
+    Write a synthetic bill workbook.
+
+    Args:
+        target: Output path or writable binary file-like object
+        items: Number of Work Order and Bill Quantity item rows
+        extra_items: Number of Extra Items rows (defaults to one per 20 items)
+        seed: Random seed
+    """
+    with pd.ExcelWriter(target, engine="openpyxl") as writer:
+        for name, sheet in make_sheets(items, extra_items, seed).items():
+            sheet.to_excel(writer, sheet_name=name, index=False, header=False)
+
+def workbook_bytes(items, extra_items=None, seed=0):
+    """
+    Synthetic bill workbook as .xlsx bytes (see write_workbook).
+    """
+    output = io.BytesIO()
+    write_workbook(output, items, extra_items, seed)
+    return output.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", help="Workbook to write")
+    parser.add_argument("--items", type=int, default=100, help="Work Order and Bill Quantity item rows")
+    parser.add_argument("--extra-items", type=int, help="Extra Items rows (default: one per 20 items)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_workbook(args.output, args.items, args.extra_items, args.seed)
+    print(f"Wrote {args.items} items to {args.output}")
+
+if __name__ == "__main__":
+    main()
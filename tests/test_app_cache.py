@@ -0,0 +1,87 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+# Add the parent directory to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import app_cache
+from app_cache import file_digest, bill_inputs_key, load_workbook, load_bill, load_job_downloads
+from job_queue import JobStore
+from state_store import SQLiteStateStore
+from metrics import COUNTERS, CACHE_REQUESTS, CACHE_MISSES
+
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+FORM = {
+    "premium_percent": 4.0,
+    "premium_type": "Above",
+    "bill_type": "Final Bill",
+    "start_date": date(2025, 1, 1),
+    "completion_date": date(2025, 6, 30),
+    "outputs": ["combined_pdf"],
+    "processing": False,
+    "error": None
+}
+
+class TestAppCache(unittest.TestCase):
+    def setUp(self):
+        load_workbook.clear()
+        load_bill.clear()
+        with open(SAMPLE_FILE, "rb") as f:
+            self.data = f.read()
+        # Keep bills computed by other test runs out of the cache
+        self.temp_dir = tempfile.mkdtemp()
+        store = SQLiteStateStore(os.path.join(self.temp_dir, "state.sqlite3"))
+        patcher = patch("app_cache.get_state_store", return_value=store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_inputs_key_ignores_output_selection(self):
+        changed_outputs = dict(FORM, outputs=["word", "json"], processing=True)
+        self.assertEqual(bill_inputs_key(FORM), bill_inputs_key(changed_outputs))
+        self.assertNotEqual(bill_inputs_key(FORM), bill_inputs_key(dict(FORM, premium_percent=5.0)))
+
+    def test_workbook_is_parsed_once_per_digest(self):
+        digest = file_digest(self.data)
+        with patch("app_cache.read_workbook", wraps=app_cache.read_workbook) as read:
+            first = load_bill(digest, bill_inputs_key(FORM), self.data)
+            again = load_bill(digest, bill_inputs_key(dict(FORM, outputs=["json"])), self.data)
+            other = load_bill(digest, bill_inputs_key(dict(FORM, premium_percent=5.0)), self.data)
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual([name for name, _ in first], [name for name, _ in again])
+        self.assertEqual(other[0][1]["premium_percent"], 5.0)
+
+    def test_cache_lookups_are_counted(self):
+        digest = file_digest(self.data)
+        requests = COUNTERS.get(CACHE_REQUESTS, cache="bill")
+        misses = COUNTERS.get(CACHE_MISSES, cache="bill")
+        load_bill(digest, bill_inputs_key(FORM), self.data)
+        load_bill(digest, bill_inputs_key(FORM), self.data)
+        self.assertEqual(COUNTERS.get(CACHE_REQUESTS, cache="bill") - requests, 2)
+        self.assertEqual(COUNTERS.get(CACHE_MISSES, cache="bill") - misses, 1)
+
+    def test_job_downloads_are_zipped_once(self):
+        store = JobStore(os.path.join(self.temp_dir, "jobs.sqlite3"))
+        job_id = store.submit({"outputs": ["word", "json"]}, b"xlsx")
+        store.claim()
+        store.complete(job_id, {"bill.docx": b"docx", "bill.json": b"{}"})
+        load_job_downloads.clear()
+        with patch("app_cache.get_job_store", return_value=store), \
+                patch("app_cache.build_zip", wraps=app_cache.build_zip) as build:
+            artifacts, archive = load_job_downloads(job_id)
+            self.assertEqual(load_job_downloads(job_id)[1], archive)
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(list(artifacts), ["bill.docx", "bill.json"])
+        self.assertTrue(archive.startswith(b"PK"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import zipfile
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import date
+
+# Add the parent directory to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from batch_cli import coerce_inputs, load_manifest, group_by_agreement, run_manifest, main
+from bill_history import BillHistory
+
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class TestBatchCli(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        shutil.copy(SAMPLE_FILE, os.path.join(self.temp_dir, "bill.xlsx"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_csv_manifest_values_are_coerced(self):
+        path = self.write("manifest.csv", (
+            "workbook,name,premium_percent,amount_paid_last_bill,start_date,bill_type,outputs\n"
+            "bill.xlsx,first,4.5,1200,31-01-2025,Final Bill,\"json,word\"\n"
+            "bill.xlsx,,,,2025-02-01,,\n"
+        ))
+        first, second = load_manifest(path, "json")
+        self.assertEqual(first["workbook"], os.path.join(self.temp_dir, "bill.xlsx"))
+        self.assertEqual(first["outputs"], ("word", "json"))
+        self.assertEqual(first["form"], {
+            "premium_percent": 4.5, "amount_paid_last_bill": 1200,
+            "start_date": date(2025, 1, 31), "bill_type": "Final Bill"
+        })
+        self.assertEqual(second["name"], "bill_2")
+        self.assertEqual(second["outputs"], ("json",))
+
+    def test_flags_are_parsed_strictly(self):
+        for value, expected in (("true", True), ("No", False), ("1", True), ("0", False), (False, False)):
+            self.assertIs(coerce_inputs({"fill_bsr_descriptions": value})["fill_bsr_descriptions"], expected)
+        with self.assertRaises(ValueError):
+            coerce_inputs({"fill_bsr_descriptions": "maybe"})
+
+    def test_duplicate_names_are_rejected(self):
+        path = self.write("manifest.json", json.dumps([{"workbook": "bill.xlsx", "name": "a"}] * 2))
+        with self.assertRaises(ValueError):
+            load_manifest(path)
+
+    def test_batch_run_writes_files_and_summary(self):
+        manifest = self.write("manifest.json", json.dumps({
+            "defaults": {"outputs": "json", "premium_percent": 4.0},
+            "bills": [
+                {"workbook": "bill.xlsx", "name": "good"},
+                {"workbook": "missing.xlsx", "name": "bad"}
+            ]
+        }))
+        out_dir = os.path.join(self.temp_dir, "out")
+        archive = os.path.join(self.temp_dir, "bills.zip")
+        stdout = io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            exit_code = main([manifest, "--out-dir", out_dir, "--jobs", "1", "--zip", archive])
+
+        summary = json.loads(stdout.getvalue())
+        self.assertEqual(exit_code, 1)
+        self.assertEqual((summary["total"], summary["succeeded"], summary["failed"]), (2, 1, 1))
+        self.assertEqual([bill["name"] for bill in summary["bills"]], ["good", "bad"])
+        self.assertEqual(summary["bills"][0]["files"], ["good.json"])
+        self.assertIn("FileNotFoundError", summary["bills"][1]["error"])
+        self.assertTrue(os.path.exists(os.path.join(out_dir, "good.json")))
+        with zipfile.ZipFile(archive) as z:
+            self.assertEqual(z.namelist(), ["good.json"])
+
+    def test_history_groups_bills_by_agreement(self):
+        shutil.copy(SAMPLE_FILE, os.path.join(self.temp_dir, "other.xlsx"))
+        path = self.write("manifest.json", json.dumps({"defaults": {"outputs": "json"}, "bills": [
+            {"workbook": "bill.xlsx", "name": "first"},
+            {"workbook": "other.xlsx", "name": "elsewhere", "agreement_no": "12/2025-26"},
+            {"workbook": "bill.xlsx", "name": "second"},
+            {"workbook": "missing.xlsx", "name": "bad"}
+        ]}))
+        entries = load_manifest(path)
+        groups = group_by_agreement(entries)
+        self.assertEqual([[entry["name"] for entry in group] for group in groups],
+                         [["first", "second"], ["elsewhere"], ["bad"]])
+
+        history_db = os.path.join(self.temp_dir, "history.sqlite3")
+        records = run_manifest(entries, os.path.join(self.temp_dir, "out"), jobs=2, history_db=history_db)
+        self.assertEqual([record["status"] for record in records], ["ok", "ok", "ok", "error"])
+        history = BillHistory(history_db)
+        self.assertEqual(history.previous_bill("48/2024-25")["bill_number"], "Second")
+        self.assertEqual(history.previous_bill("12/2025-26")["bill_number"], "First")
+
+if __name__ == '__main__':
+    unittest.main()
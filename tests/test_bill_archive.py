@@ -0,0 +1,106 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill
+from bill_archive import BillArchive, main
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class FakeClock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        self.time += 1
+        return self.time
+
+class TestBillArchive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        workbook = read_workbook(SAMPLE_FILE)
+        cls.first = compute_bill(*workbook, {"agreement_no": "1/2025", "contractor_name": "Alpha"})
+        cls.second = compute_bill(*workbook, {"agreement_no": "2/2025", "contractor_name": "Beta",
+                                              "premium_percent": 10.0})
+        cls.item_count = sum(1 for item in dict(cls.first)["First Page"]["items"] if "quantity" in item)
+        cls.amount = sum(
+            int(item["amount"]) for item in dict(cls.first)["First Page"]["items"] if "quantity" in item
+        )
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive = BillArchive(self.temp_dir, clock=FakeClock())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_empty_archive(self):
+        self.assertTrue(self.archive.read().empty)
+        self.assertTrue(self.archive.totals_by_contractor().empty)
+
+    def test_append_partitions_by_month(self):
+        self.archive.append(self.first, date(2025, 1, 15))
+        self.archive.append(self.second, date(2025, 3, 2))
+        self.assertEqual(self.archive.months(), ["2025-01", "2025-03"])
+
+        items = self.archive.read()
+        self.assertEqual(len(items), 2 * self.item_count)
+        self.assertEqual(set(items["month"]), {"2025-01", "2025-03"})
+        self.assertTrue(items["is_extra"].any())
+        self.assertEqual(len(self.archive.read(["amount"], start="2025-02")), self.item_count)
+
+    def test_bill_without_agreement_is_skipped(self):
+        sheets = compute_bill(*read_workbook(SAMPLE_FILE), {})
+        self.assertIsNone(self.archive.append(sheets))
+        self.assertEqual(self.archive.months(), [])
+
+    def test_aggregations(self):
+        self.archive.append(self.first, date(2025, 1, 15))
+        self.archive.append(self.second, date(2025, 1, 20))
+
+        by_contractor = self.archive.totals_by_contractor().set_index("contractor")
+        self.assertEqual(by_contractor.loc["Alpha", "amount"], self.amount)
+        self.assertEqual(by_contractor.loc["Alpha", "items"], self.item_count)
+        self.assertEqual(by_contractor.loc["Alpha", "bills"], 1)
+
+        by_month = self.archive.totals_by_month()
+        self.assertEqual(by_month["month"].tolist(), ["2025-01"])
+        self.assertEqual(by_month["bills"].tolist(), [2])
+
+        by_item = self.archive.totals_by_item()
+        self.assertEqual(by_item["amount"].sum(), 2 * self.amount)
+        self.assertTrue((by_item["bills"] == 2).all())
+
+        with self.assertRaises(ValueError):
+            self.archive.aggregate("agreement")
+
+    def test_regenerated_bill_replaces_earlier_copy(self):
+        self.archive.append(self.first, date(2025, 1, 15))
+        self.archive.append(self.first, date(2025, 1, 16))
+        self.assertEqual(len(self.archive.read()), self.item_count)
+        self.assertEqual(len(self.archive.read(latest_only=False)), 2 * self.item_count)
+
+        self.assertEqual(self.archive.compact("2025-01"), 2)
+        self.assertEqual(len(os.listdir(os.path.join(self.temp_dir, "month=2025-01"))), 1)
+        self.assertEqual(len(self.archive.read(latest_only=False)), self.item_count)
+        self.assertEqual(self.archive.read()["bill_date"].iloc[0], date(2025, 1, 16))
+
+    def test_report_cli(self):
+        self.archive.append(self.first, date(2025, 1, 15))
+        with patch("sys.stdout", new=StringIO()) as out:
+            self.assertEqual(main(["--by", "contractor", "--root", self.temp_dir]), 0)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "contractor,bills,items,quantity,amount")
+        self.assertTrue(lines[1].startswith("Alpha,1,"))
+
+if __name__ == '__main__':
+    unittest.main()
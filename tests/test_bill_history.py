@@ -0,0 +1,108 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from datetime import date
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill
+from bill_history import (
+    BillHistory, bill_header, bill_number_name, bill_serial_for, workbook_identity, next_bill_inputs
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class TestBillHistory(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sheets = read_workbook(SAMPLE_FILE)
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.history = BillHistory(os.path.join(self.temp_dir, "history.sqlite3"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_bill_number_names(self):
+        self.assertEqual(bill_number_name(1), "First")
+        self.assertEqual(bill_number_name(12), "Twelfth")
+        self.assertEqual(bill_serial_for("Third"), 3)
+        self.assertIsNone(bill_serial_for("Last"))
+        self.assertEqual(bill_serial_for("2"), 2)
+        self.assertEqual(bill_serial_for(" second "), 2)
+
+    def test_unrecognised_bill_number_is_rejected(self):
+        sheets = compute_bill(*self.sheets, {"bill_number": "Second (final)", "agreement_no": "48/2024-25"})
+        with self.assertRaises(ValueError):
+            bill_header(sheets)
+        with self.assertRaises(ValueError):
+            self.history.record_bill(sheets)
+        self.assertIsNone(self.history.previous_bill("48/2024-25"))
+
+    def test_workbook_identity(self):
+        identity = workbook_identity(self.sheets[0])
+        self.assertEqual(identity["agreement_no"], "48/2024-25")
+        self.assertEqual(identity["contractor_name"], "M/s Seema Electrical Udaipur")
+
+    def test_first_bill_has_no_history(self):
+        self.assertIsNone(self.history.previous_bill("48/2024-25"))
+        self.assertEqual(next_bill_inputs(None)["bill_number"], "First")
+
+    def test_record_and_carry_forward(self):
+        first = compute_bill(*self.sheets, {"premium_percent": 4.5}, history=self.history)
+        header = dict(first)["Note Sheet"]["header"]
+        self.assertEqual(header["agreement_no"], "48/2024-25")
+        self.assertEqual(header["bill_number"], "First")
+
+        bill_id = self.history.record_bill(first, bill_date=date(2025, 1, 31))
+        items = self.history.items(bill_id)
+        self.assertTrue(items)
+        self.assertTrue(any(item["is_extra"] for item in items))
+        self.assertEqual([item["position"] for item in items], list(range(len(items))))
+
+        previous = self.history.previous_bill("48/2024-25")
+        payable = dict(first)["Last Page"]["payable_amount"]
+        self.assertEqual(previous["payable_amount"], payable)
+        self.assertEqual(previous["contractor"], "M/s Seema Electrical Udaipur")
+
+        second = compute_bill(*self.sheets, {"premium_percent": 4.5}, history=self.history)
+        last_page = dict(second)["Last Page"]
+        self.assertEqual(last_page["amount_paid_last_bill"], payable)
+        header = dict(second)["Note Sheet"]["header"]
+        self.assertEqual(header["bill_number"], "Second")
+        self.assertEqual(header["last_bill"], "First Running Bill dated 2025-01-31")
+
+        # Explicit form values win over the history
+        third = compute_bill(*self.sheets, {"amount_paid_last_bill": 5, "bill_number": "First"}, history=self.history)
+        self.assertEqual(dict(third)["Last Page"]["amount_paid_last_bill"], 5)
+
+    def test_rerecording_replaces_the_bill(self):
+        sheets = compute_bill(*self.sheets, {}, history=self.history)
+        self.history.record_bill(sheets)
+        self.history.record_bill(sheets)
+        self.assertEqual(len(self.history.bills(agreement_no="48/2024-25")), 1)
+        self.assertEqual(len(self.history.bills(contractor="M/s Seema Electrical Udaipur")), 1)
+
+    def test_bill_without_agreement_is_not_recorded(self):
+        self.assertIsNone(self.history.record_bill(compute_bill(*self.sheets, {})))
+        self.assertEqual(self.history.bills(), [])
+
+    def test_previous_bill_uses_index(self):
+        with closing(sqlite3.connect(self.history.path)) as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM bills WHERE agreement_no = ? ORDER BY bill_serial DESC LIMIT 1",
+                ("48/2024-25",)
+            ).fetchall()
+        detail = " ".join(row[-1] for row in plan)
+        self.assertIn("USING INDEX", detail)
+        self.assertNotIn("TEMP B-TREE", detail)
+
+if __name__ == '__main__':
+    unittest.main()
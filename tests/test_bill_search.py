@@ -0,0 +1,88 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill
+from bill_history import with_identity
+from bill_search import BillSearchIndex, match_expression
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class TestBillSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workbook = read_workbook(SAMPLE_FILE)
+        cls.sheets = compute_bill(*cls.workbook, with_identity({}, cls.workbook[0]))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index = BillSearchIndex(os.path.join(self.temp_dir, "search.sqlite3"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def bill(self, agreement_no, contractor, bill_number="First"):
+        form = {"agreement_no": agreement_no, "contractor_name": contractor, "bill_number": bill_number}
+        return compute_bill(*self.workbook, with_identity(form, self.workbook[0]))
+
+    def test_match_expression(self):
+        self.assertEqual(match_expression("48/2024-25"), '"48/2024-25"*')
+        self.assertEqual(match_expression('seema OR "x'), '"seema" "OR" "x"*')
+        self.assertEqual(match_expression("seema", field="contractor", prefix=False), 'contractor : ("seema")')
+        self.assertIsNone(match_expression("  "))
+        with self.assertRaises(ValueError):
+            match_expression("seema", field="rate")
+
+    def test_search_header_fields_and_items(self):
+        self.index.index_bill(self.sheets, date(2025, 3, 3))
+        for query in ("48/2024-25", "Seema", "ambedkar hostel", "steel rope", "4.1.7", "Udai"):
+            response = self.index.search(query)
+            self.assertEqual(response["total"], 1, query)
+        result = self.index.search("seema")["results"][0]
+        self.assertEqual(result["agreement_no"], "48/2024-25")
+        self.assertEqual(result["bill_date"], "2025-03-03")
+        self.assertIn("[Seema]", result["snippet"])
+        self.assertEqual(self.index.search("tractor")["total"], 0)
+
+    def test_field_restriction(self):
+        self.index.index_bill(self.sheets)
+        self.assertEqual(self.index.search("seema", field="contractor")["total"], 1)
+        self.assertEqual(self.index.search("seema", field="items")["total"], 0)
+
+    def test_pagination(self):
+        for n in range(1, 26):
+            self.index.index_bill(self.bill(f"{n}/2025", f"Contractor {n}"))
+        first = self.index.search("contractor", page=1, per_page=10)
+        self.assertEqual((first["total"], first["pages"], len(first["results"])), (25, 3, 10))
+        last = self.index.search("contractor", page=3, per_page=10)
+        self.assertEqual(len(last["results"]), 5)
+        seen = {result["agreement_no"] for page in (1, 2, 3)
+                for result in self.index.search("contractor", page=page, per_page=10)["results"]}
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(self.index.search("contractor", page=4, per_page=10)["results"], [])
+
+    def test_incremental_updates(self):
+        self.index.index_bill(self.bill("7/2025", "Old Name"))
+        self.index.index_bill(self.bill("7/2025", "New Name"))
+        self.assertEqual(self.index.search("old name")["total"], 0)
+        self.assertEqual(self.index.search("new name")["total"], 1)
+
+        self.index.index_bill(self.bill("7/2025", "New Name", "Second"))
+        self.assertEqual(self.index.search("7/2025")["total"], 2)
+        self.assertTrue(self.index.remove("7/2025", 1))
+        self.assertFalse(self.index.remove("7/2025", 1))
+        self.assertEqual([r["bill_number"] for r in self.index.search("7/2025")["results"]], ["Second"])
+
+    def test_bill_without_agreement_is_not_indexed(self):
+        self.assertIsNone(self.index.index_bill(compute_bill(*self.workbook, {})))
+        self.assertEqual(self.index.search("seema")["total"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
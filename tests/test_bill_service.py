@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import requests
+import uvicorn
+
+# Add the parent directory to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from bill_service import BillService, create_app
+
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TestBillService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = BillService(render_workers=2, timeout=30, compute_executor=ThreadPoolExecutor(2))
+        port = free_port()
+        cls.server = uvicorn.Server(uvicorn.Config(create_app(cls.service), host="127.0.0.1", port=port, log_level="warning"))
+        cls.thread = threading.Thread(target=cls.server.run, daemon=True)
+        cls.thread.start()
+        while not cls.server.started:
+            time.sleep(0.01)
+        cls.url = f"http://127.0.0.1:{port}"
+        with open(SAMPLE_FILE, "rb") as f:
+            cls.workbook = f.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.should_exit = True
+        cls.thread.join(10)
+
+    def post_bill(self, path, inputs, **params):
+        return requests.post(
+            f"{self.url}{path}", params=params, timeout=30,
+            files={"workbook": ("bill.xlsx", self.workbook)}, data={"inputs": json.dumps(inputs)}
+        )
+
+    def test_process_returns_sheet_data(self):
+        response = self.post_bill("/process", {"premium_percent": 4.0, "bill_type": "Final Bill"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Deviation Statement", response.json())
+
+    def test_single_output_is_returned_directly(self):
+        response = self.post_bill("/bill", {"outputs": "json", "start_date": "01-01-2025"}, name="b1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertIn('filename="b1.json"', response.headers["content-disposition"])
+        self.assertIn("First Page", response.json())
+
+    def test_several_outputs_are_streamed_as_zip(self):
+        response = self.post_bill("/bill", {}, outputs="word,json")
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(archive.namelist(), ["contractor_bill_first_page.docx", "contractor_bill.json"])
+
+    def test_render_html_from_processed_data(self):
+        sheets = self.post_bill("/process", {"premium_percent": 4.0}).json()
+        response = requests.post(f"{self.url}/render", timeout=30, json={
+            "sheet": "First Page", "format": "html", "data": sheets["First Page"]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("<table", response.text)
+
+        unknown = requests.post(f"{self.url}/render", json={"sheet": "Cover", "data": {}, "format": "html"}, timeout=30)
+        self.assertEqual(unknown.status_code, 404)
+
+    def test_metrics_and_health(self):
+        self.assertEqual(self.post_bill("/bill", {"outputs": "json"}).status_code, 200)
+        metrics = requests.get(f"{self.url}/metrics", timeout=30)
+        self.assertEqual(metrics.status_code, 200)
+        self.assertIn('bill_generated_total{status="done"}', metrics.text)
+        self.assertIn('bill_stage_duration_seconds_count{stage="compute"}', metrics.text)
+
+        self.assertEqual(requests.get(f"{self.url}/healthz", timeout=30).status_code, 200)
+        ready = requests.get(f"{self.url}/readyz", timeout=30)
+        self.assertEqual(ready.status_code, 200 if ready.json()["ready"] else 503)
+        self.assertTrue(ready.json()["checks"]["templates"]["ok"])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.post_bill("/bill", {}, outputs="xml").status_code, 400)
+        self.assertEqual(requests.post(f"{self.url}/bill", timeout=30).status_code, 400)
+        self.assertEqual(requests.post(f"{self.url}/render", json={"sheet": "First Page"}, timeout=30).status_code, 400)
+
+    def test_timeout(self):
+        self.service.timeout = 0.05
+        try:
+            with patch("bill_service.compute_sheets", side_effect=lambda *args: time.sleep(0.5)):
+                response = self.post_bill("/process", {})
+        finally:
+            self.service.timeout = 30
+        self.assertEqual(response.status_code, 504)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill
+from bsr_schedule import (
+    BsrSchedule, load_schedule, normalize_unit, UNKNOWN_CODE, RATE_MISMATCH, UNIT_MISMATCH
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+SCHEDULE = pd.DataFrame({
+    "code": ["1.5.1", "1.5.2", "1.5.3", "9.9"],
+    "description": ["Short point", "Medium point", "Long point", "Surface conduit"],
+    "unit": ["P.Point", "P. point", "Each", "Mtr."],
+    "rate": ["256", "450", "662", "120"]
+})
+
+class TestBsrSchedule(unittest.TestCase):
+    def setUp(self):
+        self.schedule = BsrSchedule(SCHEDULE)
+
+    def test_lookup(self):
+        self.assertEqual(len(self.schedule), 4)
+        self.assertIn(" 1.5.1", self.schedule)
+        self.assertEqual(self.schedule.get("9.9")["schedule_rate"], 120)
+        self.assertIsNone(self.schedule.get("7.1"))
+        self.assertEqual(normalize_unit("P. point"), normalize_unit("p.Point"))
+
+    def test_duplicate_codes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            BsrSchedule(pd.concat([SCHEDULE, SCHEDULE.iloc[:1]]))
+
+    def test_validate_items(self):
+        items = [
+            {"serial_no": "1", "description": "Heading", "unit": "", "quantity": 0, "rate": 0, "remark": "1.5"},
+            {"serial_no": "", "description": "a", "unit": "P. point", "quantity": 5, "rate": 256, "remark": "1.5.1"},
+            {"serial_no": "", "description": "b", "unit": "P. point", "quantity": 5, "rate": 472, "remark": "1.5.2"},
+            {"serial_no": "", "description": "c", "unit": "P. point", "quantity": 5, "rate": 662, "remark": "1.5.3"},
+            {"description": "Extra Items", "is_divider": True},
+            {"serial_no": "E-01", "description": "d", "unit": "Each", "quantity": 1, "rate": 10, "remark": ""}
+        ]
+        deviations = self.schedule.validate_items(items)
+        self.assertEqual(
+            [(d["position"], d["kind"]) for d in deviations],
+            [(0, UNKNOWN_CODE), (2, RATE_MISMATCH), (3, UNIT_MISMATCH)]
+        )
+        rate = deviations[1]
+        self.assertEqual((rate["rate"], rate["schedule_rate"], rate["difference"]), (472, 450, 22))
+        self.assertAlmostEqual(rate["difference_percent"], 4.89)
+        # Within tolerance
+        self.assertEqual(len(self.schedule.validate_items(items, tolerance=0.05)), 2)
+
+    def test_fill_descriptions(self):
+        items = [{"description": "", "remark": "9.9"}, {"description": "Kept", "remark": "1.5.1"},
+                 {"description": "", "remark": "7.1"}]
+        self.assertEqual(self.schedule.fill_descriptions(items), 1)
+        self.assertEqual([item["description"] for item in items], ["Surface conduit", "Kept", ""])
+
+    def test_load_schedule_files(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "bsr.csv")
+            SCHEDULE.rename(columns={"code": "BSR No.", "description": "Particulars"}).to_csv(path, index=False)
+            self.assertEqual(load_schedule(path).get("1.5.2")["schedule_description"], "Medium point")
+            path = os.path.join(temp_dir, "bsr.xlsx")
+            SCHEDULE.to_excel(path, index=False)
+            self.assertEqual(len(load_schedule(path)), 4)
+            SCHEDULE.drop(columns="rate").to_csv(os.path.join(temp_dir, "bad.csv"), index=False)
+            with self.assertRaises(ValueError):
+                load_schedule(os.path.join(temp_dir, "bad.csv"))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_compute_bill_reports_deviations(self):
+        sheets = dict(compute_bill(*read_workbook(SAMPLE_FILE), {}, schedule=self.schedule))
+        validation = sheets["First Page"]["bsr_validation"]
+        self.assertGreater(validation["checked"], 30)
+        kinds = {(d["bsr"], d["kind"]) for d in validation["deviations"]}
+        self.assertIn(("1.5.2", RATE_MISMATCH), kinds)
+        self.assertIn(("1.5.3", UNIT_MISMATCH), kinds)
+        self.assertNotIn("1.5.1", {d["bsr"] for d in validation["deviations"]})
+
+if __name__ == '__main__':
+    unittest.main()
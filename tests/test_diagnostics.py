@@ -0,0 +1,81 @@
+import io
+import json
+import logging
+import os
+import sys
+import unittest
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diagnostics import ROOT_LOGGER, configure_logging, get_logger
+from bill_pipeline import compute_bill
+
+class TestDiagnostics(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger(ROOT_LOGGER)
+        self.saved = root.level, list(root.handlers), root.propagate
+        for handler in self.saved[1]:
+            root.removeHandler(handler)
+        self.stream = io.StringIO()
+        self.log = get_logger("bill.test")
+
+    def tearDown(self):
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.level, handlers, root.propagate = self.saved
+        for handler in handlers:
+            root.addHandler(handler)
+
+    def lines(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_lines(self):
+        configure_logging("INFO", self.stream)
+        self.log.info("bill_saved", name="Bill 1", rows=3)
+        self.log.debug("hidden")
+        [line] = self.lines()
+        self.assertEqual(line["event"], "bill_saved")
+        self.assertEqual(line["level"], "INFO")
+        self.assertEqual(line["logger"], "bill.test")
+        self.assertEqual((line["name"], line["rows"]), ("Bill 1", 3))
+
+    def test_lazy_fields_only_evaluated_when_enabled(self):
+        configure_logging("WARNING", self.stream)
+        calls = []
+        self.log.debug("sheet_sample", rows=lambda: calls.append("debug") or "dump")
+        self.assertEqual(calls, [])
+        configure_logging("DEBUG")
+        self.log.debug("sheet_sample", rows=lambda: calls.append("debug") or "dump")
+        self.assertEqual(calls, ["debug"])
+        self.assertEqual(self.lines()[0]["rows"], "dump")
+
+    def test_exception(self):
+        configure_logging("INFO", self.stream)
+        try:
+            raise ValueError("bad sheet")
+        except ValueError:
+            self.log.exception("process_bill_failed", sheet="Work Order")
+        [line] = self.lines()
+        self.assertEqual(line["level"], "ERROR")
+        self.assertIn("ValueError: bad sheet", line["exception"])
+
+    def test_process_bill_failure_is_logged_and_raised(self):
+        configure_logging("INFO", self.stream)
+        with self.assertRaises(AttributeError):
+            compute_bill(None, None, None, {})
+        [line] = self.lines()
+        self.assertEqual((line["event"], line["logger"]), ("process_bill_failed", "bill.utils"))
+        self.assertIn("AttributeError", line["exception"])
+
+    def test_configure_is_idempotent(self):
+        configure_logging("INFO", self.stream)
+        configure_logging("ERROR", self.stream)
+        root = logging.getLogger(ROOT_LOGGER)
+        self.assertEqual(len(root.handlers), 1)
+        self.assertEqual(root.level, logging.ERROR)
+        self.assertFalse(root.propagate)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import os
+import sys
+import shutil
+import tempfile
+import io
+import threading
+import unittest
+from datetime import date
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import (JobStore, WorkerPool, PermanentJobError, bill_job_handler, DEFAULT_RENDER_TIMEOUT,
+                       QUEUED, RUNNING, DONE, FAILED)
+from state_store import SQLiteStateStore
+from bill_history import BillHistory
+from bill_archive import BillArchive
+from bill_search import BillSearchIndex
+from synthetic_workbook import make_sheets
+from workspace import WorkspaceManager
+from bill_pipeline import read_workbook
+
+class FakeClock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.store = JobStore(os.path.join(self.temp_dir, "jobs.sqlite3"), max_attempts=2, retry_delay=5,
+                              clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_job_lifecycle(self):
+        job_id = self.store.submit({"form": {"start_date": date(2025, 1, 1)}}, input_data=b"xlsx")
+        self.assertEqual(self.store.get(job_id)["status"], QUEUED)
+
+        job = self.store.claim()
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["input"], b"xlsx")
+        self.assertEqual(job["params"]["form"]["start_date"], date(2025, 1, 1))
+        self.assertEqual(self.store.get(job_id)["status"], RUNNING)
+        self.assertIsNone(self.store.claim())
+
+        self.store.complete(job_id, {"bill.pdf": b"%PDF", "bill.json": b"{}"})
+        self.assertEqual(self.store.get(job_id)["status"], DONE)
+        self.assertEqual(list(self.store.results(job_id)), ["bill.pdf", "bill.json"])
+
+    def test_failed_jobs_retry_with_backoff(self):
+        job_id = self.store.submit({})
+        self.assertEqual(self.store.fail(self.store.claim()["id"], "boom"), QUEUED)
+        # Not available until the retry delay has passed
+        self.assertIsNone(self.store.claim())
+        self.clock.time += 5
+        self.assertEqual(self.store.claim()["attempts"], 2)
+        self.assertEqual(self.store.fail(job_id, "boom again"), FAILED)
+        self.assertEqual(self.store.get(job_id)["error"], "boom again")
+
+    def test_fail_after_job_was_deleted(self):
+        job_id = self.store.submit({})
+        self.store.claim()
+        self.store.complete(job_id, {})
+        self.clock.time += 60
+        self.store.purge(0)
+        self.assertIsNone(self.store.fail(job_id, "boom"))
+        self.assertIsNone(self.store.get(job_id))
+
+    def test_requeue_stale_jobs(self):
+        job_id = self.store.submit({})
+        self.store.claim()
+        self.clock.time += 60
+        self.assertEqual(self.store.requeue_stale(30), 1)
+        self.assertEqual(self.store.get(job_id)["status"], QUEUED)
+
+    def test_worker_pool_runs_each_job_once(self):
+        store = JobStore(os.path.join(self.temp_dir, "pool.sqlite3"))
+        seen, lock = [], threading.Lock()
+
+        def handler(job):
+            with lock:
+                seen.append(job["id"])
+            return {"out.txt": job["params"]["n"].to_bytes(1, "big")}
+
+        job_ids = [store.submit({"n": n}) for n in range(10)]
+        pool = WorkerPool(store, handler, workers=3, poll_interval=0.01).start()
+        try:
+            for _ in range(500):
+                if all(store.get(job_id)["status"] == DONE for job_id in job_ids):
+                    break
+                threading.Event().wait(0.01)
+        finally:
+            pool.stop()
+        self.assertEqual(sorted(seen), sorted(job_ids))
+        self.assertEqual(store.results(job_ids[7]), {"out.txt": b"\x07"})
+
+    def test_worker_pool_stores_job_timing(self):
+        def handler(job):
+            with job["timer"].stage("compute"):
+                pass
+            return {"out.txt": b"ok"}
+
+        job_id = self.store.submit({})
+        self.assertTrue(WorkerPool(self.store, handler).run_once())
+        timing = self.store.timing(job_id)
+        self.assertEqual([entry["stage"] for entry in timing["stages"]], ["compute"])
+        self.assertGreaterEqual(timing["total_seconds"], timing["stages"][0]["seconds"])
+
+    def test_on_complete_runs_once_after_success(self):
+        recorded, attempts = [], []
+
+        def handler(job):
+            attempts.append(job["id"])
+            job["on_complete"].append(lambda: recorded.append(job["id"]))
+            if len(attempts) == 1:
+                raise RuntimeError("renderer crashed")
+            return {"out.txt": b"ok"}
+
+        job_id = self.store.submit({})
+        pool = WorkerPool(self.store, handler)
+        pool.run_once()
+        self.assertEqual((self.store.get(job_id)["status"], recorded), (QUEUED, []))
+        self.clock.time += 60
+        pool.run_once()
+        self.assertEqual((self.store.get(job_id)["status"], recorded), (DONE, [job_id]))
+
+    def test_input_errors_are_not_retried(self):
+        def handler(job):
+            raise PermanentJobError("bad workbook")
+
+        job_id = self.store.submit({})
+        WorkerPool(self.store, handler).run_once()
+        job = self.store.get(job_id)
+        self.assertEqual((job["status"], job["attempts"]), (FAILED, 1))
+
+        job_id = self.store.submit({"form": {}, "outputs": ["json"]}, input_data=b"not a workbook")
+        WorkerPool(self.store, bill_job_handler()).run_once()
+        job = self.store.get(job_id)
+        self.assertEqual((job["status"], job["attempts"]), (FAILED, 1))
+
+    def test_bill_handler_renders_from_workspace_with_timeout(self):
+        workbook = io.BytesIO()
+        with pd.ExcelWriter(workbook, engine="openpyxl") as writer:
+            for name, sheet in make_sheets(20).items():
+                sheet.to_excel(writer, sheet_name=name, index=False, header=False)
+        workspaces = WorkspaceManager(os.path.join(self.temp_dir, "workspaces"))
+        job_id = self.store.submit({"form": {}, "outputs": ["json"]}, input_data=workbook.getvalue())
+
+        with patch("job_queue.read_workbook", wraps=read_workbook) as reader, \
+                patch("job_queue.generate_outputs", return_value={"bill.json": b"{}"}) as generate:
+            WorkerPool(self.store, bill_job_handler(), workspaces=workspaces).run_once()
+        self.assertEqual(self.store.get(job_id)["status"], DONE)
+        self.assertTrue(reader.call_args.args[0].endswith("input.xlsx"))
+        self.assertEqual(generate.call_args.kwargs["timeout"], DEFAULT_RENDER_TIMEOUT)
+
+    def test_bill_without_agreement_skips_bill_number_check(self):
+        """Bills that are never filed may carry any bill number"""
+        sheets = make_sheets(20)
+        sheets["Work Order"].iloc[12, 4] = np.nan
+        workbook = io.BytesIO()
+        with pd.ExcelWriter(workbook, engine="openpyxl") as writer:
+            for name, sheet in sheets.items():
+                sheet.to_excel(writer, sheet_name=name, index=False, header=False)
+
+        history = BillHistory(os.path.join(self.temp_dir, "history.sqlite3"))
+        archive = BillArchive(os.path.join(self.temp_dir, "archive"))
+        search_index = BillSearchIndex(os.path.join(self.temp_dir, "search.sqlite3"))
+        handler = bill_job_handler(history=history, archive=archive, search_index=search_index)
+        job_id = self.store.submit({"form": {"bill_number": "Second (final)"}, "outputs": ["json"]},
+                                   input_data=workbook.getvalue())
+        with self.assertNoLogs("bill.jobs", level="ERROR"):
+            WorkerPool(self.store, handler).run_once()
+        self.assertEqual(self.store.get(job_id)["status"], DONE)
+        self.assertEqual(archive.months(), [])
+
+    def test_cleanup_purges_old_jobs(self):
+        done = self.store.submit({})
+        self.store.claim()
+        self.store.complete(done, {"out.pdf": b"%PDF"})
+        self.clock.time += 2 * 3600
+        recent = self.store.submit({})
+        self.store.claim()
+        self.store.complete(recent, {"out.pdf": b"%PDF"})
+        queued = self.store.submit({})
+
+        pool = WorkerPool(self.store, lambda job: {}, retention=3600)
+        pool.cleanup()
+        self.assertIsNone(self.store.get(done))
+        self.assertEqual(self.store.results(done), {})
+        self.assertEqual(self.store.get(recent)["status"], DONE)
+        self.assertEqual(self.store.get(queued)["status"], QUEUED)
+
+    def test_cleanup_purges_expired_state(self):
+        state = SQLiteStateStore(os.path.join(self.temp_dir, "state.sqlite3"), clock=self.clock)
+        state.put("forms", "old", b"{}", ttl=60)
+        state.put("forms", "kept", b"{}")
+        self.clock.time += 120
+        WorkerPool(self.store, lambda job: {}, state_store=state).cleanup()
+        # Nothing left for another purge
+        self.assertEqual(state.purge_expired(), 0)
+        self.assertEqual(state.keys("forms"), ["kept"])
+
+if __name__ == '__main__':
+    unittest.main()
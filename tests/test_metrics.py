@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobStore
+from metrics import Counters, MetricsServer, BILLS_GENERATED, CACHE_REQUESTS, CACHE_MISSES, readiness, render_metrics
+from stage_timing import StageMetrics
+from workspace import WorkspaceManager
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = JobStore(os.path.join(self.temp_dir, "jobs.sqlite3"))
+        self.workspaces = WorkspaceManager(os.path.join(self.temp_dir, "workspaces"))
+        self.renderer = os.path.join(self.temp_dir, "wkhtmltopdf")
+        with open(self.renderer, "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(self.renderer, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_prometheus_text(self):
+        counters = Counters()
+        counters.inc(BILLS_GENERATED, status="done")
+        counters.inc(CACHE_REQUESTS, 4, cache="bill")
+        counters.inc(CACHE_MISSES, cache="bill")
+        stages = StageMetrics(buckets=(1.0,))
+        stages.observe("wkhtmltopdf", 0.5)
+        stages.observe("wkhtmltopdf", 2.0, error=True)
+        self.store.submit({})
+
+        text = render_metrics(self.store, self.workspaces, self.renderer, counters=counters, stage_metrics=stages)
+        lines = text.splitlines()
+        self.assertIn("# TYPE bill_stage_duration_seconds histogram", lines)
+        self.assertIn('bill_generated_total{status="done"} 1', lines)
+        self.assertIn('bill_cache_hit_ratio{cache="bill"} 0.75', lines)
+        self.assertIn('bill_stage_duration_seconds_bucket{stage="wkhtmltopdf",le="1.0"} 1', lines)
+        self.assertIn('bill_stage_duration_seconds_bucket{stage="wkhtmltopdf",le="+Inf"} 2', lines)
+        self.assertIn('bill_stage_duration_seconds_sum{stage="wkhtmltopdf"} 2.5', lines)
+        self.assertIn("bill_renderer_failures_total 1", lines)
+        self.assertIn('bill_jobs{status="queued"} 1', lines)
+        self.assertIn("bill_workspaces 0", lines)
+        self.assertIn("bill_ready 1", lines)
+
+    def test_readiness_checks(self):
+        ready, checks = readiness(self.store, self.renderer)
+        self.assertTrue(ready)
+        self.assertEqual(sorted(checks), ["job_store", "renderer", "templates"])
+
+        os.chmod(self.renderer, 0o644)
+        ready, checks = readiness(wkhtmltopdf_path=self.renderer, template_dir=self.temp_dir)
+        self.assertFalse(ready)
+        self.assertFalse(checks["renderer"]["ok"])
+        self.assertIn("first_page.html", checks["templates"]["detail"])
+
+    def test_server_endpoints(self):
+        server = MetricsServer("127.0.0.1", 0, job_store=self.store, wkhtmltopdf_path=self.renderer).start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+                self.assertIn(b"bill_ready 1", response.read())
+            with urllib.request.urlopen(f"{url}/readyz", timeout=10) as response:
+                self.assertEqual(json.loads(response.read())["status"], "ok")
+
+            os.chmod(self.renderer, 0o644)
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(f"{url}/readyz", timeout=10)
+            self.assertEqual(raised.exception.code, 503)
+            with urllib.request.urlopen(f"{url}/healthz", timeout=10) as response:
+                self.assertFalse(json.loads(response.read())["ready"])
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import io
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+from docx import Document
+
+# Add the parent directory to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from output_plan import parse_outputs, plan_stages
+from bill_pipeline import read_workbook, compute_bill, generate_outputs
+
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class TestOutputPlan(unittest.TestCase):
+    def test_parse_outputs(self):
+        self.assertEqual(parse_outputs(None), ("combined_pdf",))
+        self.assertEqual(parse_outputs("json, word"), ("word", "json"))
+        with self.assertRaises(ValueError):
+            parse_outputs(["combined_pdf", "xml"])
+        with self.assertRaises(ValueError):
+            parse_outputs([])
+
+    def test_stage_selection(self):
+        self.assertEqual(plan_stages(["combined_pdf"]), ["render_pdf", "merge_pdf"])
+        self.assertEqual(plan_stages(["sheet_pdfs"]), ["render_pdf", "sheet_pdfs"])
+        self.assertEqual(plan_stages(["word", "json"]), ["word", "json"])
+
+class TestGenerateOutputs(unittest.TestCase):
+    def setUp(self):
+        ws_wo, ws_bq, ws_extra = read_workbook(SAMPLE_FILE)
+        self.sheets = compute_bill(ws_wo, ws_bq, ws_extra, {"bill_type": "Final Bill", "premium_percent": 4.0})
+
+    def test_unrequested_stages_are_skipped(self):
+        """Asking for Word and JSON never starts the PDF renderer"""
+        with patch("bill_pipeline.render_sheet_pdfs", side_effect=AssertionError("renderer called")):
+            artifacts = generate_outputs(self.sheets, ["word", "json"], name="bill")
+        self.assertEqual(list(artifacts), ["bill_first_page.docx", "bill.json"])
+
+        data = json.loads(artifacts["bill.json"])
+        self.assertIn("Deviation Statement", data)
+        self.assertGreater(len(data["First Page"]["items"]), 0)
+
+    def test_pdf_outputs_use_rendered_sheets(self):
+        rendered = [(name, [b"%PDF"]) for name, _ in self.sheets]
+        with patch("bill_pipeline.render_sheet_pdfs", return_value=rendered) as render, \
+                patch("bill_pipeline.merge_pdf_bytes", side_effect=lambda pdfs, **kwargs: b"".join(pdfs)):
+            artifacts = generate_outputs(self.sheets, ["combined_pdf", "sheet_pdfs"], name="bill")
+        render.assert_called_once()
+        self.assertEqual(artifacts["bill.pdf"], b"%PDF" * len(self.sheets))
+        self.assertIn("bill_first_page.pdf", artifacts)
+
+    def test_word_export_without_extra_items(self):
+        """The "No Extra Items" placeholder row has no quantity, rate or serial number"""
+        no_extra = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- NO EXTRA ITEMS.xlsx")
+        sheets = compute_bill(*read_workbook(no_extra), {"premium_percent": 4.0})
+        self.assertIn("No Extra Items", [item.get("description") for item in dict(sheets)["First Page"]["items"]])
+        artifacts = generate_outputs(sheets, ["word", "json"], name="bill")
+        table = Document(io.BytesIO(artifacts["bill_first_page.docx"])).tables[-1]
+        self.assertEqual([cell.text for cell in table.rows[-1].cells], ["", "No Extra Items", "", "", "", "0.00", ""])
+
+    def test_word_errors_are_raised(self):
+        """A failed Word export fails the generation instead of returning an empty document"""
+        sheets = [(name, dict(data, items=[{"quantity": "two"}]) if name == "First Page" else data)
+                  for name, data in self.sheets]
+        with self.assertRaises(ValueError):
+            generate_outputs(sheets, ["word"], name="bill")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+from jinja2 import Environment, FileSystemLoader
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pagination import FIRST_PAGE_LAYOUT, paginate_items, paginate_sheet
+from pdf_pipeline import render_sheet_html
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+def make_items(count):
+    return [
+        {"serial_no": str(i + 1), "description": "Wiring point " * (i % 5 + 1), "unit": "Nos",
+         "quantity": 2.0, "rate": 100, "amount": 200, "remark": "", "is_divider": False}
+        for i in range(count)
+    ]
+
+class TestPagination(unittest.TestCase):
+    def test_small_bill_is_one_page(self):
+        pages = paginate_items(make_items(5), FIRST_PAGE_LAYOUT)
+        self.assertEqual(len(pages), 1)
+        self.assertTrue(pages[0]["is_first"] and pages[0]["is_last"])
+        self.assertIsNone(pages[0]["brought_forward"])
+        self.assertIsNone(pages[0]["carried_forward"])
+
+    def test_subtotals_carry_forward(self):
+        items = make_items(2000)
+        pages = paginate_items(items, FIRST_PAGE_LAYOUT, header_rows=19)
+        self.assertGreater(len(pages), 10)
+        self.assertEqual(sum(len(page["items"]) for page in pages), len(items))
+        for previous, page in zip(pages, pages[1:]):
+            self.assertEqual(previous["carried_forward"], page["brought_forward"])
+        self.assertEqual(pages[-1]["brought_forward"]["amount"] + 200 * len(pages[-1]["items"]), 200 * len(items))
+
+    def test_divider_rows_do_not_break_totals(self):
+        items = make_items(300) + [{"description": "Extra Items", "is_divider": True}] + make_items(300)
+        pages = paginate_items(items, FIRST_PAGE_LAYOUT)
+        self.assertEqual(pages[-1]["brought_forward"]["amount"] + sum(i.get("amount", 0) for i in pages[-1]["items"]), 200 * 600)
+
+    def test_other_sheets_unchanged(self):
+        data = {"items": make_items(2000)}
+        self.assertEqual(paginate_sheet("Extra Items", data), [data])
+
+    def test_chunks_render_independently(self):
+        env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+        data = {
+            "header": [["1", "Agreement No.", "48/2024-25"]],
+            "items": make_items(400),
+            "totals": {"grand_total": 80000, "premium": {"percent": 0.04, "amount": 3200}},
+            "amount_paid_last_bill": 0
+        }
+        chunks = paginate_sheet("First Page", data)
+        self.assertGreater(len(chunks), 2)
+
+        first, middle, last = (render_sheet_html(env, "First Page", chunk) for chunk in (chunks[0], chunks[1], chunks[-1]))
+        self.assertIn("48/2024-25", first)
+        self.assertNotIn("48/2024-25", middle)
+        self.assertIn("Brought forward from page 1", middle)
+        self.assertIn("Carried forward to page 3", middle)
+        self.assertNotIn("Net Payable Amount", middle)
+        self.assertIn("Net Payable Amount", last)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import sys
+import tempfile
+import shutil
+import unittest
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_merger import StreamingPdfMerger
+
+def make_pdf(pages, label="Page"):
+    """Build an uncompressed PDF in memory with the given number of pages."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pageCompression=0)
+    for i in range(pages):
+        pdf.drawString(100, 750, f"{label} {i + 1}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+class TestStreamingPdfMerger(unittest.TestCase):
+    def test_append_counts_pages(self):
+        merger = StreamingPdfMerger()
+        self.assertEqual(merger.append(make_pdf(2)), 2)
+        self.assertEqual(merger.append(make_pdf(1)), 1)
+        self.assertEqual((merger.document_count, merger.page_count), (2, 3))
+
+    def test_pages_kept_in_order(self):
+        merger = StreamingPdfMerger()
+        merger.append(make_pdf(1, "First"))
+        merger.append(make_pdf(1, "Second"))
+        reader = PdfReader(io.BytesIO(merger.getvalue()))
+        self.assertIn("First", reader.pages[0].extract_text())
+        self.assertIn("Second", reader.pages[1].extract_text())
+
+    def test_shared_resources_are_deduplicated(self):
+        """Merging many documents with the same fonts is smaller than a merge that keeps every copy"""
+        documents = [make_pdf(3) for _ in range(8)]
+        compact, plain = StreamingPdfMerger(), StreamingPdfMerger(deduplicate=False)
+        for document in documents:
+            compact.append(document)
+            plain.append(document)
+        self.assertLess(len(compact.getvalue()), len(plain.getvalue()))
+
+    def test_accepts_paths(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            pdf_path = os.path.join(temp_dir, "sheet.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(make_pdf(2))
+            output_path = os.path.join(temp_dir, "combined.pdf")
+
+            merger = StreamingPdfMerger()
+            merger.append(pdf_path)
+            merger.write(output_path)
+            self.assertEqual(len(PdfReader(output_path).pages), 2)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_empty_merge(self):
+        with self.assertRaises(ValueError):
+            StreamingPdfMerger().getvalue()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import io
+import os
+import stat
+import sys
+import tempfile
+import shutil
+import time
+import unittest
+from jinja2 import DictLoader, Environment
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_pipeline import build_wkhtmltopdf_args, render_pdf_bytes, render_sheet_pdfs, merge_pdf_bytes
+
+def make_pdf(pages):
+    """Build a small PDF in memory with the given number of pages."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for i in range(pages):
+        pdf.drawString(100, 750, f"Page {i + 1}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+class TestPdfPipeline(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_build_args(self):
+        """Bare flags have no value; other options are followed by their value"""
+        args = build_wkhtmltopdf_args({"page-size": "A4", "quiet": "", "no-outline": None, "dpi": 300})
+        self.assertEqual(args, ["--page-size", "A4", "--quiet", "--no-outline", "--dpi", "300"])
+
+    def test_render_uses_stdin_and_stdout(self):
+        """HTML is piped to the renderer and the PDF is read back without temp files"""
+        fake = os.path.join(self.temp_dir, "wkhtmltopdf")
+        with open(fake, "w") as f:
+            f.write(f"#!{sys.executable}\n"
+                    "import sys\n"
+                    "assert sys.argv[-2:] == ['-', '-']\n"
+                    "sys.stdout.buffer.write(b'%PDF-1.4\\n' + sys.stdin.buffer.read())\n")
+        os.chmod(fake, os.stat(fake).st_mode | stat.S_IEXEC)
+
+        pdf_bytes = render_pdf_bytes("<p>Bill</p>", options={}, wkhtmltopdf_path=fake)
+        self.assertEqual(pdf_bytes, b"%PDF-1.4\n<p>Bill</p>")
+        self.assertEqual(os.listdir(self.temp_dir), ["wkhtmltopdf"])
+
+    def test_render_failure(self):
+        """A renderer that produces no PDF raises an error"""
+        with self.assertRaises(RuntimeError):
+            render_pdf_bytes("<p>Bill</p>", options={}, wkhtmltopdf_path=shutil.which("true"))
+
+    def test_render_timeout_kills_the_renderer(self):
+        """Renderers still running when the timeout expires are killed"""
+        fake = os.path.join(self.temp_dir, "wkhtmltopdf")
+        with open(fake, "w") as f:
+            f.write(f"#!{sys.executable}\nimport time\ntime.sleep(30)\n")
+        os.chmod(fake, os.stat(fake).st_mode | stat.S_IEXEC)
+        env = Environment(loader=DictLoader({"cover.html": "<p>{{ title }}</p>"}))
+
+        start = time.monotonic()
+        with self.assertRaises(RuntimeError):
+            render_sheet_pdfs(env, [("Cover", {"title": "Bill"})], wkhtmltopdf_path=fake, timeout=0.5)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_merge_pdf_bytes(self):
+        """Pages from all buffers end up in one document, in order"""
+        merged = merge_pdf_bytes([make_pdf(2), make_pdf(3)])
+        reader = PdfReader(io.BytesIO(merged))
+        self.assertEqual(len(reader.pages), 5)
+        self.assertIn("Page 1", reader.pages[2].extract_text())
+
+    def test_merge_nothing(self):
+        with self.assertRaises(ValueError):
+            merge_pdf_bytes([])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the benchmarks directory to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import pipeline_benchmark
+from pipeline_benchmark import run_scenario
+from regression_gate import REGRESSED, compare
+from synthetic_workbook import write_workbook
+
+class TestPipelineBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.workbook = os.path.join(self.temp_dir, "bill.xlsx")
+        write_workbook(self.workbook, 30)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stages(self):
+        stages = run_scenario(self.workbook, ("parse", "compute", "word", "json", "zip"))
+        self.assertEqual([stage["stage"] for stage in stages], ["parse", "compute", "word", "json", "zip"])
+        self.assertEqual({stage["status"] for stage in stages}, {"ok"})
+
+    def test_failed_stage_skips_the_stages_that_need_it(self):
+        with patch.object(pipeline_benchmark, "compute_bill", side_effect=MemoryError("too big")):
+            stages = run_scenario(self.workbook, ("parse", "compute", "render", "json"), wkhtmltopdf_path="missing")
+        status = {stage["stage"]: stage["status"] for stage in stages}
+        self.assertEqual(status, {"parse": "ok", "compute": "failed", "render": "skipped", "json": "skipped"})
+        self.assertEqual(stages[1]["error"], "MemoryError: too big")
+        self.assertEqual(stages[2]["reason"], "compute failed")
+
+        # The gate reports the failure instead of crashing
+        ok = [stage if stage["status"] == "ok" else dict(stage, status="ok", seconds=1.0, peak_rss_bytes=1)
+              for stage in stages]
+        rows = compare({"scenarios": [{"name": "items_30", "stages": ok}]},
+                       {"scenarios": [{"name": "items_30", "stages": stages}]})
+        self.assertEqual({row["stage"] for row in rows if row["status"] == REGRESSED}, {"compute", "render", "json"})
+
+if __name__ == '__main__':
+    unittest.main()
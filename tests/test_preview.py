@@ -0,0 +1,48 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from preview import render_preview, debounce
+from bill_pipeline import create_environment, read_workbook, compute_bill
+
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+class TestPreview(unittest.TestCase):
+    def test_renders_html_without_pdf_renderer(self):
+        sheets = compute_bill(*read_workbook(SAMPLE_FILE), {"bill_type": "Final Bill", "premium_percent": 4.0})
+        with patch("pdf_pipeline.render_pdf_bytes", side_effect=AssertionError("renderer called")):
+            preview = render_preview(create_environment(), sheets)
+        self.assertEqual(list(preview), [name for name, _ in sheets])
+        self.assertIn("<table", preview["First Page"])
+        for html in preview.values():
+            self.assertTrue(html.strip())
+
+        only_note = render_preview(create_environment(), sheets, sheet_names=["Note Sheet"])
+        self.assertEqual(list(only_note), ["Note Sheet"])
+
+    def test_debounce_waits_for_inputs_to_settle(self):
+        state, clock = {}, FakeClock()
+        self.assertFalse(debounce(state, "inputs", 1, delay=1.0, clock=clock))
+        clock.time = 0.6
+        self.assertFalse(debounce(state, "inputs", 2, delay=1.0, clock=clock))
+        clock.time = 1.2
+        # Changed at 0.6, so not settled yet
+        self.assertFalse(debounce(state, "inputs", 2, delay=1.0, clock=clock))
+        clock.time = 1.6
+        self.assertTrue(debounce(state, "inputs", 2, delay=1.0, clock=clock))
+        self.assertTrue(debounce(state, "other", "x", delay=0, clock=clock))
+
+if __name__ == '__main__':
+    unittest.main()
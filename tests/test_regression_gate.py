@@ -0,0 +1,105 @@
+import copy
+import io
+import json
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+# Add the benchmarks directory to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from regression_gate import IMPROVED, NOT_COMPARED, OK, REGRESSED, compare, format_report, main, unclean_stages
+
+MIB = 2 ** 20
+
+def stage(name, seconds, peak_mib):
+    return {"stage": name, "status": "ok", "seconds": seconds, "peak_rss_bytes": peak_mib * MIB}
+
+BASELINE = {
+    "scenarios": [{
+        "name": "items_100",
+        "items": 100,
+        "stages": [
+            stage("parse", 2.0, 200),
+            stage("word", 1.0, 300)
+        ]
+    }]
+}
+
+def statuses(rows):
+    return {(row["stage"], row.get("metric")): row["status"] for row in rows}
+
+class TestRegressionGate(unittest.TestCase):
+    def results(self, **changes):
+        results = copy.deepcopy(BASELINE)
+        for item in results["scenarios"][0]["stages"]:
+            item.update(changes.get(item["stage"], {}))
+        return results
+
+    def test_within_tolerance(self):
+        rows = compare(BASELINE, self.results(parse={"seconds": 2.4}, word={"peak_rss_bytes": 330 * MIB}))
+        self.assertEqual(set(statuses(rows).values()), {OK})
+        self.assertEqual(format_report(rows).splitlines()[-1], "No regressions")
+
+    def test_regressions(self):
+        rows = compare(BASELINE, self.results(parse={"seconds": 6.0}, word={"peak_rss_bytes": 450 * MIB}))
+        self.assertEqual(statuses(rows)[("parse", "seconds")], REGRESSED)
+        self.assertEqual(statuses(rows)[("word", "peak_rss")], REGRESSED)
+        report = format_report(rows)
+        self.assertIn("+200.0% (limit +25%) regressed", report)
+        self.assertTrue(report.endswith("2 regression(s) in 4 comparison(s)"))
+
+    def test_tolerances_and_noise_floor(self):
+        slower = self.results(parse={"seconds": 3.0})
+        self.assertEqual(statuses(compare(BASELINE, slower, {"seconds": 0.6}))[("parse", "seconds")], OK)
+        baseline = dict(BASELINE, tolerances={"stages": {"parse": {"seconds": 0.6}}})
+        self.assertEqual(statuses(compare(baseline, slower))[("parse", "seconds")], OK)
+        # Doubling a stage that takes milliseconds is noise
+        tiny = copy.deepcopy(BASELINE)
+        tiny["scenarios"][0]["stages"][0]["seconds"] = 0.01
+        self.assertEqual(statuses(compare(tiny, self.results(parse={"seconds": 0.02})))[("parse", "seconds")], OK)
+        self.assertEqual(statuses(compare(BASELINE, self.results(parse={"seconds": 1.0})))[("parse", "seconds")],
+                         IMPROVED)
+
+    def test_failed_or_missing(self):
+        failed = self.results(word={"status": "failed", "error": "MemoryError"})
+        self.assertEqual(statuses(compare(BASELINE, failed))[("word", None)], REGRESSED)
+        self.assertEqual(set(statuses(compare(BASELINE, {"scenarios": []})).values()), {REGRESSED})
+        partial = self.results()
+        del partial["scenarios"][0]["stages"][1]
+        self.assertEqual(statuses(compare(BASELINE, partial))[("word", None)], NOT_COMPARED)
+
+    def test_unclean_stages_regress(self):
+        skipped = {"stage": "pdf", "status": "skipped", "reason": "wkhtmltopdf not found"}
+        baseline = copy.deepcopy(BASELINE)
+        baseline["scenarios"][0]["stages"].append(skipped)
+        rows = compare(baseline, self.results())
+        self.assertEqual(statuses(rows)[("pdf", None)], REGRESSED)
+
+        # Skipped or template errors in the results, against a clean baseline
+        baseline["scenarios"][0]["stages"][-1] = stage("pdf", 1.0, 100)
+        results = self.results(word={"template_errors": ["Note Sheet: undefined"]})
+        results["scenarios"][0]["stages"].append(skipped)
+        rows = compare(baseline, results)
+        self.assertEqual(statuses(rows)[("pdf", None)], REGRESSED)
+        self.assertEqual(statuses(rows)[("word", None)], REGRESSED)
+        self.assertEqual(len(unclean_stages(results)), 2)
+
+    def test_update_refuses_unclean_results(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        results = self.results()
+        results["scenarios"][0]["stages"].append({"stage": "pdf", "status": "skipped", "reason": "wkhtmltopdf not found"})
+        results_path = os.path.join(temp_dir, "results.json")
+        with open(results_path, "w") as f:
+            json.dump(results, f)
+        baseline_path = os.path.join(temp_dir, "baseline.json")
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main(["--baseline", baseline_path, "--results", results_path, "--update"])
+        self.assertFalse(os.path.exists(baseline_path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import io
+import os
+import sys
+import tempfile
+import shutil
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reproducible import DEFAULT_FIXED_TIME, fixed_clock, now, pdf_date, content_digest
+from pdf_pipeline import merge_pdf_bytes
+from core_functions import generate_pdf
+
+def make_pdf(text):
+    """Build a PDF with reportlab's default (time-stamped) metadata."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.drawString(100, 750, text)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+class TestReproducibleOutput(unittest.TestCase):
+    def setUp(self):
+        self.bill_data = {
+            "contractor_name": "Test Contractor",
+            "work_name": "Test Work",
+            "bill_serial": "1",
+            "agreement_no": "AG123",
+            "work_order_ref": "WO123",
+            "work_order_amount": 100000,
+            "premium_percent": 10,
+            "bill_type": "running bill",
+            "bill_number": "1",
+            "is_first_bill": True,
+            "amount_paid_last_bill": 0
+        }
+        self.bill_result = (
+            {"items": [{"description": "Item", "quantity": 2.0, "rate": 50.0, "amount": 100.0}]},
+            {"grand_total": 110.0},
+            None,
+            {"items": [], "total": 0},
+            {}
+        )
+
+    def test_injected_clock(self):
+        when = datetime(2025, 3, 1, tzinfo=timezone.utc)
+        self.assertEqual(now(fixed_clock(when)), when)
+        self.assertEqual(pdf_date(when), "D:20250301000000Z")
+
+    def test_source_date_epoch(self):
+        with patch.dict(os.environ, {"SOURCE_DATE_EPOCH": "86400"}):
+            self.assertEqual(now(), datetime(1970, 1, 2, tzinfo=timezone.utc))
+
+    def test_deterministic_merge(self):
+        """Inputs rendered at different times merge to identical bytes"""
+        inputs = []
+        for epoch in ("86400", "172800"):
+            with patch.dict(os.environ, {"SOURCE_DATE_EPOCH": epoch}):
+                inputs.append([make_pdf("Bill"), make_pdf("Notes")])
+        self.assertNotEqual(inputs[0], inputs[1])
+        with patch.dict(os.environ):
+            os.environ.pop("SOURCE_DATE_EPOCH", None)
+            first = merge_pdf_bytes(inputs[0], deterministic=True)
+            second = merge_pdf_bytes(inputs[1], deterministic=True)
+        self.assertEqual(content_digest(first), content_digest(second))
+        merged = PdfReader(io.BytesIO(first))
+        self.assertEqual(merged.metadata["/CreationDate"], pdf_date(DEFAULT_FIXED_TIME))
+        self.assertIn("/ID", merged.trailer)
+
+    def test_different_content_differs(self):
+        first = merge_pdf_bytes([make_pdf("Bill A")], deterministic=True)
+        second = merge_pdf_bytes([make_pdf("Bill B")], deterministic=True)
+        self.assertNotEqual(first, second)
+
+    def test_reportlab_bill_is_reproducible(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            outputs = []
+            for name in ("one.pdf", "two.pdf"):
+                path = os.path.join(temp_dir, name)
+                generate_pdf(path, self.bill_data, self.bill_result, deterministic=True)
+                with open(path, "rb") as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs[0], outputs[1])
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
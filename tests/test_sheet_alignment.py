@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill
+from sheet_alignment import DATA_START_ROW, align_sheets, parse_numbers
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+def payable(sheets):
+    return dict(sheets)["Last Page"]["payable_amount"]
+
+class TestSheetAlignment(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ws_wo, cls.ws_bq, cls.ws_extra = read_workbook(SAMPLE_FILE)
+
+    def with_items(self, items):
+        return pd.concat([self.ws_bq.iloc[:DATA_START_ROW], items], ignore_index=True)
+
+    def test_parse_numbers(self):
+        values, invalid = parse_numbers([3, 2.5, " 1,200 ", "", None, np.nan, "abc"])
+        np.testing.assert_array_equal(values, [3, 2.5, 1200, 0, 0, 0, 0])
+        self.assertEqual(invalid.tolist(), [False] * 6 + [True])
+
+    def test_sheets_in_the_same_order(self):
+        alignment = align_sheets(self.ws_wo, self.ws_bq)
+        matched = alignment.items[alignment.items["bill_row"] >= 0]
+        self.assertEqual(matched["bill_row"].tolist(), matched["row"].tolist())
+        self.assertEqual(alignment.reordered, 0)
+        self.assertEqual(alignment.unmatched_bill_quantity, [])
+
+    def test_shuffled_bill_quantity(self):
+        shuffled = self.with_items(self.ws_bq.iloc[DATA_START_ROW:].sample(frac=1, random_state=7))
+        expected = compute_bill(self.ws_wo, self.ws_bq, self.ws_extra, {})
+        sheets = compute_bill(self.ws_wo, shuffled, self.ws_extra, {})
+        self.assertEqual(payable(sheets), payable(expected))
+        self.assertEqual(dict(sheets)["First Page"]["alignment"]["unmatched_work_order"], [])
+        self.assertGreater(dict(sheets)["First Page"]["alignment"]["reordered"], 0)
+
+    def test_repeated_code_matched_within_its_group(self):
+        alignment = align_sheets(self.ws_wo, self.ws_bq)
+        items = alignment.items[alignment.items["bsr"].str.strip() == "6.1"]
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items["bill_row"].tolist(), items["row"].tolist())
+
+    def test_inserted_and_missing_rows(self):
+        items = self.ws_bq.iloc[DATA_START_ROW:]
+        extra = items.iloc[[0]].copy()
+        extra.iloc[0, 1], extra.iloc[0, 3], extra.iloc[0, 6] = "Unlisted item", 5, "99.9"
+        inserted = self.with_items(pd.concat([items.iloc[:2], extra, items.iloc[2:]]))
+        sheets = compute_bill(self.ws_wo, inserted, self.ws_extra, {})
+        report = dict(sheets)["First Page"]["alignment"]
+        self.assertEqual([row["bsr"] for row in report["unmatched_bill_quantity"]], ["99.9"])
+        self.assertEqual(payable(sheets), payable(compute_bill(self.ws_wo, self.ws_bq, self.ws_extra, {})))
+
+        dropped = self.with_items(items.drop(index=items.index[1]))
+        alignment = align_sheets(self.ws_wo, dropped)
+        self.assertEqual([row["row"] for row in alignment.unmatched_work_order], [DATA_START_ROW + 2])
+
+    def test_position_key(self):
+        alignment = align_sheets(self.ws_wo, self.ws_bq, key="position")
+        self.assertTrue((alignment.items["bill_row"] == alignment.items["row"]).all())
+        with self.assertRaises(ValueError):
+            align_sheets(self.ws_wo, self.ws_bq, key="colour")
+
+if __name__ == '__main__':
+    unittest.main()
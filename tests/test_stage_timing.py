@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill, generate_outputs
+from stage_timing import StageMetrics, StageTimer, stage
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(ROOT_DIR, "test_files", "SAMPLE BILL INPUT- WITH EXTRA ITEMS.xlsx")
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+class TestStageTiming(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = StageMetrics(buckets=(0.1, 1.0))
+        self.timer = StageTimer(metrics=self.metrics, clock=self.clock)
+
+    def test_stages_are_summed_and_ordered(self):
+        for seconds in (0.5, 0.25):
+            with self.timer.stage("wkhtmltopdf"):
+                self.clock.time += seconds
+        with self.timer.stage("parse"):
+            self.clock.time += 0.05
+        record = self.timer.record()
+        self.assertEqual(record["total_seconds"], 0.8)
+        self.assertEqual(record["stages"], [
+            {"stage": "parse", "seconds": 0.05, "calls": 1, "errors": 0},
+            {"stage": "wkhtmltopdf", "seconds": 0.75, "calls": 2, "errors": 0}
+        ])
+
+    def test_errors_are_counted_and_raised(self):
+        with self.assertRaises(ValueError):
+            with self.timer.stage("compute"):
+                raise ValueError("bad sheet")
+        self.assertEqual(self.timer.record()["stages"][0]["errors"], 1)
+        self.assertEqual(self.metrics.snapshot()["compute"]["errors"], 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.05, 0.1, 0.5, 3.0):
+            self.metrics.observe("merge_pdf", seconds)
+        merge = self.metrics.snapshot()["merge_pdf"]
+        self.assertEqual(merge["count"], 4)
+        self.assertAlmostEqual(merge["seconds"], 3.65)
+        self.assertEqual(merge["buckets"], [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+
+    def test_finish_logs_the_record(self):
+        with self.timer.stage("json"):
+            self.clock.time += 0.01
+        with self.assertLogs("bill.timing", level="INFO") as logs:
+            record = self.timer.finish(job_id="abc")
+        self.assertEqual(logs.records[0].getMessage(), "bill_timing")
+        self.assertEqual(logs.records[0].fields["job_id"], "abc")
+        self.assertEqual(record["stages"][0]["stage"], "json")
+
+    def test_pipeline_stages(self):
+        sheets = compute_bill(*read_workbook(SAMPLE_FILE, timer=self.timer), {}, timer=self.timer)
+        generate_outputs(sheets, ["json"], timer=self.timer)
+        with stage("zip"):
+            pass
+        self.assertEqual([entry["stage"] for entry in self.timer.record()["stages"]], ["parse", "compute", "json"])
+        self.assertEqual(list(self.metrics.snapshot()), ["parse", "compute", "json"])
+
+if __name__ == '__main__':
+    unittest.main()
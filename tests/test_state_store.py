@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import FileStateStore, SQLiteStateStore, open_state_store
+
+class StateStoreTests:
+    """Behaviour shared by every backend; mixed into a TestCase per backend."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.now = 1000.0
+        self.store = self.create_store(lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_values_round_trip_per_namespace(self):
+        self.store.put("uploads", "abc", b"xlsx")
+        self.store.put_json("form_state", "abc", {"start_date": date(2025, 1, 1), "premium_percent": 4.0})
+        self.store.put_object("bills", "abc", [("First Page", {"items": [1, 2]})])
+
+        self.assertEqual(self.store.get("uploads", "abc"), b"xlsx")
+        self.assertEqual(self.store.get_json("form_state", "abc")["start_date"], date(2025, 1, 1))
+        self.assertEqual(self.store.get_object("bills", "abc"), [("First Page", {"items": [1, 2]})])
+        self.assertIsNone(self.store.get("uploads", "other"))
+        self.assertEqual(self.store.keys("uploads"), ["abc"])
+
+        self.store.put("uploads", "abc", b"replaced")
+        self.assertEqual(self.store.get("uploads", "abc"), b"replaced")
+        self.store.delete("uploads", "abc")
+        self.assertIsNone(self.store.get("uploads", "abc"))
+
+    def test_ttl(self):
+        self.store.put("bills", "short", b"1", ttl=10)
+        self.store.put("bills", "forever", b"2")
+        self.now += 11
+        self.assertIsNone(self.store.get("bills", "short"))
+        self.assertEqual(self.store.keys("bills"), ["forever"])
+        self.assertEqual(self.store.purge_expired(), 1)
+
+    def test_replicas_share_state(self):
+        self.store.put_json("form_state", "session", {"bill_type": "Final Bill"})
+        replica = self.create_store(lambda: self.now)
+        self.assertEqual(replica.get_json("form_state", "session"), {"bill_type": "Final Bill"})
+
+class TestFileStateStore(StateStoreTests, unittest.TestCase):
+    def create_store(self, clock):
+        return FileStateStore(os.path.join(self.temp_dir, "state"), clock=clock)
+
+class TestSQLiteStateStore(StateStoreTests, unittest.TestCase):
+    def create_store(self, clock):
+        return SQLiteStateStore(os.path.join(self.temp_dir, "state.sqlite3"), clock=clock)
+
+class TestOpenStateStore(unittest.TestCase):
+    def test_urls(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            self.assertIsInstance(open_state_store(f"sqlite://{temp_dir}/a.sqlite3"), SQLiteStateStore)
+            self.assertIsInstance(open_state_store(f"file://{temp_dir}/dir"), FileStateStore)
+            self.assertIsInstance(open_state_store(os.path.join(temp_dir, "b.db")), SQLiteStateStore)
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+import pandas as pd
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_pipeline import read_workbook, compute_bill
+from sheet_alignment import DATA_START_ROW
+from synthetic_workbook import EXTRA_START_ROW, make_sheets, workbook_bytes
+
+class TestSyntheticWorkbook(unittest.TestCase):
+    def test_workbook_runs_through_the_pipeline(self):
+        ws_wo, ws_bq, ws_extra = read_workbook(workbook_bytes(200, extra_items=7))
+        self.assertEqual(len(ws_wo) - DATA_START_ROW, 200)
+        self.assertEqual(len(ws_bq) - DATA_START_ROW, 200)
+        self.assertEqual(len(ws_extra) - EXTRA_START_ROW, 7)
+
+        sheets = dict(compute_bill(ws_wo, ws_bq, ws_extra, {}))
+        alignment = sheets["First Page"]["alignment"]
+        self.assertEqual((alignment["unmatched_work_order"], alignment["invalid"]), ([], []))
+        self.assertEqual(len(sheets["Extra Items"]["items"]), 7)
+        self.assertGreater(sheets["Last Page"]["payable_amount"], 0)
+
+    def test_layout(self):
+        items = make_sheets(50)["Work Order"].iloc[DATA_START_ROW:]
+        parents = items[items[0].notna()]
+        self.assertEqual(parents.iloc[0, 6], "1.1")
+        # Sub-items carry their parent's code and their own quantity
+        subs = items[items[0].isna()]
+        self.assertTrue(all(code.count(".") == 2 for code in subs[6]))
+        self.assertTrue(subs[3].notna().all())
+
+    def test_seeded(self):
+        first, second = make_sheets(100, seed=3), make_sheets(100, seed=3)
+        for name in first:
+            pd.testing.assert_frame_equal(first[name], second[name])
+        self.assertFalse(make_sheets(100, seed=4)["Bill Quantity"].equals(second["Bill Quantity"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import shutil
+import unittest
+from docx import Document
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from word_export import add_bulk_table, append_rows_bulk
+
+class TestWordExport(unittest.TestCase):
+    def test_rows_and_header(self):
+        doc = Document()
+        table = add_bulk_table(doc, ["S.No", "Description", "Amount"], [[1, "Wiring", 200], [2, "Fan", 650.5]])
+        self.assertEqual(len(table.rows), 3)
+        self.assertEqual([cell.text for cell in table.rows[0].cells], ["S.No", "Description", "Amount"])
+        self.assertTrue(table.rows[0].cells[0].paragraphs[0].runs[0].font.bold)
+        self.assertEqual([cell.text for cell in table.rows[2].cells], ["2", "Fan", "650.5"])
+
+    def test_special_characters_and_short_rows(self):
+        doc = Document()
+        table = add_bulk_table(doc, ["A", "B", "C"], [["<M/s & Sons>", None], ["bad\x0bchar"]])
+        self.assertEqual([cell.text for cell in table.rows[1].cells], ["<M/s & Sons>", "", ""])
+        self.assertEqual(table.rows[2].cells[0].text, "badchar")
+
+    def test_line_breaks(self):
+        doc = Document()
+        table = add_bulk_table(doc, None, [["Wiring\nShort point", "a\r\nb"]])
+        self.assertEqual([cell.text for cell in table.rows[0].cells], ["Wiring\nShort point", "a\nb"])
+        self.assertEqual(len(table.rows[0].cells[0]._tc.xpath(".//w:br")), 1)
+
+    def test_append_to_existing_table(self):
+        doc = Document()
+        table = doc.add_table(rows=1, cols=2)
+        append_rows_bulk(table, (["Key", "Value"] for _ in range(3)))
+        append_rows_bulk(table, [])
+        self.assertEqual(len(table.rows), 4)
+        self.assertEqual(table.rows[3].cells[1].text, "Value")
+
+    def test_saved_document_round_trip(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            doc = Document()
+            add_bulk_table(doc, ["S.No", "Description"], [[i, f"Item {i}"] for i in range(500)])
+            path = os.path.join(temp_dir, "bill.docx")
+            doc.save(path)
+            table = Document(path).tables[0]
+            self.assertEqual(len(table.rows), 501)
+            self.assertEqual(table.rows[500].cells[1].text, "Item 499")
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workspace import WorkspaceManager, QuotaExceededError
+from job_queue import JobStore, WorkerPool, DONE
+
+class TestWorkspace(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.now = 10000.0
+        self.manager = WorkspaceManager(self.root, quota_bytes=1000, ttl=60, clock=lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_workspaces_are_isolated(self):
+        first, second = self.manager.create(), self.manager.create("job")
+        first.write("bill.pdf", b"a")
+        second.write("bill.pdf", b"b")
+        self.assertEqual((first.read("bill.pdf"), second.read("bill.pdf")), (b"a", b"b"))
+        self.assertTrue(second.id.startswith("job-"))
+        self.assertEqual(self.manager.get(first.id).path, first.path)
+        self.assertIsNone(self.manager.get("../etc"))
+        with self.assertRaises(ValueError):
+            first.path_for("../escape.pdf")
+
+    def test_quota(self):
+        workspace = self.manager.create()
+        workspace.write("a.bin", b"x" * 600)
+        # Replacing a file only counts the difference
+        workspace.write("a.bin", b"x" * 900)
+        with self.assertRaises(QuotaExceededError):
+            workspace.write("b.bin", b"x" * 200)
+        self.assertEqual(workspace.usage(), 900)
+        # A workspace looked up again measures what is on disk
+        self.assertEqual(self.manager.get(workspace.id).usage(), 900)
+
+    def test_ttl_cleanup_and_metrics(self):
+        stale, fresh = self.manager.create(), self.manager.create()
+        stale.write("a.bin", b"x" * 100)
+        fresh.write("b.bin", b"x" * 300)
+        os.utime(stale.path, (self.now - 120, self.now - 120))
+        os.utime(fresh.path, (self.now - 10, self.now - 10))
+
+        metrics = self.manager.metrics()
+        self.assertEqual((metrics["workspaces"], metrics["workspace_bytes"]), (2, 400))
+        self.assertEqual(metrics["largest_workspace_bytes"], 300)
+        self.assertGreater(metrics["disk_total_bytes"], 0)
+
+        # Reused until max_age passes, without walking the workspaces again
+        fresh.write("c.bin", b"x" * 50)
+        self.assertEqual(self.manager.metrics()["workspace_bytes"], 400)
+        self.now += 30
+        self.assertEqual(self.manager.metrics()["workspace_bytes"], 450)
+
+        self.assertEqual(self.manager.cleanup_expired(), [stale.id])
+        self.assertFalse(os.path.exists(stale.path))
+        self.assertTrue(os.path.exists(fresh.path))
+        self.assertEqual(self.manager.metrics()["workspaces"], 1)
+
+    def test_context_manager_removes_on_completion(self):
+        with self.manager.create("job") as workspace:
+            workspace.write("out.pdf", b"%PDF")
+        self.assertFalse(os.path.exists(workspace.path))
+
+    def test_job_workspaces_are_removed_after_each_attempt(self):
+        store = JobStore(os.path.join(self.root, "jobs.sqlite3"))
+        paths = []
+
+        def handler(job):
+            paths.append(job["workspace"].write("input.xlsx", b"data"))
+            return {"out.txt": b"ok"}
+
+        job_id = store.submit({})
+        WorkerPool(store, handler, workspaces=self.manager).run_once()
+        self.assertEqual(store.get(job_id)["status"], DONE)
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertEqual(self.manager.metrics()["workspaces"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import tempfile
+import shutil
+import unittest
+import zipfile
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zip_packager import StreamingZipPackager, ParallelZipPackager, iter_zip_chunks, write_zip, build_zip
+
+ARTIFACTS = [
+    ("bill.pdf", b"%PDF-1.4 " + b"x" * 5000),
+    ("bill.docx", b"PK" + b"y" * 3000),
+    ("bill.json", b'{"items": []}' * 500)
+]
+
+class TestZipPackager(unittest.TestCase):
+    def test_compression_per_member(self):
+        """PDF and DOCX members are stored; text members are deflated"""
+        with zipfile.ZipFile(io.BytesIO(build_zip(ARTIFACTS))) as archive:
+            methods = {info.filename: info.compress_type for info in archive.infolist()}
+            self.assertEqual(methods["bill.pdf"], zipfile.ZIP_STORED)
+            self.assertEqual(methods["bill.docx"], zipfile.ZIP_STORED)
+            self.assertEqual(methods["bill.json"], zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.read("bill.json"), ARTIFACTS[2][1])
+
+    def test_streamed_chunks_form_a_valid_archive(self):
+        produced = []
+
+        def artifacts():
+            for name, data in ARTIFACTS:
+                produced.append(name)
+                yield name, data
+
+        chunks = []
+        for chunk in iter_zip_chunks(artifacts(), chunk_size=1024):
+            # Members are consumed lazily, while the archive is being streamed
+            chunks.append((len(produced), chunk))
+            self.assertLessEqual(len(chunk), 1024)
+
+        self.assertLess(chunks[0][0], len(ARTIFACTS))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunk for _, chunk in chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [name for name, _ in ARTIFACTS])
+
+    def test_fixed_timestamp_is_reproducible(self):
+        stamp = (2025, 1, 1, 0, 0, 0)
+        self.assertEqual(build_zip(ARTIFACTS, date_time=stamp), build_zip(ARTIFACTS, date_time=stamp))
+
+    def test_write_to_disk(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "bill_output.zip")
+            self.assertEqual(write_zip(ARTIFACTS, path), [name for name, _ in ARTIFACTS])
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(archive.read("bill.pdf"), ARTIFACTS[0][1])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_packager_records_names(self):
+        with StreamingZipPackager(io.BytesIO()) as packager:
+            packager.add("notes.txt", "text member")
+        self.assertEqual(packager.names, ["notes.txt"])
+
+class TestParallelZipPackager(unittest.TestCase):
+    def test_matches_sequential_archive_contents(self):
+        members = ARTIFACTS + [(f"bill_{i}.html", f"<p>Bill {i}</p>" * 400) for i in range(20)]
+        data = build_zip(members, parallel=True, max_workers=4)
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            # Members keep the order they were added in, whatever finishes first
+            self.assertEqual(archive.namelist(), [name for name, _ in members])
+            self.assertEqual(archive.getinfo("bill.pdf").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo("bill_0.html").compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.read("bill_3.html"), b"<p>Bill 3</p>" * 400)
+
+    def test_unseekable_target_and_utf8_names(self):
+        sink = io.BytesIO()
+        stream = io.BufferedWriter(sink)
+        stream.seekable = lambda: False
+        with ParallelZipPackager(stream, date_time=(2025, 1, 1, 0, 0, 0)) as packager:
+            packager.add("बिल.json", b"{}")
+        with zipfile.ZipFile(io.BytesIO(sink.getvalue())) as archive:
+            self.assertEqual(archive.read("बिल.json"), b"{}")
+
+    def test_add_bounds_members_in_flight(self):
+        sink = io.BytesIO()
+        with ParallelZipPackager(sink, max_workers=2) as packager:
+            for i in range(20):
+                packager.add(f"bill_{i}.html", f"<p>Bill {i}</p>" * 4000)
+                self.assertLessEqual(len(packager._pending), 4)
+        with zipfile.ZipFile(io.BytesIO(sink.getvalue())) as archive:
+            self.assertEqual(len(archive.namelist()), 20)
+            self.assertIsNone(archive.testzip())
+
+    def test_error_leaves_archive_unfinished(self):
+        sink = io.BytesIO()
+        with self.assertRaises(RuntimeError):
+            with ParallelZipPackager(sink) as packager:
+                packager.add("bill.html", "<p>Bill</p>" * 400)
+                raise RuntimeError("render failed")
+        self.assertNotIn(b"PK\x05\x06", sink.getvalue())
+        self.assertTrue(packager._executor._shutdown)
+
+    def test_fixed_timestamp_is_reproducible(self):
+        stamp = (2025, 1, 1, 0, 0, 0)
+        self.assertEqual(
+            build_zip(ARTIFACTS, date_time=stamp, parallel=True),
+            build_zip(ARTIFACTS, date_time=stamp, parallel=True, max_workers=1)
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,33 +1,30 @@
 import pandas as pd
 import numpy as np
-import streamlit as st
 import io
 from jinja2 import Environment, FileSystemLoader
 from num2words import num2words
 import os
-import traceback
 from datetime import datetime
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import pdfkit
 from pypdf import PdfReader, PdfWriter
-import tempfile
-import shutil
-import subprocess
+from pdf_pipeline import find_wkhtmltopdf, render_pdf_bytes
+from pdf_merger import StreamingPdfMerger
+from word_export import add_bulk_table, append_rows_bulk
+from sheet_alignment import align_sheets, DEFAULT_ALIGN_KEY
+from diagnostics import get_logger
+
+log = get_logger("bill.utils")
 
 # Initialize Jinja2 environment
 env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")), cache_size=0)
 env.filters['strptime'] = lambda s, fmt: datetime.strptime(s, fmt) if s else None
 
-# Configure wkhtmltopdf with better error handling
-wkhtmltopdf_path = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-
-# Check if wkhtmltopdf exists
-if not os.path.exists(wkhtmltopdf_path):
-    raise FileNotFoundError(f"wkhtmltopdf not found at: {wkhtmltopdf_path}")
-
-config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path)
+# Configure wkhtmltopdf; a missing binary is reported when a PDF is rendered
+wkhtmltopdf_path = find_wkhtmltopdf()
+config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path) if wkhtmltopdf_path else None
 
 def number_to_words(number):
     try:
@@ -54,7 +51,7 @@ def make_gst_even(value):
             return rounded + 1 if rounded % 2 != 0 else rounded
         return rounded
     except Exception as e:
-        print(f"Error in make_gst_even: {str(e)}")
+        log.warning("make_gst_even_failed", value=value, error=str(e))
         return int(value)
 
 def calculate_deductions(payable_amount, bill_type, is_first_bill=False):
@@ -113,7 +110,7 @@ def calculate_deductions(payable_amount, bill_type, is_first_bill=False):
         
         return deductions
     except Exception as e:
-        print(f"Error in calculate_deductions: {str(e)}")
+        log.warning("calculate_deductions_failed", payable_amount=payable_amount, error=str(e))
         return {
             'sd_amount': 0,
             'it_amount': 0,
@@ -141,6 +138,9 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
     
     Returns:
         Tuple of data dictionaries for each document
+
+    Raises:
+        Exception: Whatever failed while processing, after logging it
     """
     try:
         # Initialize data structures
@@ -228,37 +228,28 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
             "last_bill": user_inputs.get("last_bill", "")
         }
         
-        # Process work order items
-        work_order_total = 0
-        last_row_wo = ws_wo.shape[0]
-        for i in range(21, last_row_wo):
-            qty_raw = ws_bq.iloc[i, 3] if i < ws_bq.shape[0] and pd.notnull(ws_bq.iloc[i, 3]) else 0
-            rate_raw = ws_wo.iloc[i, 4] if pd.notnull(ws_wo.iloc[i, 4]) else 0
-            
-            try:
-                qty = float(qty_raw) if isinstance(qty_raw, (int, float)) else \
-                    float(qty_raw.strip().replace(',', '').replace(' ', '')) if isinstance(qty_raw, str) and qty_raw.strip() else 0
-                
-                rate = float(rate_raw) if isinstance(rate_raw, (int, float)) else \
-                    float(rate_raw.strip().replace(',', '').replace(' ', '')) if isinstance(rate_raw, str) and rate_raw.strip() else 0
-                
-                amount = int(round(qty * rate))
-                work_order_total += amount
-                
-                item = {
-                    "serial_no": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
-                    "description": str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else "",
-                    "unit": str(ws_wo.iloc[i, 2]) if pd.notnull(ws_wo.iloc[i, 2]) else "",
-                    "quantity": qty,
-                    "rate": int(rate),
-                    "remark": str(ws_wo.iloc[i, 6]) if pd.notnull(ws_wo.iloc[i, 6]) else "",
-                    "amount": amount,
-                    "is_divider": False
-                }
-                first_page_data["items"].append(item)
-            except Exception as e:
-                print(f"Error processing work order item: {str(e)}")
-                continue
+        # Process work order items; Bill Quantity rows are matched to Work Order rows by key
+        alignment = align_sheets(ws_wo, ws_bq, key=user_inputs.get("align_key", DEFAULT_ALIGN_KEY))
+        aligned = alignment.items[alignment.items["valid"]]
+        amounts = np.rint(aligned["quantity"].to_numpy() * aligned["rate"].to_numpy()).astype(np.int64)
+        work_order_total = int(amounts.sum())
+        first_page_data["items"].extend(
+            {
+                "serial_no": serial_no,
+                "description": description,
+                "unit": unit,
+                "quantity": float(quantity),
+                "rate": int(rate),
+                "remark": bsr,
+                "amount": int(amount),
+                "is_divider": False
+            }
+            for serial_no, description, unit, quantity, rate, bsr, amount in zip(
+                aligned["serial_no"], aligned["description"], aligned["unit"], aligned["quantity"],
+                aligned["rate"], aligned["bsr"], amounts
+            )
+        )
+        first_page_data["alignment"] = alignment.report()
         
         note_sheet_data["work_order_amount"] = work_order_total
         first_page_data["totals"]["work_order_total"] = work_order_total
@@ -274,7 +265,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                 extra_items_total = 0
                 for j in range(6, last_row_extra):
                     if ws_extra.shape[1] <= 5:
-                        st.error(f"Extra Items sheet has insufficient columns: {ws_extra.shape[1]}")
+                        log.error("extra_items_insufficient_columns", columns=ws_extra.shape[1])
                         break
                     
                     try:
@@ -308,7 +299,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                             first_page_data["items"].append(item)
                             extra_items_data["items"].append(item)
                     except Exception as e:
-                        print(f"Error processing extra item: {str(e)}")
+                        log.warning("extra_item_skipped", row=j + 1, error=str(e))
                         continue
                 
                 extra_items_data["totals"]["extra_items_total"] = extra_items_total
@@ -320,7 +311,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
                 extra_items_data["totals"]["extra_items_total"] = 0
                 extra_items_data["totals"]["grand_total"] = work_order_total
         except Exception as e:
-            print(f"Error processing extra items section: {str(e)}")
+            log.exception("extra_items_failed")
             first_page_data["items"].append({"description": "No Extra Items", "amount": 0, "is_divider": False})
             extra_items_data["items"].append({"description": "No Extra Items", "amount": 0, "is_divider": False})
             extra_items_data["totals"]["extra_items_total"] = 0
@@ -383,10 +374,9 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type, amount_p
         
         return first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data
         
-    except Exception as e:
-        st.error(f"Error processing bill: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")
-        return None, None, None, None, None
+    except Exception:
+        log.exception("process_bill_failed")
+        raise
 
 def generate_bill_notes(payable_amount, work_order_amount, extra_item_amount, note_sheet_data):
     """
@@ -427,9 +417,9 @@ def generate_bill_notes(payable_amount, work_order_amount, extra_item_amount, no
         
         return data
         
-    except Exception as e:
-        st.error(f"Error generating note sheet: {str(e)}")
-        return None
+    except Exception:
+        log.exception("generate_bill_notes_failed", payable_amount=payable_amount)
+        raise
 
 def generate_pdf(html_content, output_path=None):
     """
@@ -440,68 +430,21 @@ def generate_pdf(html_content, output_path=None):
         output_path: Optional output path for the PDF
     """
     try:
-        # Create temporary directory for PDF generation
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Create temporary HTML file
-            temp_html = os.path.join(temp_dir, "temp.html")
-            with open(temp_html, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            # Try to find wkhtmltopdf in common locations
-            possible_paths = [
-                r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe",
-                r"C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe",
-                r"C:\Program Files\wkhtmltopdf\wkhtmltopdf.exe",
-                r"C:\Program Files (x86)\wkhtmltopdf\wkhtmltopdf.exe"
-            ]
-            
-            wkhtmltopdf_path = None
-            for path in possible_paths:
-                if os.path.exists(path):
-                    wkhtmltopdf_path = path
-                    break
-            
-            if not wkhtmltopdf_path:
-                raise FileNotFoundError("wkhtmltopdf executable not found. Please install it from: https://wkhtmltopdf.org/downloads.html")
-            
-            # Configure wkhtmltopdf
-            config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path)
-            
-            # Generate PDF
-            pdf_bytes = pdfkit.from_file(
-                temp_html,
-                False,  # Output to BytesIO
-                configuration=config,
-                options={
-                    'page-size': 'A4',
-                    'margin-top': '0.25in',
-                    'margin-bottom': '0.25in',
-                    'margin-left': '0.25in',
-                    'margin-right': '0.5in',
-                    'encoding': "UTF-8",
-                    'quiet': "",
-                    'no-outline': None,
-                    'enable-local-file-access': None,
-                    'disable-smart-shrinking': None,
-                    'dpi': 300,
-                    'javascript-delay': "1000",
-                    'no-stop-slow-scripts': None,
-                    'load-error-handling': "ignore"
-                }
-            )
-            
-            # If output_path is provided, write to file
-            if output_path:
-                with open(output_path, 'wb') as f:
-                    f.write(pdf_bytes)
-                return None
-            
-            # Return BytesIO object
-            return io.BytesIO(pdf_bytes)
+        # Render in memory: HTML goes in on stdin, the PDF comes back on stdout
+        pdf_bytes = render_pdf_bytes(html_content)
+        
+        # If output_path is provided, write to file
+        if output_path:
+            with open(output_path, 'wb') as f:
+                f.write(pdf_bytes)
+            return None
+        
+        # Return BytesIO object
+        return io.BytesIO(pdf_bytes)
             
     except Exception as e:
         error_msg = f"Error generating PDF: {str(e)}"
-        print(f"Error details: {traceback.format_exc()}")
+        log.exception("generate_pdf_failed", output_path=output_path)
         raise ValueError(error_msg) from e
 
 def combine_pdfs(pdf_paths, output_path):
@@ -521,44 +464,20 @@ def combine_pdfs(pdf_paths, output_path):
         if not pdf_paths:
             raise ValueError("No PDFs to combine")
         
-        # Create temporary directory for PDFs
-        temp_dir = tempfile.mkdtemp()
+        # Merge in-process, appending each document in order
+        merger = StreamingPdfMerger()
+        for pdf_path in pdf_paths:
+            merger.append(pdf_path)
         
-        try:
-            # Combine PDFs using pdftk
-            cmd = [
-                "pdftk",
-                *pdf_paths,
-                "cat",
-                "output",
-                output_path
-            ]
-            
-            try:
-                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError(f"Error combining PDFs: {e.stderr}\nCommand: {' '.join(cmd)}")
-            except FileNotFoundError:
-                raise RuntimeError("pdftk executable not found. Please install it from https://www.pdflabs.com/tools/pdftk-the-pdf-toolkit/")
-            
-            # Verify PDF was created
-            if not os.path.exists(output_path):
-                raise IOError(f"Failed to create combined PDF: {output_path}")
-                
-            # Verify PDF size (should be at least 1KB)
-            if os.path.getsize(output_path) < 1024:
-                raise IOError(f"Generated combined PDF is too small: {output_path}")
-                
-            return True
-            
-        finally:
-            # Clean up temporary files
-            if os.path.exists(temp_dir):
-                os.rmdir(temp_dir)
+        # Verify the merged document has pages before writing it
+        if merger.page_count == 0:
+            raise IOError(f"Combined PDF would be empty: {output_path}")
+        
+        merger.write(output_path)
+        return True
                 
     except Exception as e:
-        print(f"Error in combine_pdfs: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")
+        log.exception("combine_pdfs_failed", output_path=output_path)
         return False
 
 def create_word_doc(sheet_name, data, doc_path, header_data=None):
@@ -570,6 +489,9 @@ def create_word_doc(sheet_name, data, doc_path, header_data=None):
         data: Dictionary containing data for template
         doc_path: Path to save the Word document
         header_data: Optional header data
+
+    Raises:
+        Exception: Any error building or saving the document, after logging it
     """
     try:
         # Create new Word document
@@ -583,42 +505,32 @@ def create_word_doc(sheet_name, data, doc_path, header_data=None):
             # Add header data as table
             header_table = doc.add_table(rows=1, cols=2)
             header_table.style = 'Table Grid'
-            
-            for row in header_data:
-                row_cells = header_table.add_row().cells
-                row_cells[0].text = str(row[0])
-                row_cells[1].text = str(row[1])
+            append_rows_bulk(header_table, ([row[0], row[1]] for row in header_data))
         
         # Add main content based on sheet name
         if sheet_name == "first_page":
             # Add bill items table
-            items_table = doc.add_table(rows=1, cols=7)
-            items_table.style = 'Table Grid'
+            items_table = add_bulk_table(doc, ['S.No', 'Description', 'Unit', 'Quantity', 'Rate', 'Amount', 'Remark'], [])
             
-            # Add headers
-            headers = ['S.No', 'Description', 'Unit', 'Quantity', 'Rate', 'Amount', 'Remark']
-            for i, header in enumerate(headers):
-                cell = items_table.rows[0].cells[i]
-                cell.text = header
-                cell.paragraphs[0].runs[0].font.bold = True
-            
-            # Add items
+            # Collect item rows and insert them into the table in one operation;
+            # placeholder rows such as "No Extra Items" carry only a description
+            rows = []
             for item in data['items']:
-                if item['is_divider']:
+                if item.get('is_divider'):
                     doc.add_paragraph("-" * 80)
                 else:
-                    row = items_table.add_row().cells
-                    row[0].text = str(item['serial_no'])
-                    row[1].text = str(item['description'])
-                    row[2].text = str(item['unit'])
-                    row[3].text = f"{item['quantity']:.2f}"
-                    row[4].text = f"{item['rate']:.2f}"
-                    row[5].text = f"{item['amount']:.2f}"
-                    row[6].text = str(item['remark'])
+                    rows.append([
+                        item.get('serial_no', ""),
+                        item.get('description', ""),
+                        item.get('unit', ""),
+                        *(f"{item[key]:.2f}" if key in item else "" for key in ('quantity', 'rate', 'amount')),
+                        item.get('remark', "")
+                    ])
+            append_rows_bulk(items_table, rows)
         
         # Save document
         doc.save(doc_path)
         
-    except Exception as e:
-        st.error(f"Error creating Word document for {sheet_name}: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")
\ No newline at end of file
+    except Exception:
+        log.exception("create_word_doc_failed", sheet=sheet_name)
+        raise
\ No newline at end of file
@@ -0,0 +1,109 @@
+import re
+from copy import deepcopy
+from lxml import etree
+from xml.sax.saxutils import escape
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+CELL_MARKER = "__BULK_CELL_{}__"
+
+# Characters that are not allowed in XML text (Excel cells occasionally contain them)
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Ends the cell's text element, adds a line break and opens a new text element
+LINE_BREAK_XML = '</w:t><w:br/><w:t xml:space="preserve">'
+
+def _row_template(table):
+    """
+    Build a reusable row template from the table's own row XML.
+
+    A blank row is added and removed again so the template carries the
+    table's cell properties (widths, grid spans). Every cell is reduced to a
+    single paragraph with one text run holding a placeholder marker.
+
+    Returns:
+        List of XML string fragments; cell values go between consecutive fragments
+    """
+    tr = table.add_row()._tr
+    template = deepcopy(tr)
+    table._tbl.remove(tr)
+
+    for index, tc in enumerate(template.findall(qn("w:tc"))):
+        for child in list(tc):
+            if child.tag != qn("w:tcPr"):
+                tc.remove(child)
+        tc.append(parse_xml(
+            f'<w:p {nsdecls("w")}><w:r><w:t xml:space="preserve">{CELL_MARKER.format(index)}</w:t></w:r></w:p>'
+        ))
+
+    xml = etree.tostring(template, encoding="unicode")
+    fragments = []
+    for index in range(len(template.findall(qn("w:tc")))):
+        head, xml = xml.split(CELL_MARKER.format(index), 1)
+        fragments.append(head)
+    fragments.append(xml)
+    return fragments
+
+def _cell_text_xml(value):
+    """
+    Escaped cell text for a row template, with line breaks as <w:br/> as cell.text would write them.
+    """
+    text = INVALID_XML_CHARS.sub("", "" if value is None else str(value))
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return LINE_BREAK_XML.join(escape(line) for line in lines)
+
+def append_rows_bulk(table, rows):
+    """
+    Append many rows to a python-docx table in a single XML operation.
+
+    Instead of filling cells one at a time (which re-walks the table XML on
+    every access), the rows are rendered as text from a row template,
+    parsed once and spliced into the table.
+
+    Args:
+        table: python-docx Table
+        rows: Iterable of row value sequences; values are converted with
+            str() and line breaks in them are kept
+    """
+    fragments = _row_template(table)
+    columns = len(fragments) - 1
+    parts = []
+    for row in rows:
+        values = list(row) + [""] * (columns - len(row))
+        for fragment, value in zip(fragments, values):
+            parts.append(fragment)
+            parts.append(_cell_text_xml(value))
+        parts.append(fragments[-1])
+
+    if not parts:
+        return
+    wrapper = parse_xml(f'<w:tbl {nsdecls("w")}>{"".join(parts)}</w:tbl>')
+    table._tbl.extend(list(wrapper))
+
+def add_bulk_table(doc, headers, rows, style="Table Grid", bold_header=True):
+    """
+    Add a table with a header row and bulk-inserted body rows.
+
+    Args:
+        doc: python-docx Document
+        headers: List of column headers, or None for a table without a header row
+        rows: Iterable of row value sequences
+        style: Table style name
+        bold_header: Whether header text is bold
+
+    Returns:
+        python-docx Table
+    """
+    rows = list(rows)
+    columns = len(headers) if headers else max((len(row) for row in rows), default=1)
+    table = doc.add_table(rows=1 if headers else 0, cols=columns)
+    table.style = style
+
+    if headers:
+        for cell, header in zip(table.rows[0].cells, headers):
+            cell.text = str(header)
+            if bold_header:
+                cell.paragraphs[0].runs[0].font.bold = True
+
+    append_rows_bulk(table, rows)
+    return table
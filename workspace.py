@@ -0,0 +1,230 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+DEFAULT_WORKSPACE_ROOT = os.environ.get("BILL_WORKSPACE_ROOT", os.path.join(tempfile.gettempdir(), "bill_workspaces"))
+DEFAULT_QUOTA_BYTES = 200 * 1024 * 1024
+DEFAULT_WORKSPACE_TTL = 6 * 60 * 60
+# Seconds WorkspaceManager.metrics() results are reused; each computation walks every workspace
+METRICS_MAX_AGE = 10
+
+WORKSPACE_ID_PATTERN = re.compile(r"^[a-z]+-[0-9a-f]{32}$")
+
+class QuotaExceededError(Exception):
+    """
+    Raised when a write would take a workspace over its size quota.
+    """
+
+def directory_size(path):
+    """
+    Total size in bytes of the files under path.
+    """
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                # Removed while walking
+                pass
+    return total
+
+class Workspace:
+    """
+    Isolated directory for one session or job.
+
+    Files are written through write() so the size quota is enforced; the
+    usage is measured once and then tracked as files are written. Used as a
+    context manager, the directory is removed when the block exits.
+    """
+
+    def __init__(self, workspace_id, path, quota_bytes):
+        self.id = workspace_id
+        self.path = path
+        self.quota_bytes = quota_bytes
+        self._usage = None
+
+    def path_for(self, name):
+        """
+        Absolute path of a file inside the workspace.
+
+        Raises:
+            ValueError: If name would resolve outside the workspace
+        """
+        path = os.path.normpath(os.path.join(self.path, name))
+        if os.path.commonpath([self.path, path]) != self.path or path == self.path:
+            raise ValueError(f"Invalid workspace file name: {name}")
+        return path
+
+    def usage(self):
+        """
+        Bytes currently stored in the workspace.
+        """
+        if self._usage is None:
+            self._usage = directory_size(self.path)
+        return self._usage
+
+    def write(self, name, data):
+        """
+        Write a file, replacing any file of the same name.
+
+        Args:
+            name: File name relative to the workspace
+            data: Content as bytes or str
+
+        Returns:
+            Absolute path of the file
+
+        Raises:
+            QuotaExceededError: If the workspace would exceed its quota
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        path = self.path_for(name)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        if self.usage() - replaced + len(data) > self.quota_bytes:
+            raise QuotaExceededError(
+                f"Workspace {self.id} quota of {self.quota_bytes} bytes exceeded writing {name} ({len(data)} bytes)"
+            )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self._usage += len(data) - replaced
+        self.touch()
+        return path
+
+    def read(self, name):
+        with open(self.path_for(name), "rb") as f:
+            return f.read()
+
+    def touch(self):
+        """
+        Mark the workspace as in use, postponing TTL cleanup.
+        """
+        os.utime(self.path)
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._usage = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.remove()
+
+class WorkspaceManager:
+    """
+    Creates per-session and per-job workspaces under one root directory and
+    removes them once they have been idle longer than the TTL.
+    """
+
+    def __init__(self, root=DEFAULT_WORKSPACE_ROOT, quota_bytes=DEFAULT_QUOTA_BYTES, ttl=DEFAULT_WORKSPACE_TTL,
+                 clock=time.time):
+        """
+        Args:
+            root: Directory holding every workspace (created if missing)
+            quota_bytes: Size quota of each workspace
+            ttl: Seconds a workspace may stay unused before cleanup removes it
+            clock: Callable returning the current time in seconds
+        """
+        self.root = os.path.abspath(root)
+        self.quota_bytes = quota_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._metrics = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, kind="session", token=None):
+        """
+        Create a new, empty workspace.
+
+        Args:
+            kind: Lowercase label used as the directory prefix (session, job, ...)
+            token: Optional 32-digit hex id, e.g. a session id shared by
+                replicas; a random one is generated by default
+
+        Returns:
+            Workspace
+        """
+        workspace_id = f"{kind}-{token or uuid.uuid4().hex}"
+        if not WORKSPACE_ID_PATTERN.match(workspace_id):
+            raise ValueError(f"Invalid workspace id: {workspace_id}")
+        path = os.path.join(self.root, workspace_id)
+        os.makedirs(path, exist_ok=token is not None)
+        return Workspace(workspace_id, path, self.quota_bytes)
+
+    def get(self, workspace_id):
+        """
+        Look up an existing workspace and mark it as in use.
+
+        Returns:
+            Workspace, or None if the id is unknown, malformed or cleaned up
+        """
+        if not workspace_id or not WORKSPACE_ID_PATTERN.match(workspace_id):
+            return None
+        path = os.path.join(self.root, workspace_id)
+        if not os.path.isdir(path):
+            return None
+        workspace = Workspace(workspace_id, path, self.quota_bytes)
+        workspace.touch()
+        return workspace
+
+    def _workspace_dirs(self):
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if WORKSPACE_ID_PATTERN.match(name) and os.path.isdir(path):
+                yield name, path
+
+    def cleanup_expired(self):
+        """
+        Remove workspaces that have not been used within the TTL.
+
+        Returns:
+            List of removed workspace ids
+        """
+        cutoff = self.clock() - self.ttl
+        removed = []
+        for workspace_id, path in self._workspace_dirs():
+            try:
+                expired = os.path.getmtime(path) < cutoff
+            except OSError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(workspace_id)
+        if removed:
+            self._metrics = None
+        return removed
+
+    def metrics(self, max_age=METRICS_MAX_AGE):
+        """
+        Disk usage of the workspaces and of the filesystem holding them.
+
+        Args:
+            max_age: Seconds a previous result may be reused for (0 to
+                measure again)
+
+        Returns:
+            Dictionary with workspaces, workspace_bytes, largest_workspace_bytes,
+            quota_bytes, disk_total_bytes, disk_used_bytes and disk_free_bytes
+        """
+        now = self.clock()
+        if self._metrics is not None and now - self._metrics[0] < max_age:
+            return dict(self._metrics[1])
+        sizes = [directory_size(path) for _, path in self._workspace_dirs()]
+        disk = shutil.disk_usage(self.root)
+        metrics = {
+            "workspaces": len(sizes),
+            "workspace_bytes": sum(sizes),
+            "largest_workspace_bytes": max(sizes, default=0),
+            "quota_bytes": self.quota_bytes,
+            "disk_total_bytes": disk.total,
+            "disk_used_bytes": disk.used,
+            "disk_free_bytes": disk.free
+        }
+        self._metrics = (now, metrics)
+        return dict(metrics)
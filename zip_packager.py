@@ -0,0 +1,360 @@
+import io
+import os
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Formats that are already compressed; deflating them again costs CPU for no gain
+STORED_EXTENSIONS = {".pdf", ".docx", ".xlsx", ".zip", ".png", ".jpg", ".jpeg", ".gz"}
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_COMPRESS_WORKERS = min(8, os.cpu_count() or 1)
+
+# Zip record layouts (APPNOTE 4.3.7, 4.3.12 and 4.3.16)
+LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+CENTRAL_HEADER = struct.Struct("<4sHHHHHHLLLHHHHHLL")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHLLH")
+
+# Sizes, offsets and entry counts above these need ZIP64 records
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_ENTRY_LIMIT = 0xFFFF
+
+def compression_for(name):
+    """
+    Pick the zip compression method for a member name.
+
+    Returns:
+        zipfile.ZIP_STORED for already-compressed formats, otherwise ZIP_DEFLATED
+    """
+    return zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def make_zip_info(name, date_time=None):
+    """
+    Build the ZipInfo for an in-memory member.
+
+    Args:
+        name: Member name inside the archive
+        date_time: Optional (year, month, day, hour, minute, second) tuple;
+            defaults to the current local time
+
+    Returns:
+        zipfile.ZipInfo
+    """
+    info = zipfile.ZipInfo(name, date_time=date_time or time.localtime()[:6])
+    info.compress_type = compression_for(name)
+    info.external_attr = 0o644 << 16
+    return info
+
+class _ChunkBuffer:
+    """
+    Write-only sink that zipfile treats as an unseekable stream.
+
+    Bytes written by zipfile accumulate here until the packager drains them.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer.extend(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self, chunk_size, final=False):
+        while len(self._buffer) >= chunk_size or (final and self._buffer):
+            chunk = bytes(self._buffer[:chunk_size])
+            del self._buffer[:chunk_size]
+            yield chunk
+
+class StreamingZipPackager:
+    """
+    Add artifacts to a zip archive straight from memory.
+
+    Members are written as soon as they are added, PDFs and other
+    already-compressed formats are stored rather than deflated again, and
+    nothing is staged in a temporary directory.
+    """
+
+    def __init__(self, target, date_time=None):
+        """
+        Args:
+            target: Output path or writable binary file-like object (it does
+                not need to be seekable)
+            date_time: Optional fixed timestamp for every member, for
+                reproducible archives
+        """
+        self.date_time = date_time
+        self.names = []
+        self._zip = zipfile.ZipFile(target, "w")
+
+    def add(self, name, data):
+        """
+        Add one member.
+
+        Args:
+            name: Member name inside the archive
+            data: Member content as bytes or str
+        """
+        self._zip.writestr(make_zip_info(name, self.date_time), data)
+        self.names.append(name)
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def iter_zip_chunks(artifacts, chunk_size=DEFAULT_CHUNK_SIZE, date_time=None):
+    """
+    Stream a zip archive in chunks while its members are being produced.
+
+    Args:
+        artifacts: Iterable of (name, bytes) pairs; may be a generator that
+            produces each artifact on demand
+        chunk_size: Maximum size of the yielded chunks
+        date_time: Optional fixed timestamp for every member
+
+    Yields:
+        Chunks of the archive as bytes
+    """
+    sink = _ChunkBuffer()
+    with StreamingZipPackager(sink, date_time=date_time) as packager:
+        for name, data in artifacts:
+            packager.add(name, data)
+            yield from sink.drain(chunk_size)
+    yield from sink.drain(chunk_size, final=True)
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return ((year - 1980) << 9) | (month << 5) | day, (hour << 11) | (minute << 5) | (second // 2)
+
+def _encode_name(name):
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        # General purpose bit 11: the name is UTF-8
+        return name.encode("utf-8"), 0x800
+
+def compress_member(name, data, compresslevel=zlib.Z_DEFAULT_COMPRESSION):
+    """
+    Compress one member the way it will be stored in the archive.
+
+    zlib releases the GIL while compressing and computing the CRC, so this
+    can run concurrently in threads.
+
+    Args:
+        name: Member name inside the archive (selects the compression method)
+        data: Member content as bytes or str
+        compresslevel: zlib compression level for deflated members
+
+    Returns:
+        Tuple of (compress_type, crc32, uncompressed size, payload bytes)
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    compress_type = compression_for(name)
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        payload = bytes(data)
+    return compress_type, zlib.crc32(data), len(data), payload
+
+class ParallelZipPackager:
+    """
+    Zip packager that deflates members concurrently in a thread pool.
+
+    Members are compressed in worker threads and written to the target in
+    the order they were added, each as soon as it and every member before
+    it are done, so output stays sequential. add blocks while twice as many
+    members as there are workers are in flight, which bounds memory. The
+    local headers and central directory are written directly, which works
+    on unseekable streams. Archives that would need ZIP64 records are
+    rejected; use StreamingZipPackager for those.
+
+    Used as a context manager, a block that raises leaves the archive
+    unfinished: queued members are dropped and no central directory is
+    written.
+    """
+
+    def __init__(self, target, date_time=None, max_workers=None, compresslevel=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        Args:
+            target: Output path or writable binary file-like object (it does
+                not need to be seekable)
+            date_time: Optional fixed timestamp for every member, for
+                reproducible archives
+            max_workers: Number of compression threads (defaults to
+                DEFAULT_COMPRESS_WORKERS)
+            compresslevel: zlib compression level for deflated members
+        """
+        self.date_time = date_time
+        self.compresslevel = compresslevel
+        self.names = []
+        self._owns_file = isinstance(target, (str, os.PathLike))
+        self._file = open(target, "wb") if self._owns_file else target
+        self._max_workers = max_workers or DEFAULT_COMPRESS_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._pending = deque()
+        self._central_directory = []
+        self._offset = 0
+        self._closed = False
+
+    def add(self, name, data):
+        """
+        Queue one member for compression, first writing the oldest queued
+        members while too many are in flight.
+
+        Args:
+            name: Member name inside the archive
+            data: Member content as bytes or str
+        """
+        if self._closed:
+            raise ValueError("Attempt to add to a closed archive")
+        if len(self.names) >= ZIP32_ENTRY_LIMIT:
+            raise ValueError("Too many members for a zip archive without ZIP64 records")
+        while len(self._pending) >= 2 * self._max_workers:
+            self._write_next()
+        date_time = self.date_time or time.localtime()[:6]
+        future = self._executor.submit(compress_member, name, data, self.compresslevel)
+        self._pending.append((name, date_time, future))
+        self.names.append(name)
+        self._write_completed()
+
+    def _write_next(self):
+        name, date_time, future = self._pending.popleft()
+        self._write_member(name, date_time, *future.result())
+
+    def _write_completed(self, wait=False):
+        while self._pending and (wait or self._pending[0][2].done()):
+            self._write_next()
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _write_member(self, name, date_time, compress_type, crc, size, payload):
+        if max(size, len(payload), self._offset) >= ZIP32_LIMIT:
+            raise ValueError(f"{name} needs ZIP64 records; use StreamingZipPackager instead")
+
+        encoded_name, flags = _encode_name(name)
+        dos_date, dos_time = _dos_date_time(date_time)
+        version = 20 if compress_type == zipfile.ZIP_DEFLATED else 10
+        self._central_directory.append(CENTRAL_HEADER.pack(
+            b"PK\x01\x02", (3 << 8) | 20, version, flags, compress_type, dos_time, dos_date,
+            crc, len(payload), size, len(encoded_name), 0, 0, 0, 0, 0o644 << 16, self._offset
+        ) + encoded_name)
+        self._write(LOCAL_HEADER.pack(
+            b"PK\x03\x04", version, flags, compress_type, dos_time, dos_date,
+            crc, len(payload), size, len(encoded_name), 0
+        ) + encoded_name)
+        self._write(payload)
+
+    def close(self):
+        """
+        Write the remaining members and the central directory.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._write_completed(wait=True)
+            directory_offset = self._offset
+            for record in self._central_directory:
+                self._write(record)
+            directory_size = self._offset - directory_offset
+            if directory_offset >= ZIP32_LIMIT:
+                raise ValueError("Archive needs ZIP64 records; use StreamingZipPackager instead")
+            count = len(self._central_directory)
+            self._write(END_OF_CENTRAL_DIRECTORY.pack(
+                b"PK\x05\x06", 0, 0, count, count, directory_size, directory_offset, 0
+            ))
+            self._file.flush()
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            if self._owns_file:
+                self._file.close()
+
+    def abort(self):
+        """
+        Stop without finishing the archive: queued members are dropped and
+        no central directory is written.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def make_packager(target, date_time=None, parallel=False, max_workers=None):
+    """
+    Create the streaming or the parallel packager.
+
+    Args:
+        target: Output path or writable binary file-like object
+        date_time: Optional fixed timestamp for every member
+        parallel: Compress members concurrently (see ParallelZipPackager)
+        max_workers: Number of compression threads when parallel
+
+    Returns:
+        StreamingZipPackager or ParallelZipPackager
+    """
+    if parallel:
+        return ParallelZipPackager(target, date_time=date_time, max_workers=max_workers)
+    return StreamingZipPackager(target, date_time=date_time)
+
+def write_zip(artifacts, target, date_time=None, parallel=False, max_workers=None):
+    """
+    Write artifacts to a zip archive on disk or to a file-like object.
+
+    Args:
+        artifacts: Iterable of (name, bytes) pairs
+        target: Output path or writable binary file-like object
+        date_time: Optional fixed timestamp for every member
+        parallel: Compress members concurrently in a thread pool
+        max_workers: Number of compression threads when parallel
+
+    Returns:
+        List of member names written
+    """
+    with make_packager(target, date_time, parallel, max_workers) as packager:
+        for name, data in artifacts:
+            packager.add(name, data)
+    return packager.names
+
+def build_zip(artifacts, date_time=None, parallel=False, max_workers=None):
+    """
+    Build a zip archive in memory.
+
+    Args:
+        artifacts: Iterable of (name, bytes) pairs
+        date_time: Optional fixed timestamp for every member
+        parallel: Compress members concurrently in a thread pool
+        max_workers: Number of compression threads when parallel
+
+    Returns:
+        Archive as bytes
+    """
+    output = io.BytesIO()
+    write_zip(artifacts, output, date_time=date_time, parallel=parallel, max_workers=max_workers)
+    return output.getvalue()